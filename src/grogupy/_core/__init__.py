@@ -41,8 +41,10 @@ Parallelization is done using MPI if it is available.
 .. autosummary::
    :toctree: _generated/
 
-   default_solver          It calculates the energies by the Greens function method without MPI parallelization.
-   solve_parallel_over_k   It calculates the energies by the Greens function method with parallelization over k points.
+   default_solver                It calculates the energies by the Greens function method without MPI parallelization.
+   solve_parallel_over_k         It calculates the energies by the Greens function method with parallelization over k points.
+   solve_parallel_over_threads   It calculates the energies by the Greens function method with a pool of threads.
+   solve_parallel_over_processes It calculates the energies by the Greens function method with a pool of processes.
 
 
 Gpu solvers
@@ -78,14 +80,53 @@ Miscellaneous suport functions used around the code. There are mathematical func
    arrays_None_equal            Compares two objects with specific rules.
    onsite_projection            It produces the slices of a matrix for the on site projection.
    calc_Vu                      Calculates the local perturbation in case of a spin rotation.
+   calc_onsite_Vu               Calculates the on-site projection of the local perturbation.
+   time_reversal                Time reversal of matrices in spin box representation.
+   exchange_hamiltonian         Spin box representation of the exchange field.
    build_hh_ss                  It builds the Hamiltonian and Overlap matrix from the sisl.dh class.
    make_contour                 A more sophisticated contour generator.
+   make_kronrod_contour         Contour generator with an embedded error estimate.
    make_kset                    Simple k-grid generator to sample the Brillouin zone.
+   make_trs_kset                K-grid generator, where the k and -k points are merged.
+   kpoints_on_kset              Checks which k points are on the grid of ``make_kset``.
+   make_qmc_kset                Quasi-Monte Carlo k point generator to sample the Brillouin zone.
    hsk                          Speed up Hk and Sk generation.
+   rotated_hsk                  Hk of several rotated exchange fields and Sk generation.
+   greens_function_columns      Green's function restricted to the given orbital columns.
+   greens_function_eigen        Green's function on the given orbitals from the generalised eigenproblem.
+   spectral_greens_function     Assembles the Green's function from the spectral decomposition.
+   spin_box_csr                 Compresses the spin box matrices of all the supercells.
+   supercell_block              The spin box matrix of one supercell.
+   sparse_hsk                   Sparse version of ``hsk``.
+   greens_function_sparse       Green's function on the given orbitals with a sparse LU factorisation.
+   block_tridiagonal_layers     Partitions the atoms to layers with block tridiagonal couplings.
+   greens_function_recursive    Green's function on the given orbitals with the recursive method.
    process_ref_directions       Preprocess the reference directions input for the Builder object.
+
+Symmetry
+--------
+
+Symmetry detection of the geometry and the representations of the symmetry
+operations, which are used to sample only the irreducible k points.
+
+.. autosummary::
+   :toctree: _generated/
+
+   lattice_rotations            The point group of the lattice in fractional coordinates.
+   space_group_operations       The symmetry operations of the geometry.
+   real_spherical_harmonics     The real spherical harmonics in the convention of Siesta and sisl.
+   orbital_representation       The transformation of the orbitals of an atom under a rotation.
+   spin_representation          The SU(2) matrix of the proper part of a rotation.
+   spin_orbital_representation  The transformation of the spin box basis under a symmetry operation.
+   operation_phase              The spin box representation of a symmetry operation in k.
+   k_rotation                   The action of a symmetry operation on the fractional k points.
+   kset_compatible              Checks that the k rotation maps the grid of ``make_kset`` to itself.
+   is_group                     Checks that the k rotations with time reversal flags are closed.
+   irreducible_kset             The irreducible k points of the grid of ``make_kset``.
 """
 
 from .constants import *
 from .cpu_solvers import *
 from .gpu_solvers import *
+from .symmetry import *
 from .utilities import *
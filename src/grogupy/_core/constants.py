@@ -29,5 +29,47 @@ TAU_Y: Final[NDArray] = np.array([[0, -1j], [1j, 0]], dtype=np.complex128)
 TAU_Z: Final[NDArray] = np.array([[1, 0], [0, -1]], dtype=np.complex128)
 TAU_0: Final[NDArray] = np.array([[1, 0], [0, 1]], dtype=np.complex128)
 
+# nodes and weights of the 15 point Kronrod rule on [-1, 1], the embedded
+# 7 point Gauss rule uses every second node
+_KRONROD_X: Final[NDArray] = np.array(
+    [
+        0.991455371120812639206854697526329,
+        0.949107912342758524526189684047851,
+        0.864864423359769072789712788640926,
+        0.741531185599394439863864773280788,
+        0.586087235467691130294144845693013,
+        0.405845151377397166906606412076961,
+        0.207784955007898467600689403773245,
+        0.000000000000000000000000000000000,
+    ]
+)
+_KRONROD_W: Final[NDArray] = np.array(
+    [
+        0.022935322010529224963732008058970,
+        0.063092092629978553290700663189204,
+        0.104790010322250183839876322541518,
+        0.140653259715525918745189590510238,
+        0.169004726639267902826583426598550,
+        0.190350578064785409913256402421014,
+        0.204432940075298892414161999234649,
+        0.209482141084727828012999174891714,
+    ]
+)
+_GAUSS_W: Final[NDArray] = np.array(
+    [
+        0,
+        0.129484966168869693270611432679082,
+        0,
+        0.279705391489276667901467771423780,
+        0,
+        0.381830050505118944950369775488975,
+        0,
+        0.417959183673469387755102040816327,
+    ]
+)
+KRONROD_NODES: Final[NDArray] = np.concatenate((-_KRONROD_X, _KRONROD_X[-2::-1]))
+KRONROD_WEIGHTS: Final[NDArray] = np.concatenate((_KRONROD_W, _KRONROD_W[-2::-1]))
+GAUSS_WEIGHTS: Final[NDArray] = np.concatenate((_GAUSS_W, _GAUSS_W[-2::-1]))
+
 if __name__ == "__main__":
     pass
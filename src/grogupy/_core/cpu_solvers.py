@@ -18,20 +18,2627 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-from typing import TYPE_CHECKING
+
+import contextlib
+import copy
+import functools
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import TYPE_CHECKING, Callable, Iterator, Union
 
 from numpy.typing import NDArray
 
 if TYPE_CHECKING:
     from grogupy.physics.builder import Builder
+    from grogupy.physics.hamiltonian import Hamiltonian
+    from grogupy.physics.pair import Pair
 
 import numpy as np
+import scipy.fft
+from numpy.lib.format import open_memmap
+from scipy.linalg import eigh
+from scipy.sparse import csr_matrix, identity, issparse
 
 from grogupy._tqdm import _tqdm
 from grogupy.config import CONFIG
-from grogupy.physics.utilities import interaction_energy
+from grogupy.physics.utilities import (
+    anisotropy_energies,
+    calculate_anisotropy_tensor,
+    calculate_exchange_tensor,
+    fit_anisotropy_tensor,
+    fit_exchange_tensor,
+    interaction_energies,
+    onsite_energies,
+)
+
+from .symmetry import (
+    irreducible_kset,
+    is_group,
+    k_rotation,
+    kset_compatible,
+    operation_phase,
+    space_group_operations,
+    spin_orbital_representation,
+)
+from .utilities import (
+    RotMa2b,
+    block_tridiagonal_layers,
+    calc_onsite_Vu,
+    greens_function_columns,
+    greens_function_eigen,
+    greens_function_recursive,
+    greens_function_sparse,
+    hsk,
+    kpoints_on_kset,
+    onsite_projection,
+    rotated_hsk,
+    sparse_hsk,
+    spectral_greens_function,
+    spin_box_csr,
+    supercell_block,
+)
+
+
+def _check_setup(builder: "Builder") -> None:
+    """Checks that every part of the integral is added to the builder."""
+
+    if builder.kspace is None:
+        raise Exception("Kspace is not defined!")
+    if builder.contour is None:
+        raise Exception("Contour is not defined!")
+    if builder.hamiltonian is None:
+        raise Exception("Hamiltonian is not defined!")
+    if builder.contour.adaptive and (
+        builder.kspace.tolerance is not None or builder.kspace.sampling == "sobol"
+    ):
+        raise Exception("The k points can not be refined with an adaptive contour!")
+    if builder.energy_chunk_size is not None and (
+        builder.contour.adaptive
+        or builder.kspace.tolerance is not None
+        or builder.kspace.sampling == "sobol"
+    ):
+        raise Exception(
+            "The energy chunks are not kept, so they can not be used with the refinements!"
+        )
+    if builder.eigen_cache is not None and (
+        builder.kspace.tolerance is not None or builder.kspace.sampling == "sobol"
+    ):
+        raise Exception("The eigen cache needs the k points of a fixed grid!")
+
+
+def _reset(builder: "Builder") -> None:
+    """Resets the rotated hamiltonians, the magnetic entities and the pairs."""
+
+    builder._rotated_hamiltonians = []
+    for mag_ent in builder.magnetic_entities:
+        mag_ent.reset()
+    for pair in builder.pairs:
+        pair.reset()
+
+
+def _print_memory(builder: "Builder") -> None:
+    """Prints the estimated memory usage of the solution."""
+
+    # only the samples of one energy chunk are integrated at once
+    eset = builder.contour.eset
+    if builder.energy_chunk_size is not None:
+        eset = min(eset, builder.energy_chunk_size)
+
+    H_mem = np.sum(
+        [
+            _matrix_memory(builder.hamiltonian.H),
+            _matrix_memory(builder.hamiltonian.S),
+        ]
+    )
+    mag_ent_mem = (eset * builder.magnetic_entities.SBS**2).sum() * 16
+    # the reverse pairs have no holders
+    unique = np.array(
+        [partner is None for partner in builder.pairs.reverse_partners()], dtype=bool
+    )
+    pair_mem = (eset * builder.pairs.SBS1 * builder.pairs.SBS2)[unique].sum() * 16
+
+    print("\n\n\n")
+    print(
+        "################################################################################"
+    )
+    print(
+        "################################################################################"
+    )
+    print("Memory allocated on each MPI rank:")
+    print(f"Memory allocated by rotated Hamilonian: {H_mem/1e6} MB")
+    print(f"Memory allocated by magnetic entities: {mag_ent_mem/1e6} MB")
+    print(f"Memory allocated by pairs: {pair_mem/1e6} MB")
+    print(f"Total memory allocated in RAM: {(H_mem+mag_ent_mem+pair_mem)/1e6} MB")
+    print(
+        "--------------------------------------------------------------------------------"
+    )
+    solver = builder.greens_function_solver.lower()
+    # the Greens function is a dense matrix in the spin box of the unit cell,
+    # regardless of the storage of the Hamiltonian
+    if solver == "parallel":
+        G_mem = eset * builder.hamiltonian.NO**2 * 16
+    elif solver == "sequential":
+        G_mem = builder.max_g_per_loop * builder.hamiltonian.NO**2 * 16
+    elif solver == "columns":
+        G_mem = (
+            eset
+            * builder.hamiltonian.NO
+            * len(_subspace(builder, compact=True)[0])
+            * 16
+        )
+    elif solver == "eigen":
+        # eigenvectors and the resolvent weighted rows on the subspace
+        G_mem = (
+            builder.hamiltonian.NO**2 * 16
+            + eset
+            * builder.hamiltonian.NO
+            * len(_subspace(builder, compact=True)[0])
+            * 16
+        )
+    elif solver == "sparse":
+        # one solution on the subspace and the projected samples
+        m = len(_subspace(builder, compact=True)[0])
+        G_mem = (builder.hamiltonian.NO * m + eset * m**2) * 16
+    elif solver == "recursive":
+        # the connected Greens functions of the layers
+        layers = _layers(builder, builder.hamiltonian)
+        G_mem = 2 * eset * np.sum([len(layer) ** 2 for layer in layers]) * 16
+    else:
+        raise Exception("Unknown Greens function solver!")
+
+    print(f"Memory allocated for Greens function samples: {G_mem/1e6} MB")
+    print(
+        f"Total peak memory during solution: {(H_mem+mag_ent_mem+pair_mem+G_mem*25)/1e6} MB"
+    )
+    print(
+        "################################################################################"
+    )
+    print(
+        "################################################################################"
+    )
+    print("\n\n\n")
+
+
+def _subspace(
+    builder: "Builder", compact: bool = False
+) -> tuple[NDArray, list[NDArray], list[tuple[NDArray, NDArray]]]:
+    """The orbital indices needed from the Greens function.
+
+    Parameters
+    ----------
+    builder: Builder
+        The main grogupy object
+    compact: bool, optional
+        If it is True, then the indices of the magnetic entities and the pairs
+        point into the union of the spin box indices, otherwise they point
+        into the whole Greens function, by default False
+
+    Returns
+    -------
+    columns: NDArray
+        The sorted union of the spin box indices
+    mag_ent_idx: list[NDArray]
+        The indices of the magnetic entities
+    pair_idx: list[tuple[NDArray, NDArray]]
+        The indices of the two sites of the pairs
+    """
+
+    columns = np.unique(
+        np.concatenate(
+            [mag_ent._spin_box_indices for mag_ent in builder.magnetic_entities]
+            + [pair.SBI1 for pair in builder.pairs]
+            + [pair.SBI2 for pair in builder.pairs]
+        )
+    ).astype(int)
+
+    if compact:
+
+        def index(idx):
+            return np.searchsorted(columns, idx)
+
+    else:
+
+        def index(idx):
+            return idx
+
+    mag_ent_idx = [
+        index(mag_ent._spin_box_indices) for mag_ent in builder.magnetic_entities
+    ]
+    pair_idx = [(index(pair.SBI1), index(pair.SBI2)) for pair in builder.pairs]
+
+    return columns, mag_ent_idx, pair_idx
+
+
+def _matrix_memory(M) -> int:
+    """The memory of the dense or the compressed spin box matrix in byte."""
+
+    if issparse(M):
+        return M.data.nbytes + M.indices.nbytes + M.indptr.nbytes
+    # 16 is the size of complex numbers in byte, when using np.float64
+    return np.prod(M.shape) * 16
+
+
+def _is_real(M) -> bool:
+    """Wether the dense or the compressed spin box matrix is real."""
+
+    if issparse(M):
+        M = M.data
+    return not np.any(M.imag)
+
+
+def _layers(builder: "Builder", rot_H: "Hamiltonian") -> list[NDArray]:
+    """The spin box indices of the layers used by the recursive solver.
+
+    If the ``layers`` of the builder is None, then the layers are
+    detected from the couplings of the atoms in the Hamiltonian,
+    otherwise the given partition is checked.
+
+    Parameters
+    ----------
+    builder: Builder
+        The main grogupy object
+    rot_H: Hamiltonian
+        The rotated Hamiltonian
+
+    Returns
+    -------
+    list[NDArray]
+        The spin box indices in each layer
+    """
+
+    geometry = rot_H.geometry
+    # the atom of every spin box index
+    atoms = np.repeat(geometry.o2a(np.arange(geometry.no)), 2)
+    projector = np.zeros((len(atoms), geometry.na), dtype=int)
+    projector[np.arange(len(atoms)), atoms] = 1
+
+    # two atoms are coupled if they are coupled in any supercell
+    if rot_H.sparse:
+        nonzero = np.zeros((rot_H.NO, rot_H.NO), dtype=bool)
+        for M in (rot_H.H.tocoo(), rot_H.S.tocoo()):
+            nonzero[M.row, M.col % rot_H.NO] |= M.data != 0
+    else:
+        nonzero = np.logical_or((rot_H.H != 0).any(axis=0), (rot_H.S != 0).any(axis=0))
+    connectivity = (projector.T @ nonzero.astype(int) @ projector) > 0
+
+    if builder.layers is None:
+        layers = block_tridiagonal_layers(connectivity)
+    else:
+        layers = [np.array(layer, dtype=int) for layer in builder.layers]
+        if not np.array_equal(np.sort(np.concatenate(layers)), np.arange(geometry.na)):
+            raise Exception("Every atom must be in exactly one layer!")
+        layer_index = np.zeros(geometry.na, dtype=int)
+        for i, layer in enumerate(layers):
+            layer_index[layer] = i
+        a, b = np.nonzero(connectivity)
+        if (np.abs(layer_index[a] - layer_index[b]) > 1).any():
+            raise Exception("The layers are not block tridiagonal!")
+
+    return [np.nonzero(np.isin(atoms, layer))[0] for layer in layers]
+
+
+def _rotated_hamiltonian(builder: "Builder", orient: dict) -> "Hamiltonian":
+    """Returns the Hamiltonian rotated to the given reference direction."""
+
+    if builder.low_memory_mode:
+        rot_H = builder.hamiltonian
+    else:
+        # the copies share the exchange field of the original Hamiltonian
+        builder.hamiltonian.extract_exchange_field()
+        rot_H = builder.hamiltonian.copy()
+    if not np.allclose(rot_H.orientation, orient["o"]):
+        rot_H.rotate(orient["o"])
+
+    return rot_H
+
+
+def _setup_holders(
+    builder: "Builder",
+    holders: Union[tuple[list[NDArray], list[NDArray], list[NDArray]], None] = None,
+) -> tuple[list[NDArray], list[NDArray], list[NDArray]]:
+    """Setup empty Greens function holders and rotation storages.
+
+    Parameters
+    ----------
+    builder: Builder
+        The main grogupy object
+    holders: Union[tuple[list[NDArray], list[NDArray], list[NDArray]], None], optional
+        Already sampled holders of the reference direction, by default new
+        empty holders are created
+
+    Returns
+    -------
+    tuple[list[NDArray], list[NDArray], list[NDArray]]
+        The Greens function holders of the magnetic entities and pairs
+    """
+
+    if holders is None:
+        holders = _empty_holders(_holder_shapes(builder))
+    for mag_ent, G in zip(builder.magnetic_entities, holders[0]):
+        mag_ent._Vu1_tmp = []
+        mag_ent._Vu2_tmp = []
+        mag_ent._Gii_tmp = G
+    for pair, G1, G2 in zip(builder.pairs, holders[1], holders[2]):
+        pair._Gij_tmp = G1
+        pair._Gji_tmp = G2
+
+    return holders
+
+
+def _holder_shapes(
+    builder: "Builder", eset: Union[int, None] = None
+) -> tuple[list[tuple], list[tuple], list[tuple]]:
+    """Shapes of the Greens function holders of the magnetic entities and pairs.
+
+    By default the holders contain all the samples of the contour.
+    """
+
+    if eset is None:
+        eset = builder.contour.eset
+    Gii = [(eset, mag_ent.SBS, mag_ent.SBS) for mag_ent in builder.magnetic_entities]
+    Gij = [(eset, pair.SBS1, pair.SBS2) for pair in builder.pairs]
+    Gji = [(eset, pair.SBS2, pair.SBS1) for pair in builder.pairs]
+
+    return Gii, Gij, Gji
+
+
+def _empty_holders(
+    shapes: tuple[list[tuple], list[tuple], list[tuple]],
+) -> tuple[list[NDArray], list[NDArray], list[NDArray]]:
+    """Empty Greens function holders with the shapes from ``_holder_shapes``.
+
+    The holders of the magnetic entities, the Gij and the Gji of the pairs
+    are views of one contiguous buffer each, with the energy samples along
+    the first axis, so they can be accumulated and reduced at once.
+    """
+
+    holders: list = []
+    for holder_shapes in shapes:
+        sizes = [int(np.prod(shape[1:])) for shape in holder_shapes]
+        offsets = np.cumsum([0] + sizes)
+        eset = holder_shapes[0][0] if len(holder_shapes) > 0 else 0
+        buffer = np.zeros((eset, offsets[-1]), dtype="complex128")
+        holders.append(
+            [
+                buffer[:, start:end].reshape(shape)
+                for start, end, shape in zip(offsets, offsets[1:], holder_shapes)
+            ]
+        )
+
+    return tuple(holders)
+
+
+def _holder_buffer(holder: list[NDArray]) -> Union[tuple[NDArray, slice], None]:
+    """The contiguous buffer of the holders from ``_empty_holders``.
+
+    Parameters
+    ----------
+    holder: list[NDArray]
+        The Greens function holders of the magnetic entities or the pairs
+
+    Returns
+    -------
+    Union[tuple[NDArray, slice], None]
+        The buffer and the columns of the holders in the buffer. It is None
+        when the holders are not consecutive views of one buffer.
+    """
+
+    if len(holder) == 0:
+        return None
+    buffer = holder[0].base
+    if not isinstance(buffer, np.ndarray) or buffer.ndim != 2:
+        return None
+
+    start = buffer.__array_interface__["data"][0]
+    end = (holder[0].__array_interface__["data"][0] - start) // buffer.itemsize
+    columns = slice(end, None)
+    for G in holder:
+        if (
+            G.base is not buffer
+            or G.shape[0] != buffer.shape[0]
+            or G.strides[0] != buffer.strides[0]
+            or not G[0].flags.c_contiguous
+            or G.__array_interface__["data"][0] != start + end * buffer.itemsize
+        ):
+            return None
+        end += G[0].size
+
+    return buffer, slice(columns.start, end)
+
+
+def _sampling_setup(builder: "Builder", rot_H: "Hamiltonian") -> dict:
+    """Collects everything that is needed for the sampling in the k points.
+
+    The k point sampling only uses the returned dictionary, so it can be
+    done by workers that do not have access to the builder.
+
+    Parameters
+    ----------
+    builder: Builder
+        The main grogupy object
+    rot_H: Hamiltonian
+        The rotated Hamiltonian
+
+    Returns
+    -------
+    dict
+        The setup of the sampling
+    """
+
+    solver = builder.greens_function_solver.lower()
+    symmetrize = builder.kspace.symmetrize
+    fft = builder.pair_accumulation == "FFT"
+
+    # these solvers only need the union of the spin box indices, the
+    # symmetrization and the FFT always work in the union
+    columns, mag_ent_idx, pair_idx = _subspace(
+        builder,
+        compact=symmetrize
+        or fft
+        or solver in ("columns", "eigen", "sparse", "recursive"),
+    )
+
+    setup = dict(
+        solver=solver,
+        samples=builder.contour.samples,
+        max_g_per_loop=builder.max_g_per_loop,
+        H=rot_H.H,
+        S=rot_H.S,
+        sc_off=rot_H.sc_off,
+        columns=columns,
+        mag_ent_idx=mag_ent_idx,
+        pair_idx=pair_idx,
+        supercell_shifts=[pair.supercell_shift for pair in builder.pairs],
+        shapes=_holder_shapes(builder),
+    )
+
+    # k and -k are merged only when the Hamiltonian is real in real space,
+    # otherwise the full grid is sampled
+    setup["trs"] = builder.kspace.trs and _is_real(rot_H.H) and _is_real(rot_H.S)
+    if setup["trs"] or not builder.kspace.trs:
+        setup["kpoints"] = builder.kspace.kpoints
+        setup["weights"] = builder.kspace.weights
+    else:
+        setup["kpoints"] = builder.kspace.full_kpoints
+        setup["weights"] = builder.kspace.full_weights
+
+    # the irreducible k points of the symmetries of the rotated Hamiltonian,
+    # time reversal is one of the symmetries in this case
+    setup["symmetry"] = None
+    if symmetrize:
+        symmetry = _symmetry(builder, rot_H, columns, time_reversal=setup["trs"])
+        setup["symmetry"] = symmetry["operations"]
+        setup["columns"] = symmetry["support"]
+        setup["kpoints"] = symmetry["kpoints"]
+        setup["weights"] = symmetry["weights"]
+        setup["trs"] = False
+
+    # the Hamiltonian is not shared between reference directions
+    setup["rotations"] = None
+    # the eigen decompositions are not cached by default
+    setup["cache"] = None
+
+    # the pairs are calculated from the Greens function on the regular grid
+    setup["fft"] = fft
+    if fft:
+        if (
+            symmetrize
+            or not kpoints_on_kset(setup["kpoints"], builder.kspace.kset).all()
+        ):
+            raise Exception(
+                "The FFT pair accumulation needs the k points of the regular grid!"
+            )
+        setup["kset"] = builder.kspace.kset
+
+    # the layers of the recursive solver
+    if solver == "recursive":
+        setup["layers"] = _layers(builder, rot_H)
+
+    # the sparse solver uses the compressed matrices of the rotated Hamiltonian
+    if solver == "sparse":
+        setup["H_csr"] = rot_H.H if rot_H.sparse else spin_box_csr(rot_H.H)
+        setup["S_csr"] = rot_H.S if rot_H.sparse else spin_box_csr(rot_H.S)
+
+    return setup
+
+
+def _symmetry(
+    builder: "Builder",
+    rot_H: "Hamiltonian",
+    columns: NDArray,
+    time_reversal: bool = False,
+    tol: float = 1e-5,
+) -> dict:
+    """The symmetry operations of the rotated Hamiltonian.
+
+    The candidates are the symmetries of the geometry, which map the k grid
+    to itself. An operation is kept if the Hamiltonian and the overlap
+    matrix are invariant in a generic k point, with the spin rotated by
+    the lattice or, if it fails, with the spin unchanged. The identity is
+    always kept and if the kept operations do not form a group, then only
+    the identity is used.
+
+    Parameters
+    ----------
+    builder: Builder
+        The main grogupy object
+    rot_H: Hamiltonian
+        The rotated Hamiltonian
+    columns: NDArray
+        The spin box indices of the magnetic entities and pairs
+    time_reversal: bool, optional
+        If the Hamiltonian is real in real space, then the operations are
+        combined with k -> -k, by default False
+    tol: float, optional
+        Tolerance of the invariance of the Hamiltonian, by default 1e-5
+
+    Returns
+    -------
+    dict
+        The ``operations``, the ``support`` of the operations on the
+        ``columns`` and the irreducible ``kpoints`` and ``weights``
+    """
+
+    geometry = rot_H.geometry
+    kset = builder.kspace.kset
+
+    # a generic k point to check the invariance
+    k = np.array([0.1234, 0.2345, 0.3456])
+    Hk, Sk = hsk(rot_H.H, rot_H.S, rot_H.sc_off, k)
+
+    # the identity is kept, even if the orbitals can not be rotated
+    representations = [
+        (
+            np.eye(3, dtype=int),
+            (identity(rot_H.NO, format="csr"), np.zeros((rot_H.NO, 3), dtype=int)),
+        )
+    ]
+    for operation in space_group_operations(geometry)[1:]:
+        N = k_rotation(operation[0])
+        if not kset_compatible(kset, N):
+            continue
+        Hk_rot, Sk_rot = hsk(rot_H.H, rot_H.S, rot_H.sc_off, N @ k)
+        for spin in (True, False):
+            representation = spin_orbital_representation(geometry, operation, spin)
+            if representation is None:
+                break
+            U = operation_phase(*representation, N @ k)
+            if (
+                np.abs(U @ (U @ Hk).conj().T - Hk_rot).max() < tol
+                and np.abs(U @ (U @ Sk).conj().T - Sk_rot).max() < tol
+            ):
+                representations.append((N, representation))
+                break
+
+    elements = [(N, 0) for N, _ in representations]
+    if time_reversal:
+        elements += [(N, 1) for N, _ in representations]
+    if not is_group(elements):
+        representations = representations[:1]
+        elements = [(N, theta) for N, theta in elements if (N == np.eye(3)).all()]
+
+    # the rotated columns are needed from the Greens function
+    support = np.unique(
+        np.concatenate(
+            [columns] + [U[columns].indices for _, (U, _) in representations]
+        )
+    )
+
+    # the time reversed operations are the second half
+    W = np.array([U[columns][:, support].toarray() for _, (U, _) in representations])
+    orbital_shifts = np.array([shifts[support] for _, (_, shifts) in representations])
+    repeat = len(elements) // len(representations)
+    operations = dict(
+        W=np.tile(W, (repeat, 1, 1)),
+        orbital_shifts=np.tile(orbital_shifts, (repeat, 1, 1)),
+        N=np.array([N for N, _ in elements]),
+        theta=np.array([theta for _, theta in elements], dtype=bool),
+    )
+
+    kpoints, weights = irreducible_kset(
+        kset, [N * (-1) ** theta for N, theta in elements]
+    )
+
+    return dict(
+        operations=operations, support=support, kpoints=kpoints, weights=weights
+    )
+
+
+def _add_symmetric_projections(
+    setup: dict,
+    holders: tuple[list[NDArray], list[NDArray], list[NDArray]],
+    Gk: NDArray,
+    k: NDArray,
+    wk: float,
+    energies: slice = slice(None),
+) -> None:
+    """Adds the weighted projections of the whole star of the k point.
+
+    The Greens function in the rotated k point is ``U G(k) U^dagger``, and
+    with time reversal its transpose belongs to the opposite k point. The
+    star is averaged over the operations, so the weight of the irreducible
+    k point is the number of k points in the star.
+
+    Parameters
+    ----------
+    setup: dict
+        The setup of the sampling
+    holders: tuple[list[NDArray], list[NDArray], list[NDArray]]
+        The Greens function holders of the magnetic entities and pairs
+    Gk: NDArray
+        Greens function samples at the given k point
+    k: NDArray
+        The k point
+    wk: float
+        The weight of the k point in the Brillouin zone integral
+    energies: slice, optional
+        The energy samples that are contained in ``Gk``, by default all
+    """
+
+    # the solvers of the whole Greens function are projected to the support
+    if setup["solver"] in ("parallel", "sequential"):
+        Gk = onsite_projection(Gk, setup["columns"], setup["columns"])
+
+    symmetry = setup["symmetry"]
+    number_of_operations = len(symmetry["N"])
+    eset, C = Gk.shape[0], Gk.shape[-1]
+    T = symmetry["W"].shape[1]
+    wk = wk / number_of_operations
+    Gii, Gij, Gji = holders
+
+    # the operations are done in chunks, so the rotated Greens functions
+    # are not larger than the Greens function in the support
+    size = max(1, (C * C) // (T * T))
+    for chunk in np.array_split(
+        np.arange(number_of_operations), np.ceil(number_of_operations / size)
+    ):
+        n = len(chunk)
+        Nk = symmetry["N"][chunk] @ k
+        phases = np.exp(
+            1j
+            * 2
+            * np.pi
+            * np.einsum("ocx,ox->oc", symmetry["orbital_shifts"][chunk], Nk)
+        )
+        W_k = symmetry["W"][chunk] * phases[:, None, :]
+
+        # G U^dagger of all the operations in one matrix product
+        GW = Gk.reshape(eset * C, C) @ W_k.conj().transpose(2, 0, 1).reshape(C, n * T)
+        GW = GW.reshape(eset, C, n, T).transpose(2, 1, 0, 3).reshape(n, C, eset * T)
+        G_rot = (W_k @ GW).reshape(n, T, eset, T).transpose(0, 2, 1, 3)
+
+        # the time reversed operations give the transpose in -k
+        theta = symmetry["theta"][chunk]
+        G_rot = np.where(theta[:, None, None, None], G_rot.swapaxes(2, 3), G_rot)
+        Nk[theta] *= -1
+
+        for G, idx in zip(Gii, setup["mag_ent_idx"]):
+            G[energies] += onsite_projection(G_rot, idx, idx).sum(axis=0) * wk
+
+        for G1, G2, (idx1, idx2), shift in zip(
+            Gij, Gji, setup["pair_idx"], setup["supercell_shifts"]
+        ):
+            # add phase shift based on the cell difference
+            phase: NDArray = np.exp(1j * 2 * np.pi * Nk @ shift.T)
+            G1[energies] += (
+                np.einsum("o,oeab->eab", phase, onsite_projection(G_rot, idx1, idx2))
+                * wk
+            )
+            G2[energies] += (
+                np.einsum(
+                    "o,oeab->eab", 1 / phase, onsite_projection(G_rot, idx2, idx1)
+                )
+                * wk
+            )
+
+
+def _gather(
+    setup: dict, holders: tuple[list[NDArray], list[NDArray], list[NDArray]]
+) -> dict:
+    """The indices of the holders in the flattened Greens function of a k point.
+
+    Every magnetic entity and pair is gathered from the Greens function by
+    one indexing, instead of two projections for every holder.
+
+    Parameters
+    ----------
+    setup: dict
+        The setup of the sampling
+    holders: tuple[list[NDArray], list[NDArray], list[NDArray]]
+        The Greens function holders of the magnetic entities and pairs
+
+    Returns
+    -------
+    dict
+        The indices of the Gii, Gij and Gji holders, the pair of every index
+        of the pairs, the supercell shifts and the buffers of the holders
+    """
+
+    # the full Greens function or the union of the spin boxes is sampled
+    if setup["solver"] in ("parallel", "sequential"):
+        size = setup["S"].shape[-2]
+    else:
+        size = len(setup["columns"])
+
+    def flat(idx1: NDArray, idx2: NDArray) -> NDArray:
+        return (np.reshape(idx1, (-1, 1)) * size + idx2).ravel()
+
+    empty = [np.zeros(0, dtype=int)]
+    Gij_index = [flat(idx1, idx2) for idx1, idx2 in setup["pair_idx"]]
+    return dict(
+        index=[
+            np.concatenate([flat(idx, idx) for idx in setup["mag_ent_idx"]] + empty),
+            np.concatenate(Gij_index + empty),
+            np.concatenate(
+                [flat(idx2, idx1) for idx1, idx2 in setup["pair_idx"]] + empty
+            ),
+        ],
+        pairs=np.repeat(np.arange(len(Gij_index)), [len(i) for i in Gij_index]),
+        shifts=np.reshape(setup["supercell_shifts"], (-1, 3)),
+        buffers=[_holder_buffer(holder) for holder in holders],
+    )
+
+
+def _add_projections(
+    setup: dict,
+    holders: tuple[list[NDArray], list[NDArray], list[NDArray]],
+    Gk: NDArray,
+    k: NDArray,
+    wk: float,
+    energies: slice = slice(None),
+    gather: Union[dict, None] = None,
+) -> None:
+    """Adds the weighted projections of the Greens function to the holders.
+
+    Parameters
+    ----------
+    setup: dict
+        The setup of the sampling
+    holders: tuple[list[NDArray], list[NDArray], list[NDArray]]
+        The Greens function holders of the magnetic entities and pairs
+    Gk: NDArray
+        Greens function samples at the given k point
+    k: NDArray
+        The k point
+    wk: float
+        The weight of the k point in the Brillouin zone integral
+    energies: slice, optional
+        The energy samples that are contained in ``Gk``, by default all
+    gather: Union[dict, None], optional
+        The indices from ``_gather``, by default they are calculated
+    """
+
+    if gather is None:
+        gather = _gather(setup, holders)
+
+    # add phase shift based on the cell difference
+    phase: NDArray = np.exp(1j * 2 * np.pi * gather["shifts"] @ k)
+    factors = (wk, (phase * wk)[gather["pairs"]], (wk / phase)[gather["pairs"]])
+
+    Gk = Gk.reshape(len(Gk), -1)
+    for holder, buffer, index, factor in zip(
+        holders, gather["buffers"], gather["index"], factors
+    ):
+        values = np.take(Gk, index, axis=1)
+        values *= factor
+        # the holders are accumulated in place of their buffer
+        if buffer is not None:
+            buffer[0][energies, buffer[1]] += values
+        else:
+            offset = 0
+            for G in holder:
+                G[energies] += values[:, offset : offset + G[0].size].reshape(
+                    -1, *G.shape[1:]
+                )
+                offset += G[0].size
+
+
+def _add_fft_projections(
+    setup: dict,
+    holders: tuple[list[NDArray], list[NDArray], list[NDArray]],
+    Gk: NDArray,
+    k: NDArray,
+    wk: float,
+    energies: slice = slice(None),
+    table: Union[NDArray, None] = None,
+) -> None:
+    """Adds the weighted Greens function to the table of the regular k grid.
+
+    The magnetic entities are added to the holders, the pairs are calculated
+    from the table by ``_fft_pairs``.
+
+    Parameters
+    ----------
+    setup: dict
+        The setup of the sampling
+    holders: tuple[list[NDArray], list[NDArray], list[NDArray]]
+        The Greens function holders of the magnetic entities and pairs
+    Gk: NDArray
+        Greens function samples at the given k point
+    k: NDArray
+        The k point
+    wk: float
+        The weight of the k point in the Brillouin zone integral
+    energies: slice, optional
+        The energy samples that are contained in ``Gk``, by default all
+    table: Union[NDArray, None], optional
+        The Greens function in the union of the spin box indices on the grid
+    """
+
+    # the full Greens function is projected to the union of the spin boxes
+    if setup["solver"] in ("parallel", "sequential"):
+        columns = setup["columns"]
+        Gk = Gk[:, columns.reshape(-1, 1), columns]
+
+    # store the Greens function slice of the magnetic entities
+    for G, idx in zip(holders[0], setup["mag_ent_idx"]):
+        G[energies] += onsite_projection(Gk, idx, idx) * wk
+
+    index = tuple(np.rint(k * setup["kset"]).astype(int) % setup["kset"])
+    table[index][energies] += Gk * wk
+
+
+def _fft_pairs(
+    setup: dict,
+    holders: tuple[list[NDArray], list[NDArray], list[NDArray]],
+    table: NDArray,
+) -> None:
+    """Adds the Greens functions of the pairs from the table of the regular k grid.
+
+    The Fourier transform of the table over the k axes gives the Greens
+    function between the unit cell and every supercell shift at once, so
+    every pair is a lookup instead of a phase factor in every k point.
+
+    Parameters
+    ----------
+    setup: dict
+        The setup of the sampling
+    holders: tuple[list[NDArray], list[NDArray], list[NDArray]]
+        The Greens function holders of the magnetic entities and pairs
+    table: NDArray
+        The Greens function in the union of the spin box indices on the grid
+    """
+
+    kset = setup["kset"]
+    # sum over k of the table with exp(i 2 pi k R) for every R of the grid
+    GR = scipy.fft.ifftn(table, axes=(0, 1, 2), overwrite_x=True) * kset.prod()
+
+    for G1, G2, (idx1, idx2), shift in zip(
+        holders[1], holders[2], setup["pair_idx"], setup["supercell_shifts"]
+    ):
+        shift = np.asarray(shift, dtype=int)
+        G1 += onsite_projection(GR[tuple(shift % kset)], idx1, idx2)
+        G2 += onsite_projection(GR[tuple(-shift % kset)], idx2, idx1)
+
+
+def _eigen_cache(
+    builder: "Builder",
+    i: int,
+    setup: dict,
+    read: bool = False,
+    share: Union[Callable, None] = None,
+) -> dict:
+    """Prepares the cache of the eigen decompositions of a reference direction.
+
+    The eigenvalues and eigenvectors are stored in memory mapped ``.npy``
+    files, indexed by the position of the k point on the grid of the
+    Kspace, so every worker can write its own k points. The k points of the
+    setup are saved too, so the cache is only read for the same sampling.
+
+    Parameters
+    ----------
+    builder: Builder
+        The main grogupy object
+    i: int
+        The index of the reference direction
+    setup: dict
+        The setup of the sampling
+    read: bool, optional
+        If it is True, then the existing cache is read, otherwise it is
+        created, by default False
+    share: Union[Callable, None], optional
+        It synchronizes the MPI ranks after the root node created the
+        cache, by default None
+
+    Returns
+    -------
+    dict
+        The folder, the grid and the mode of the cache
+    """
+
+    path = os.path.join(builder.eigen_cache, f"orientation_{i}")
+    kset = builder.kspace.kset
+    if not kpoints_on_kset(setup["kpoints"], kset).all():
+        raise Exception("The eigen cache needs the k points of the regular grid!")
+
+    if read:
+        try:
+            kpoints = np.load(os.path.join(path, "kpoints.npy"))
+        except FileNotFoundError:
+            raise Exception(f"There is no eigen cache in {path}!")
+        if kpoints.shape != setup["kpoints"].shape or not np.allclose(
+            kpoints, setup["kpoints"]
+        ):
+            raise Exception(f"The eigen cache in {path} has different k points!")
+    else:
+        # the files are created once, the MPI ranks wait for the root node
+        if share is None or rank == root_node:
+            os.makedirs(path, exist_ok=True)
+            NK, NO = int(kset.prod()), int(builder.hamiltonian.NO)
+            open_memmap(
+                os.path.join(path, "eigenvalues.npy"),
+                mode="w+",
+                dtype="float64",
+                shape=(NK, NO),
+            )
+            open_memmap(
+                os.path.join(path, "eigenvectors.npy"),
+                mode="w+",
+                dtype="complex128",
+                shape=(NK, NO, NO),
+            )
+            np.save(os.path.join(path, "kpoints.npy"), setup["kpoints"])
+        if share is not None:
+            share(None)
+
+    return dict(path=path, kset=kset, read=read)
+
+
+def _open_eigen_cache(cache: Union[dict, None]) -> Union[tuple[NDArray, NDArray], None]:
+    """Opens the memory mapped eigenvalues and eigenvectors of the cache."""
+
+    if cache is None:
+        return None
+
+    mode = "r" if cache["read"] else "r+"
+    return (
+        np.load(os.path.join(cache["path"], "eigenvalues.npy"), mmap_mode=mode),
+        np.load(os.path.join(cache["path"], "eigenvectors.npy"), mmap_mode=mode),
+    )
+
+
+def _cache_index(cache: dict, k: NDArray) -> int:
+    """The position of the k point on the grid of the cache."""
+
+    kset = cache["kset"]
+    return int(np.ravel_multi_index(tuple(np.rint(k * kset).astype(int) % kset), kset))
+
+
+def _sample_kpoints(
+    setup: dict,
+    holders: tuple[list[NDArray], list[NDArray], list[NDArray]],
+    kpoints: NDArray,
+    weights: NDArray,
+) -> tuple[list[NDArray], list[NDArray], list[NDArray]]:
+    """Samples the integrand on the contour in the given k points.
+
+    It uses the `greens_function_solver` of the setup, which controls the
+    solution method over the energy samples. When the setup contains the
+    rotations of the exchange field, the holders of the reference
+    directions follow each other and every reference direction is sampled
+    in the same k point, so the Fourier transforms are shared.
+
+    Parameters
+    ----------
+    setup: dict
+        The setup of the sampling
+    holders: tuple[list[NDArray], list[NDArray], list[NDArray]]
+        The Greens function holders of the magnetic entities and pairs
+    kpoints: NDArray
+        The k points, it can be wrapped in a progress bar
+    weights: NDArray
+        The weights of the k points in the Brillouin zone integral
+
+    Returns
+    -------
+    tuple[list[NDArray], list[NDArray], list[NDArray]]
+        The filled holders
+    """
+
+    solver = setup["solver"]
+    samples = setup["samples"]
+    columns = setup["columns"]
+    eset = len(samples)
+    rotations = setup["rotations"]
+    views = _split_holders(holders, 1 if rotations is None else len(rotations))
+
+    # the star of the irreducible k points is added with the symmetries
+    if setup["symmetry"] is not None:
+        projections = [_add_symmetric_projections]
+    # the Greens functions of the pairs are collected on the regular grid
+    elif setup["fft"]:
+        tables = [
+            np.zeros(
+                (*setup["kset"], eset, len(columns), len(columns)), dtype="complex128"
+            )
+            for _ in views
+        ]
+        projections = [
+            functools.partial(_add_fft_projections, table=table) for table in tables
+        ]
+    # every holder is gathered from the Greens function at once
+    else:
+        projections = [
+            functools.partial(_add_projections, gather=_gather(setup, view))
+            for view in views
+        ]
+
+    # the eigen decompositions are written to or read from the cache
+    caches = [None] * len(views) if setup["cache"] is None else setup["cache"]
+    mapped = [_open_eigen_cache(cache) for cache in caches]
+    read = all(cache is not None and cache["read"] for cache in caches)
+
+    for j, k in enumerate(kpoints):
+
+        # weight of k point in BZ integral
+        wk: float = weights[j]
+
+        # calculate Hamiltonian and Overlap matrix in a given k point
+        if read:
+            Hks, Sk = [None] * len(views), None
+        elif solver == "sparse":
+            Hk, Sk = sparse_hsk(setup["H_csr"], setup["S_csr"], setup["sc_off"], k)
+            Hks = [Hk]
+        elif rotations is None:
+            Hk, Sk = hsk(setup["H"], setup["S"], setup["sc_off"], k)
+            Hks = [Hk]
+        else:
+            Hks, Sk = rotated_hsk(
+                setup["H"], setup["XCF"], setup["S"], setup["sc_off"], rotations, k
+            )
+
+        for Hk, view, add_projections, cache, arrays in zip(
+            Hks, views, projections, caches, mapped
+        ):
+            # Calculates the Greens function on all the energy levels
+            if solver == "parallel":
+                Gk = np.linalg.inv(Sk * samples.reshape(eset, 1, 1) - Hk)
+                add_projections(setup, view, Gk, k, wk)
+
+            # solve Greens function sequentially for the energies, because of memory bound
+            elif solver == "sequential":
+                # make chunks for reduced parallelization over energy sample points
+                number_of_chunks = np.floor(eset / setup["max_g_per_loop"]) + 1
+                # constrain to sensible size
+                if number_of_chunks > eset:
+                    number_of_chunks = eset
+
+                # create batches using slices on every instance
+                slices = np.array_split(range(eset), number_of_chunks)
+                # fills the holders sequentially by the Greens function slices on
+                # a given energy
+                for slice in slices:
+                    Gk = np.linalg.inv(
+                        Sk * samples[slice].reshape(len(slice), 1, 1) - Hk
+                    )
+                    add_projections(setup, view, Gk, k, wk, slice)
+
+            # solve only for the columns of the magnetic entities
+            elif solver == "columns":
+                Gk = greens_function_columns(Hk, Sk, samples, columns)
+                add_projections(setup, view, Gk, k, wk)
+
+            # one diagonalisation is reused on all the energy levels
+            elif solver == "eigen":
+                if cache is None:
+                    Gk = greens_function_eigen(Hk, Sk, samples, columns)
+                else:
+                    index = _cache_index(cache, k)
+                    if cache["read"]:
+                        eigenvalues, eigenvectors = arrays[0][index], arrays[1][index]
+                    else:
+                        eigenvalues, eigenvectors = eigh(Hk, Sk)
+                        arrays[0][index] = eigenvalues
+                        arrays[1][index] = eigenvectors
+                    Gk = spectral_greens_function(
+                        eigenvalues, eigenvectors[columns], samples
+                    )
+                add_projections(setup, view, Gk, k, wk)
+
+            # sparse LU factorisation for large and sparse Hamiltonians
+            elif solver == "sparse":
+                Gk = greens_function_sparse(Hk, Sk, samples, columns)
+                add_projections(setup, view, Gk, k, wk)
+
+            # recursive Greens function for layered systems
+            elif solver == "recursive":
+                Gk = greens_function_recursive(
+                    Hk, Sk, samples, columns, setup["layers"]
+                )
+                add_projections(setup, view, Gk, k, wk)
+
+            else:
+                raise Exception("Unknown Green's function solver!")
+
+    if setup["fft"]:
+        for view, table in zip(views, tables):
+            _fft_pairs(setup, view, table)
+
+    return holders
+
+
+def _split_holders(
+    holders: tuple[list[NDArray], list[NDArray], list[NDArray]], parts: int
+) -> list[tuple[list[NDArray], list[NDArray], list[NDArray]]]:
+    """Splits the holders of consecutive reference directions.
+
+    The returned holders are views of the same arrays, so they can be
+    filled in place.
+    """
+
+    return [
+        tuple(
+            holder[i * len(holder) // parts : (i + 1) * len(holder) // parts]
+            for holder in holders
+        )
+        for i in range(parts)
+    ]
+
+
+@contextlib.contextmanager
+def _deduplicated(builder: "Builder") -> Iterator[None]:
+    """Solves only one pair of every reverse pair partners.
+
+    The Greens functions of the pair (j, i, -R) are the Greens functions of
+    the pair (i, j, R) with the roles of the magnetic entities swapped, so
+    inside the context the builder only contains the first pair. The reverse
+    pairs have no holders, so they are not projected, accumulated, reduced
+    or fitted. Their results are filled from their partners at the end.
+
+    Parameters
+    ----------
+    builder: Builder
+        The main grogupy object
+    """
+
+    from grogupy.physics import PairList
+
+    pairs = builder.pairs
+    partners = pairs.reverse_partners()
+    builder.pairs = PairList(
+        [pair for pair, partner in zip(pairs, partners) if partner is None]
+    )
+    try:
+        yield
+    finally:
+        builder.pairs = pairs
+
+    if builder.spin_model in ("isotropic-only", "isotropic-biquadratic-only"):
+        rotations = 1
+    else:
+        rotations = 2
+    for pair, partner in zip(pairs, partners):
+        if partner is not None:
+            _reverse_pair(pair, pairs[partner], rotations)
+
+
+def _reverse_pair(pair: "Pair", partner: "Pair", rotations: int) -> None:
+    """Fills the results of a pair from its reverse partner.
+
+    The roles of the magnetic entities are swapped, so the Greens functions
+    are swapped and the energies and the exchange tensor are transposed,
+    J_ji = J_ij^T.
+
+    Parameters
+    ----------
+    pair: Pair
+        The pair (j, i, -R)
+    partner: Pair
+        The solved pair (i, j, R)
+    rotations: int
+        The number of rotations on the sites in the energies
+    """
+
+    pair._Gij = list(partner._Gji)
+    pair._Gji = list(partner._Gij)
+    if partner.energies is not None:
+        energies = np.reshape(partner.energies, (-1, rotations, rotations))
+        pair.energies = energies.swapaxes(1, 2).reshape(np.shape(partner.energies))
+    if partner.J is not None:
+        pair._dump_exchange_tensor(
+            partner.J_iso, partner.J_S.T, -partner.D, partner.J.T
+        )
+    elif partner.J_iso is not None:
+        pair._dump_exchange_tensor(partner.J_iso, None, None, None)
+    pair.J_error_meV = partner.J_error_meV
+    if np.ndim(partner.J_error_meV) == 2:
+        pair.J_error_meV = partner.J_error_meV.T
+
+
+def _sample_kpoints_threads(
+    builder: "Builder", setup: dict, desc: str = ""
+) -> tuple[list[NDArray], list[NDArray], list[NDArray]]:
+    """Samples the integrand in the k points on a pool of threads.
+
+    The k points are split to contiguous chunks and every chunk is summed
+    to its own holders. The partial results are reduced in the order of the
+    chunks, so the result does not depend on the scheduling of the threads.
+
+    Parameters
+    ----------
+    builder: Builder
+        The main grogupy object
+    setup: dict
+        The setup of the sampling
+    desc: str, optional
+        Description of the progress bar, by default ""
+
+    Returns
+    -------
+    tuple[list[NDArray], list[NDArray], list[NDArray]]
+        The reduced holders
+    """
+
+    chunks = _kpoint_chunks(builder, setup)
+
+    def work(chunk):
+        return _sample_kpoints(
+            setup,
+            _empty_holders(setup["shapes"]),
+            setup["kpoints"][chunk],
+            setup["weights"][chunk],
+        )
+
+    holders = _empty_holders(setup["shapes"])
+    with ThreadPoolExecutor(max_workers=builder.max_workers) as executor:
+        for partial in _tqdm(executor.map(work, chunks), total=len(chunks), desc=desc):
+            _reduce_holders(holders, partial)
+
+    return holders
+
+
+# the arrays that are shared between the processes instead of copied
+_SHARED_KEYS = ("H", "S", "sc_off", "XCF")
+
+# the setup of the sampling in a worker process
+_process_setup: dict = {}
+
+
+def _share_setup(setup: dict) -> tuple[dict, list[SharedMemory]]:
+    """Moves the large arrays of the setup to shared memory blocks.
+
+    Parameters
+    ----------
+    setup: dict
+        The setup of the sampling
+
+    Returns
+    -------
+    worker_setup: dict
+        The setup without the shared arrays, which is sent to the workers
+    blocks: list[SharedMemory]
+        The shared memory blocks, which must be closed and unlinked
+    """
+
+    worker_setup = {
+        key: value for key, value in setup.items() if key not in _SHARED_KEYS
+    }
+    worker_setup["shared"] = {}
+    blocks = []
+    try:
+        for key in [key for key in _SHARED_KEYS if key in setup]:
+            value = setup[key]
+            if issparse(value):
+                # the compressed matrices are shared by their arrays and
+                # they are built again in the workers
+                value = value.tocsr()
+                value.sum_duplicates()
+                arrays = (value.data, value.indices, value.indptr)
+                worker_setup["shared"][key] = (
+                    value.shape,
+                    [_share_array(array, blocks) for array in arrays],
+                )
+            else:
+                worker_setup["shared"][key] = (None, [_share_array(value, blocks)])
+    except Exception:
+        _release_shared(blocks)
+        raise
+
+    return worker_setup, blocks
+
+
+def _share_array(array: NDArray, blocks: list[SharedMemory]) -> tuple:
+    """Copies the array to a new shared memory block.
+
+    Parameters
+    ----------
+    array: NDArray
+        The shared array
+    blocks: list[SharedMemory]
+        The new block is appended to the shared memory blocks
+
+    Returns
+    -------
+    tuple
+        The name of the block, the shape and the dtype of the array
+    """
+
+    array = np.ascontiguousarray(array)
+    block = SharedMemory(create=True, size=max(array.nbytes, 1))
+    blocks.append(block)
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+
+    return block.name, array.shape, array.dtype.str
+
+
+def _release_shared(blocks: list[SharedMemory]) -> None:
+    """Closes and unlinks the shared memory blocks."""
+
+    for block in blocks:
+        block.close()
+        block.unlink()
+
+
+def _init_process_worker(worker_setup: dict) -> None:
+    """Attaches the worker process to the shared memory blocks of the setup."""
+
+    global _process_setup
+
+    _process_setup = dict(worker_setup)
+    # keep the blocks referenced, so the views stay valid
+    _process_setup["blocks"] = []
+    for key, (shape, arrays) in worker_setup["shared"].items():
+        views = []
+        for name, array_shape, dtype in arrays:
+            block = SharedMemory(name=name)
+            _process_setup["blocks"].append(block)
+            views.append(np.ndarray(array_shape, dtype=dtype, buffer=block.buf))
+        if shape is None:
+            _process_setup[key] = views[0]
+        else:
+            _process_setup[key] = csr_matrix(tuple(views), shape=shape)
+
+
+def _process_work(
+    kpoints: NDArray, weights: NDArray
+) -> tuple[list[NDArray], list[NDArray], list[NDArray]]:
+    """Samples a chunk of k points in a worker process."""
+
+    return _sample_kpoints(
+        _process_setup,
+        _empty_holders(_process_setup["shapes"]),
+        kpoints,
+        weights,
+    )
+
+
+def _sample_kpoints_processes(
+    builder: "Builder", setup: dict, desc: str = ""
+) -> tuple[list[NDArray], list[NDArray], list[NDArray]]:
+    """Samples the integrand in the k points on a pool of processes.
+
+    The Hamiltonian, the overlap matrix and the supercell shifts are put to
+    shared memory, so the workers do not get their own copy of them. Only
+    the k points and the small partial holders are sent between the
+    processes. The partial results are reduced in the order of the chunks,
+    so the result does not depend on the scheduling of the processes.
+
+    Parameters
+    ----------
+    builder: Builder
+        The main grogupy object
+    setup: dict
+        The setup of the sampling
+    desc: str, optional
+        Description of the progress bar, by default ""
+
+    Returns
+    -------
+    tuple[list[NDArray], list[NDArray], list[NDArray]]
+        The reduced holders
+    """
+
+    chunks = _kpoint_chunks(builder, setup)
+    kpoints = [setup["kpoints"][chunk] for chunk in chunks]
+    weights = [setup["weights"][chunk] for chunk in chunks]
+
+    holders = _empty_holders(setup["shapes"])
+    worker_setup, blocks = _share_setup(setup)
+    try:
+        with ProcessPoolExecutor(
+            max_workers=builder.max_workers,
+            initializer=_init_process_worker,
+            initargs=(worker_setup,),
+        ) as executor:
+            for partial in _tqdm(
+                executor.map(_process_work, kpoints, weights),
+                total=len(chunks),
+                desc=desc,
+            ):
+                _reduce_holders(holders, partial)
+    finally:
+        _release_shared(blocks)
+
+    return holders
+
+
+def _kpoint_chunks(builder: "Builder", setup: dict) -> list[NDArray]:
+    """Splits the k points of the setup to contiguous chunks for the workers."""
+
+    NK = len(setup["kpoints"])
+    # more chunks than workers, so the load is balanced
+    number_of_chunks = min(NK, 4 * builder.max_workers)
+
+    return np.array_split(np.arange(NK), number_of_chunks)
+
+
+def _reduce_holders(
+    holders: tuple[list[NDArray], list[NDArray], list[NDArray]],
+    partial: tuple[list[NDArray], list[NDArray], list[NDArray]],
+) -> None:
+    """Adds the partial holders to the holders in place."""
+
+    for total, part in zip(holders, partial):
+        buffers = _holder_buffer(total), _holder_buffer(part)
+        if all(buffer is not None for buffer in buffers):
+            buffers[0][0][:, buffers[0][1]] += buffers[1][0][:, buffers[1][1]]
+            continue
+        for G, G_part in zip(total, part):
+            G += G_part
+
+
+def _time_reversal(builder: "Builder") -> None:
+    """Adds the contribution of the -k partners to the sampled Greens functions.
+
+    When the Hamiltonian is real in real space G(-k) is the transpose of
+    G(k), so the -k partner of the pair contributions is the transpose of
+    the reversed pair. Averaging the sampled and the partner contributions
+    gives the full Brillouin zone integral from the reduced k points with
+    doubled weights.
+    """
+
+    for mag_ent in builder.magnetic_entities:
+        Gii = mag_ent._Gii_tmp
+        Gii += Gii.swapaxes(1, 2).copy()
+        Gii /= 2
+
+    for pair in builder.pairs:
+        Gij, Gji = pair._Gij_tmp, pair._Gji_tmp
+        Gij_partner = Gji.swapaxes(1, 2).copy()
+        Gji += Gij.swapaxes(1, 2)
+        Gji /= 2
+        Gij += Gij_partner
+        Gij /= 2
+
+
+def _setup_perturbations(
+    builder: "Builder", rot_H: "Hamiltonian", orient: dict
+) -> None:
+    """Sets up the perturbations perpendicular to the quantization axis.
+
+    Parameters
+    ----------
+    builder: Builder
+        The main grogupy object
+    rot_H: Hamiltonian
+        The rotated Hamiltonian
+    orient: dict
+        The reference direction and the perpendicular directions
+    """
+
+    # section 2.H
+    H_XCF = supercell_block(rot_H.extract_exchange_field()[3], rot_H.uc_in_sc_index)
+    # these are the rotations perpendicular to the quantization axis
+    for u in orient["vw"]:
+        for mag_ent in _tqdm(
+            builder.magnetic_entities,
+            desc="Setup perturbations for rotated hamiltonian",
+        ):
+            # the perturbed potentials are only needed on-site
+            Vu1, Vu2 = calc_onsite_Vu(H_XCF, u, mag_ent._spin_box_indices)
+            mag_ent._Vu1_tmp.append(Vu1)
+            mag_ent._Vu2_tmp.append(Vu2)
+
+
+# the number of elements of the intermediate products in a batch of
+# magnetic entities or pairs
+_ENERGY_BATCH_SIZE = 2**24
+
+
+def _pair_energies(builder: "Builder", weights: NDArray) -> NDArray:
+    """Calculates the energies of the rotations of all the pairs.
+
+    The pairs with the same spin box sizes are calculated together in
+    batches by ``interaction_energies``, from the temporary storages of the
+    magnetic entities and pairs.
+
+    Parameters
+    ----------
+    builder: Builder
+        The main grogupy object
+    weights: NDArray
+        The weights of the samples with shape (eset,) or (s, eset)
+
+    Returns
+    -------
+    NDArray
+        The energies with shape (pairs, a, a) or (pairs, s, a, a), where a is
+        the number of rotations on the sites
+    """
+
+    # all possible orientations without the orientation for the off-diagonal
+    # anisotropy, that is why we only take the first two of each Vu1
+    if builder.spin_model in ("isotropic-only", "isotropic-biquadratic-only"):
+        rotations = 1
+    else:
+        rotations = 2
+
+    pairs = builder.pairs
+    energies = np.zeros((len(pairs), *np.shape(weights)[:-1], rotations, rotations))
+    groups: dict = {}
+    for i, pair in enumerate(pairs):
+        groups.setdefault((pair.SBS1, pair.SBS2), []).append(i)
+
+    for (SBS1, SBS2), group in groups.items():
+        size = _ENERGY_BATCH_SIZE // (rotations * np.shape(weights)[-1] * SBS1 * SBS2)
+        for start in range(0, len(group), max(1, size)):
+            batch = group[start : start + max(1, size)]
+            energies[batch] = interaction_energies(
+                np.array([pairs[i].M1._Vu1_tmp[:rotations] for i in batch]),
+                np.array([pairs[i].M2._Vu1_tmp[:rotations] for i in batch]),
+                np.array([pairs[i]._Gij_tmp for i in batch]),
+                np.array([pairs[i]._Gji_tmp for i in batch]),
+                weights,
+            )
+
+    return energies
+
+
+def _magnetic_entity_energies(
+    builder: "Builder", weights: NDArray, kernel: Callable = anisotropy_energies
+) -> NDArray:
+    """Calculates the energies of the rotations of all the magnetic entities.
+
+    The magnetic entities with the same spin box sizes are calculated
+    together in batches, from the temporary storages of the magnetic
+    entities.
+
+    Parameters
+    ----------
+    builder: Builder
+        The main grogupy object
+    weights: NDArray
+        The weights of the samples with shape (eset,) or (s, eset)
+    kernel: Callable, optional
+        It calculates the energies of a batch from the first and second order
+        perturbations, the Greens functions and the weights, by default
+        ``anisotropy_energies``
+
+    Returns
+    -------
+    NDArray
+        The energies of the magnetic entities along the first axis
+    """
+
+    mag_ents = builder.magnetic_entities
+    groups: dict = {}
+    for i, mag_ent in enumerate(mag_ents):
+        groups.setdefault(mag_ent.SBS, []).append(i)
+
+    energies: Union[NDArray, None] = None
+    for SBS, group in groups.items():
+        size = max(
+            1,
+            _ENERGY_BATCH_SIZE
+            // (len(mag_ents[group[0]]._Vu1_tmp) * np.shape(weights)[-1] * SBS**2),
+        )
+        for start in range(0, len(group), size):
+            batch = group[start : start + size]
+            result = kernel(
+                np.array([mag_ents[i]._Vu1_tmp for i in batch]),
+                np.array([mag_ents[i]._Vu2_tmp for i in batch]),
+                np.array([mag_ents[i]._Gii_tmp for i in batch]),
+                weights,
+            )
+            if energies is None:
+                energies = np.zeros((len(mag_ents), *result.shape[1:]))
+            energies[batch] = result
+
+    if energies is None:
+        return np.zeros(0)
+    return energies
+
+
+def _contour_errors(builder: "Builder") -> NDArray:
+    """The estimated integration errors of the energies on the contour segments.
+
+    The error of a segment is the difference of the energies integrated by
+    the Kronrod and the embedded Gauss rule on the segment. It uses the
+    perturbations and the integrated Greens functions of the current
+    reference direction.
+
+    Parameters
+    ----------
+    builder: Builder
+        The main grogupy object
+
+    Returns
+    -------
+    NDArray
+        The errors in meV with shape (number of segments, number of energies)
+    """
+
+    contour = builder.contour
+    dw = contour.weights - contour.gauss_weights
+    segments = np.array_split(np.arange(len(dw)), len(contour.segments))
+    isotropic = builder.spin_model in (
+        "isotropic-only",
+        "isotropic-biquadratic-only",
+    )
+
+    # the weights of the segments, the pairs are calculated at once
+    segment_weights = np.zeros((len(segments), len(dw)))
+    for i, seg in enumerate(segments):
+        segment_weights[i, seg] = dw[seg]
+    errors = [_pair_energies(builder, segment_weights).swapaxes(0, 1)]
+
+    # the second order energies of all the rotations and the interaction
+    # energies of the first two rotations
+    def kernel(Vu1, Vu2, Gii, weights):
+        second, mixed = onsite_energies(Vu1, Vu2, Gii, weights)
+        return np.concatenate(
+            (second, mixed[..., 0, 1, None], mixed[..., 1, 0, None]), axis=-1
+        )
+
+    if not isotropic:
+        mag_ent_errors = _magnetic_entity_energies(builder, segment_weights, kernel)
+        errors.insert(0, mag_ent_errors.swapaxes(0, 1))
+
+    errors = [error.reshape(len(segments), -1) for error in errors]
+    return np.abs(np.concatenate(errors, axis=1)) * 1e3
+
+
+# the maximum number of refinements of the adaptive contour
+_MAX_REFINEMENTS = 20
+
+
+def _refine_contour(
+    builder: "Builder",
+    setup: dict,
+    sample: Callable,
+    share: Union[Callable, None] = None,
+) -> None:
+    """Refines the adaptive contour until the energies are converged.
+
+    The energies are converged, when the sum of the estimated errors of the
+    segments is below the tolerance of the contour for every energy. Until
+    then the segments with larger error than their share of the tolerance
+    are bisected. Only the new samples are calculated, the Greens functions
+    of the unchanged segments are kept.
+
+    Parameters
+    ----------
+    builder: Builder
+        The main grogupy object
+    setup: dict
+        The setup of the sampling
+    sample: Callable
+        It samples the integrand of a setup to the given holders
+    share: Union[Callable, None], optional
+        It shares the refined segments from the root node, by default None
+    """
+
+    contour = builder.contour
+    for refinement in range(_MAX_REFINEMENTS + 1):
+        errors = _contour_errors(builder)
+        if (errors.sum(axis=0) <= contour.tolerance).all():
+            refine = np.zeros(len(contour.segments), dtype=bool)
+        else:
+            refine = (errors > contour.tolerance / len(contour.segments)).any(axis=1)
+        if share is not None:
+            refine = share(refine)
+        if not refine.any():
+            break
+        if refinement == _MAX_REFINEMENTS:
+            warnings.warn(
+                f"The adaptive contour did not converge in {_MAX_REFINEMENTS} refinements!"
+            )
+            break
+
+        # the samples of the kept segments come first in the holders
+        kept = np.repeat(~refine, len(contour.samples) // len(contour.segments))
+        new = np.repeat(
+            contour.refine(refine), len(contour.samples) // len(contour.segments)
+        )
+        new_setup = dict(setup, samples=contour.samples[new])
+        new_setup["shapes"] = _holder_shapes(builder, new.sum())
+        holders = _empty_holders(new_setup["shapes"])
+        sample(new_setup, holders)
+
+        def merge(G_old, G_new):
+            G = np.empty((len(new), *G_new.shape[1:]), dtype=G_new.dtype)
+            G[~new] = G_old[kept]
+            G[new] = G_new
+            return G
+
+        for mag_ent, Gii in zip(builder.magnetic_entities, holders[0]):
+            mag_ent._Gii_tmp = merge(mag_ent._Gii_tmp, Gii)
+        for pair, Gij, Gji in zip(builder.pairs, holders[1], holders[2]):
+            pair._Gij_tmp = merge(pair._Gij_tmp, Gij)
+            pair._Gji_tmp = merge(pair._Gji_tmp, Gji)
+
+        if setup["trs"]:
+            _time_reversal(builder)
+
+
+def _orientation_energies(
+    builder: "Builder", weights: Union[NDArray, None] = None
+) -> None:
+    """Appends the energies of the rotations in the current reference direction.
+
+    It uses the perturbations and the integrated Greens functions from the
+    temporary storages of the magnetic entities and pairs.
+
+    Parameters
+    ----------
+    builder: Builder
+        The main grogupy object
+    weights: Union[NDArray, None], optional
+        The weights of the samples in the temporary storages, by default the
+        weights of the contour
+    """
+
+    if weights is None:
+        weights = builder.contour.weights
+
+    pair_energies = _pair_energies(builder, weights)
+    if (
+        builder.spin_model == "isotropic-only"
+        or builder.spin_model == "isotropic-biquadratic-only"
+    ):
+        for pair, energies in zip(builder.pairs, pair_energies):
+            pair.energies = energies
+    else:
+        # calculate energies in the current reference hamiltonian direction
+        mag_ent_energies = _magnetic_entity_energies(
+            builder,
+            weights,
+            functools.partial(
+                anisotropy_energies,
+                third_direction=builder.spin_model == "generalised-grogu",
+            ),
+        )
+        for mag_ent, energies in zip(builder.magnetic_entities, mag_ent_energies):
+            if mag_ent.energies is None:
+                mag_ent.energies = energies
+            else:
+                mag_ent.energies = np.vstack((mag_ent.energies, energies))
+        for pair, energies in zip(builder.pairs, pair_energies):
+            if pair.energies is None:
+                pair.energies = energies.ravel()
+            else:
+                pair.energies = np.vstack((pair.energies, energies.ravel()))
+
+
+def _stream_orientation(
+    builder: "Builder", setup: dict, sample: Callable, desc: str = ""
+) -> None:
+    """Calculates the energies of the rotations by chunks of the contour.
+
+    The energies are sums over the contour samples, so the k points are
+    integrated for one chunk of samples at a time and the energies of the
+    chunk are added right away. Only the Greens functions of one chunk are
+    kept in memory, they are dropped after the last chunk.
+
+    Parameters
+    ----------
+    builder: Builder
+        The main grogupy object
+    setup: dict
+        The setup of the sampling
+    sample: Callable
+        It samples the integrand of a setup to the given holders
+    desc: str, optional
+        The description of the progress bar, by default ""
+    """
+
+    contour = builder.contour
+    chunks = np.array_split(
+        np.arange(contour.eset), int(np.ceil(contour.eset / builder.energy_chunk_size))
+    )
+    isotropic = builder.spin_model in (
+        "isotropic-only",
+        "isotropic-biquadratic-only",
+    )
+    # the isotropic energies are overwritten, the others are appended
+    if isotropic:
+        objects = list(builder.pairs)
+        totals = [0 for _ in objects]
+    else:
+        objects = [*builder.magnetic_entities, *builder.pairs]
+        rows = [
+            0 if obj.energies is None else len(np.atleast_2d(obj.energies))
+            for obj in objects
+        ]
+
+    for j, chunk in enumerate(chunks):
+        chunk_setup = dict(setup, samples=contour.samples[chunk])
+        chunk_setup["shapes"] = _holder_shapes(builder, len(chunk))
+        holders = _empty_holders(chunk_setup["shapes"])
+        for mag_ent, G in zip(builder.magnetic_entities, holders[0]):
+            mag_ent._Gii_tmp = G
+        for pair, G1, G2 in zip(builder.pairs, holders[1], holders[2]):
+            pair._Gij_tmp = G1
+            pair._Gji_tmp = G2
+
+        sample(chunk_setup, holders, f"{desc}, energy chunk {j+1}/{len(chunks)}")
+        if setup["trs"]:
+            _time_reversal(builder)
+        _orientation_energies(builder, contour.weights[chunk])
+
+        if isotropic:
+            for k, obj in enumerate(objects):
+                totals[k] = totals[k] + obj.energies
+
+    # the energies of the chunks are summed to one rotation
+    for k, obj in enumerate(objects):
+        if isotropic:
+            obj.energies = totals[k]
+        else:
+            energies = np.atleast_2d(obj.energies)
+            total = energies[rows[k] :].sum(axis=0)
+            if rows[k] == 0:
+                obj.energies = total
+            else:
+                obj.energies = np.vstack((energies[: rows[k]], total))
+
+    # the Greens functions of the last chunk are not the integrated ones
+    for mag_ent in builder.magnetic_entities:
+        mag_ent._Gii_tmp = []
+    for pair in builder.pairs:
+        pair._Gij_tmp = []
+        pair._Gji_tmp = []
+
+
+def _finalize_orientation(
+    builder: "Builder", rot_H: "Hamiltonian", orient: dict, streamed: bool = False
+) -> None:
+    """Calculates the energies of the rotations in a reference direction.
+
+    It calculates the energies from the integrated Greens functions and
+    the perturbations from ``_setup_perturbations`` and stores or drops the
+    temporary data based on the memory mode.
+
+    Parameters
+    ----------
+    builder: Builder
+        The main grogupy object
+    rot_H: Hamiltonian
+        The rotated Hamiltonian
+    orient: dict
+        The reference direction and the perpendicular directions
+    streamed: bool, optional
+        If it is True, then the energies are already calculated by
+        ``_stream_orientation``, by default False
+    """
+
+    # calculate energies in the current reference hamiltonian direction
+    if not streamed:
+        _orientation_energies(builder)
+
+    # if we want to keep all the information for some reason we can do it
+    if not builder.low_memory_mode:
+        builder._rotated_hamiltonians.append(rot_H)
+        for mag_ent in builder.magnetic_entities:
+            mag_ent._Vu1.append(mag_ent._Vu1_tmp)
+            mag_ent._Vu2.append(mag_ent._Vu2_tmp)
+            mag_ent._Gii.append(mag_ent._Gii_tmp)
+        for pair in builder.pairs:
+            pair._Gij.append(pair._Gij_tmp)
+            pair._Gji.append(pair._Gji_tmp)
+    # or fill with empty stuff
+    else:
+        for mag_ent in builder.magnetic_entities:
+            mag_ent._Vu1.append([])
+            mag_ent._Vu2.append([])
+            mag_ent._Gii.append([])
+        for pair in builder.pairs:
+            pair._Gij.append([])
+            pair._Gji.append([])
+
+        # rotate back hamiltonian for the original DFT orientation
+        rot_H.rotate(rot_H.scf_xcf_orientation)
+
+
+def _finalize(builder: "Builder") -> None:
+    """Deletes the temporary data and calculates the magnetic parameters."""
+
+    # finalize energies of the magnetic entities and pairs
+    for mag_ent in builder.magnetic_entities:
+        # delete temporary stuff
+        del mag_ent._Gii_tmp
+        del mag_ent._Vu1_tmp
+        del mag_ent._Vu2_tmp
+
+    for pair in builder.pairs:
+        # delete temporary stuff
+        del pair._Gij_tmp
+        del pair._Gji_tmp
+
+    # calculate magnetic parameters
+    _apply_spin_model(builder)
+
+
+def _apply_spin_model(builder: "Builder") -> None:
+    """Calculates the magnetic parameters from the energies.
+
+    The energies of the magnetic entities and pairs are stacked, so the
+    tensors are calculated at once and the normal matrix of the fit is
+    solved only once for all of them.
+    """
+
+    if not builder.apply_spin_model:
+        return
+
+    ref_xcf = builder.ref_xcf_orientations
+    if builder.spin_model == "generalised-fit":
+        for group, energies in _stacked_energies(builder.magnetic_entities):
+            K = fit_anisotropy_tensor(energies, ref_xcf)
+            for mag_ent, K_i in zip(group, K):
+                mag_ent._dump_anisotropy_tensor(K_i, None)
+        for group, energies in _stacked_energies(builder.pairs):
+            for pair, *tensor in zip(group, *fit_exchange_tensor(energies, ref_xcf)):
+                pair._dump_exchange_tensor(*tensor)
+    elif builder.spin_model == "generalised-grogu":
+        for group, energies in _stacked_energies(builder.magnetic_entities):
+            K, K_consistency = calculate_anisotropy_tensor(energies)
+            for mag_ent, K_i, consistency in zip(group, K, K_consistency):
+                mag_ent._dump_anisotropy_tensor(K_i, consistency)
+        for group, energies in _stacked_energies(builder.pairs):
+            for pair, *tensor in zip(group, *calculate_exchange_tensor(energies)):
+                pair._dump_exchange_tensor(*tensor)
+    elif builder.spin_model == "isotropic-only":
+        for pair in builder.pairs:
+            pair.calculate_isotropic_only()
+    elif builder.spin_model == "isotropic-biquadratic-only":
+        for pair in builder.pairs:
+            pair.calculate_isotropic_biquadratic_only()
+    elif len(builder.pairs) != 0:
+        raise Exception(
+            f"Unknown spin model: {builder.spin_model}! Use apply_spin_model=False"
+        )
+
+
+def _stacked_energies(objects: list) -> list[tuple[list, NDArray]]:
+    """Groups the magnetic entities or pairs by the shape of the energies.
+
+    Parameters
+    ----------
+    objects : list
+        The magnetic entities or pairs
+
+    Returns
+    -------
+    list[tuple[list, NDArray]]
+        The groups and their energies stacked along the first axis
+    """
+
+    groups: dict = {}
+    for obj in objects:
+        if obj.energies is None:
+            raise Exception("Energies missing for the spin model!")
+        groups.setdefault(np.shape(obj.energies), []).append(obj)
+
+    return [
+        (group, np.array([obj.energies for obj in group])) for group in groups.values()
+    ]
+
+
+def _solve_orientation(
+    builder: "Builder",
+    i: int,
+    orient: dict,
+    sample: Callable,
+    share: Union[Callable, None] = None,
+    previous: Union[tuple, None] = None,
+    incremental: bool = False,
+) -> tuple[list[NDArray], list[NDArray], list[NDArray]]:
+    """Calculates the energies of the rotations in a reference direction.
+
+    When the integrated Greens functions of a coarser k grid are given, the
+    k points of the coarser grid are not sampled again, their contribution
+    is reweighted to the refined grid.
+
+    Parameters
+    ----------
+    builder: Builder
+        The main grogupy object
+    i: int
+        The index of the reference direction
+    orient: dict
+        The reference direction and the perpendicular directions
+    sample: Callable
+        It samples the integrand of a setup to the given holders
+    share: Union[Callable, None], optional
+        It shares the decisions from the root node, by default None
+    previous: Union[tuple, None], optional
+        The coarser k grid and the integrated Greens functions on it, by
+        default None
+    incremental: bool, optional
+        If it is True, then the eigen decompositions are read from the eigen
+        cache instead of diagonalising the Hamiltonian, by default False
+
+    Returns
+    -------
+    tuple[list[NDArray], list[NDArray], list[NDArray]]
+        The integrated Greens functions of the magnetic entities and pairs
+    """
+
+    # obtain rotated Hamiltonian
+    rot_H = _rotated_hamiltonian(builder, orient)
+
+    setup = _sampling_setup(builder, rot_H)
+    desc = f"Rotation {i+1}"
+    if builder.eigen_cache is not None and setup["solver"] == "eigen":
+        setup["cache"] = [_eigen_cache(builder, i, setup, incremental, share)]
+
+    # the energies are reduced chunk by chunk of the contour
+    if builder.energy_chunk_size is not None:
+        for mag_ent in builder.magnetic_entities:
+            mag_ent._Vu1_tmp = []
+            mag_ent._Vu2_tmp = []
+        _setup_perturbations(builder, rot_H, orient)
+        _stream_orientation(builder, setup, sample, desc)
+        _finalize_orientation(builder, rot_H, orient, streamed=True)
+        return [], [], []
+
+    # setup empty Greens function holders for integration and
+    # initialize rotation storage
+    holders = _setup_holders(builder)
+
+    # only the new points of the refined grid are sampled
+    if previous is not None:
+        kset, integrated = previous
+        new = ~kpoints_on_kset(setup["kpoints"], kset)
+        setup["kpoints"] = setup["kpoints"][new]
+        setup["weights"] = setup["weights"][new]
+        desc += f", refined to {builder.kspace.kset}"
+
+    # sampling the integrand on the contour and the BZ
+    sample(setup, holders, desc)
+
+    # the old points have the weight of the refined grid
+    if previous is not None:
+        scale = kset.prod() / builder.kspace.kset.prod()
+        for holder, old in zip(holders, integrated):
+            for G, G_old in zip(holder, old):
+                G += scale * G_old
+
+    if setup["trs"]:
+        _time_reversal(builder)
+
+    _setup_perturbations(builder, rot_H, orient)
+
+    # add samples to the contour until the energies are converged
+    if builder.contour.adaptive:
+        _refine_contour(
+            builder,
+            setup,
+            lambda setup, holders: sample(setup, holders, f"{desc}, refined contour"),
+            share,
+        )
+
+    integrated = (
+        [mag_ent._Gii_tmp for mag_ent in builder.magnetic_entities],
+        [pair._Gij_tmp for pair in builder.pairs],
+        [pair._Gji_tmp for pair in builder.pairs],
+    )
+    _finalize_orientation(builder, rot_H, orient)
+
+    return integrated
+
+
+def _fusable(builder: "Builder") -> bool:
+    """Wether the reference directions can be sampled in one pass over the k points.
+
+    The Greens functions of every reference direction are kept at the same
+    time, so it is only used when they are stored anyway. The refinements,
+    the symmetries and the energy chunks change the sampling between the
+    reference directions. The exchange field of the compressed Hamiltonian
+    is not Fourier transformed in one pass.
+    """
+
+    return (
+        not builder.low_memory_mode
+        and not builder.hamiltonian.sparse
+        and len(builder.ref_xcf_orientations) > 1
+        and builder.greens_function_solver != "Sparse"
+        and not builder.kspace.symmetrize
+        and builder.kspace.tolerance is None
+        and builder.kspace.sampling == "grid"
+        and not builder.contour.adaptive
+        and builder.energy_chunk_size is None
+    )
+
+
+def _solve_fused(
+    builder: "Builder", sample: Callable, share: Union[Callable, None] = None
+) -> None:
+    """Calculates the energies of all the reference directions in one pass over the k points.
+
+    Only the exchange field depends on the reference direction, so the time
+    reversal symmetric part of the Hamiltonian, the exchange field and the
+    overlap matrix are Fourier transformed once in every k point and the
+    Hamiltonians of the reference directions are linear combinations of
+    them. The reference directions with the same k points are sampled
+    together.
+
+    Parameters
+    ----------
+    builder: Builder
+        The main grogupy object
+    sample: Callable
+        It samples the integrand of a setup to the given holders
+    share: Union[Callable, None], optional
+        It synchronizes the MPI ranks, by default None
+    """
+
+    orientations = builder.ref_xcf_orientations
+    rot_Hs = [_rotated_hamiltonian(builder, orient) for orient in orientations]
+    setups = [_sampling_setup(builder, rot_H) for rot_H in rot_Hs]
+    if builder.eigen_cache is not None and setups[0]["solver"] == "eigen":
+        for i, setup in enumerate(setups):
+            setup["cache"] = [_eigen_cache(builder, i, setup, share=share)]
+    hTRS, hTRB, XCF, _ = builder.hamiltonian.extract_exchange_field()
+    # the scalar part of the time reversal broken part is only kept by the
+    # reference directions that are not rotated
+    XCF = np.concatenate(([(hTRB[:, 0::2, 0::2] + hTRB[:, 1::2, 1::2]) / 2], XCF))
+    shapes = _holder_shapes(builder)
+
+    # the k and -k points are merged only for the real rotated Hamiltonians
+    holders: list = [None] * len(orientations)
+    for trs in (False, True):
+        group = [i for i, setup in enumerate(setups) if setup["trs"] == trs]
+        if len(group) == 0:
+            continue
+
+        setup = dict(setups[group[0]], H=hTRS, XCF=XCF)
+        if setup["cache"] is not None:
+            setup["cache"] = [setups[i]["cache"][0] for i in group]
+        setup["rotations"] = np.zeros((len(group), 4, 4))
+        for rotation, i in zip(setup["rotations"], group):
+            if np.allclose(builder.hamiltonian.orientation, orientations[i]["o"]):
+                rotation[...] = np.eye(4)
+            else:
+                rotation[1:, 1:] = RotMa2b(
+                    builder.hamiltonian.orientation, orientations[i]["o"]
+                )
+        setup["shapes"] = tuple(
+            [shape for _ in group for shape in holder_shapes]
+            for holder_shapes in shapes
+        )
+        fused = _empty_holders(setup["shapes"])
+        sample(setup, fused, f"Rotations {', '.join(str(i+1) for i in group)}")
+        for i, view in zip(group, _split_holders(fused, len(group))):
+            holders[i] = view
+
+    for i, orient in enumerate(orientations):
+        _setup_holders(builder, holders[i])
+        if setups[i]["trs"]:
+            _time_reversal(builder)
+        _setup_perturbations(builder, rot_Hs[i], orient)
+        _finalize_orientation(builder, rot_Hs[i], orient)
+
+
+def _observables(builder: "Builder") -> list[Union[NDArray, None]]:
+    """The magnetic parameters in meV of the pairs and magnetic entities.
+
+    These are the exchange and anisotropy tensors, or the energies when the
+    spin model is not applied.
+    """
+
+    observables: list[Union[NDArray, None]] = []
+    for pair in builder.pairs:
+        values = (pair.J_meV, pair.J_iso_meV, pair.energies_meV)
+        observables.append(next((v for v in values if v is not None), None))
+    for mag_ent in builder.magnetic_entities:
+        values = (mag_ent.K_meV, mag_ent.energies_meV)
+        observables.append(next((v for v in values if v is not None), None))
+
+    return observables
+
+
+def _kspace_observables(builder: "Builder") -> NDArray:
+    """The magnetic parameters in meV that are converged in the k points."""
+
+    observables = [np.ravel(v) for v in _observables(builder) if v is not None]
+    if len(observables) == 0:
+        return np.zeros(0)
+    return np.concatenate(observables)
+
+
+def _solve_orientation_replicas(
+    builder: "Builder",
+    i: int,
+    orient: dict,
+    sample: Callable,
+    kpoints: NDArray,
+    previous: Union[list, None] = None,
+    desc: str = "",
+) -> tuple[list, tuple]:
+    """Calculates the energies of the rotations in a reference direction from replicas.
+
+    Every replica of the quasi-Monte Carlo k points is integrated to its
+    own holders and the energies are calculated from their mean.
+
+    Parameters
+    ----------
+    builder: Builder
+        The main grogupy object
+    i: int
+        The index of the reference direction
+    orient: dict
+        The reference direction and the perpendicular directions
+    sample: Callable
+        It samples the integrand of a setup to the given holders
+    kpoints: NDArray
+        The new k points of the replicas with shape (replicas, k points, 3)
+    previous: Union[list, None], optional
+        The integrated Greens functions of the replicas on the old k points,
+        by default None
+    desc: str, optional
+        Extra description of the progress bar, by default ""
+
+    Returns
+    -------
+    list
+        The integrated Greens functions of the replicas
+    tuple
+        The perturbations of the magnetic entities
+    """
+
+    # obtain rotated Hamiltonian
+    rot_H = _rotated_hamiltonian(builder, orient)
+    setup = _sampling_setup(builder, rot_H)
+
+    # the old points have the weight of the extended samples
+    points = builder.kspace.NK // builder.kspace.replicas
+    scale = (points - kpoints.shape[1]) / points
+
+    replicas = []
+    for r, k in enumerate(kpoints):
+        holders = _setup_holders(builder)
+        replica_setup = dict(setup, kpoints=k, weights=np.ones(len(k)) / points)
+        sample(replica_setup, holders, f"Rotation {i+1}, replica {r+1}{desc}")
+        if previous is not None:
+            for holder, old in zip(holders, previous[r]):
+                for G, G_old in zip(holder, old):
+                    G += scale * G_old
+        if setup["trs"]:
+            _time_reversal(builder)
+        replicas.append(holders)
+
+    # the estimate is the mean of the replicas
+    for j, mag_ent in enumerate(builder.magnetic_entities):
+        mag_ent._Gii_tmp = np.mean([holders[0][j] for holders in replicas], axis=0)
+    for j, pair in enumerate(builder.pairs):
+        pair._Gij_tmp = np.mean([holders[1][j] for holders in replicas], axis=0)
+        pair._Gji_tmp = np.mean([holders[2][j] for holders in replicas], axis=0)
+
+    _setup_perturbations(builder, rot_H, orient)
+    perturbations = (
+        [mag_ent._Vu1_tmp for mag_ent in builder.magnetic_entities],
+        [mag_ent._Vu2_tmp for mag_ent in builder.magnetic_entities],
+    )
+    _finalize_orientation(builder, rot_H, orient)
+
+    return replicas, perturbations
+
+
+def _replica_errors(
+    builder: "Builder", integrated: list, perturbations: list
+) -> list[Union[NDArray, None]]:
+    """The statistical errors of the magnetic parameters from the replicas.
+
+    The magnetic parameters are calculated from every replica and the error
+    is the standard error of their mean. The energies of the mean are kept
+    in the magnetic entities and pairs.
+
+    Parameters
+    ----------
+    builder: Builder
+        The main grogupy object
+    integrated: list
+        The integrated Greens functions of the replicas in each reference direction
+    perturbations: list
+        The perturbations of the magnetic entities in each reference direction
+
+    Returns
+    -------
+    list[Union[NDArray, None]]
+        The errors in meV in the order of ``_observables``
+    """
+
+    objects = list(builder.pairs) + list(builder.magnetic_entities)
+    energies = [obj.energies for obj in objects]
+
+    values = []
+    for r in range(builder.kspace.replicas):
+        for obj in objects:
+            obj.energies = None
+        for replicas, (Vu1, Vu2) in zip(integrated, perturbations):
+            Gii, Gij, Gji = replicas[r]
+            for j, mag_ent in enumerate(builder.magnetic_entities):
+                mag_ent._Gii_tmp = Gii[j]
+                mag_ent._Vu1_tmp = Vu1[j]
+                mag_ent._Vu2_tmp = Vu2[j]
+            for j, pair in enumerate(builder.pairs):
+                pair._Gij_tmp = Gij[j]
+                pair._Gji_tmp = Gji[j]
+            _orientation_energies(builder)
+        _apply_spin_model(builder)
+        values.append(_observables(builder))
+
+    for obj, energy in zip(objects, energies):
+        obj.energies = energy
+
+    errors: list[Union[NDArray, None]] = []
+    for value in zip(*values):
+        if value[0] is None:
+            errors.append(None)
+        else:
+            errors.append(np.std(value, axis=0, ddof=1) / np.sqrt(len(value)))
+    return errors
+
+
+def _solve_qmc(
+    builder: "Builder", sample: Callable, share: Union[Callable, None] = None
+) -> None:
+    """Solves the reference directions with quasi-Monte Carlo k points.
+
+    The replicas of the k points are integrated separately, so the error of
+    the magnetic parameters can be estimated from their spread. The number
+    of k points is doubled until the largest error is below the target
+    error of the Kspace. Only the new k points are sampled.
+
+    Parameters
+    ----------
+    builder: Builder
+        The main grogupy object
+    sample: Callable
+        It samples the integrand of a setup to the given holders
+    share: Union[Callable, None], optional
+        It shares the decisions from the root node, by default None
+    """
+
+    kspace = builder.kspace
+    orientations = builder.ref_xcf_orientations
+    integrated: list = [None] * len(orientations)
+    perturbations: list = [None] * len(orientations)
+
+    error = None
+    for refinement in range(kspace.max_refinements + 1):
+        if refinement == 0:
+            old = 0
+        else:
+            old = kspace.NK // kspace.replicas
+            kspace.refine()
+        kpoints = kspace.kpoints.reshape(kspace.replicas, -1, 3)[:, old:]
+        desc = "" if error is None else f", error {error:.3g} meV"
+
+        # reset hamiltonians, magnetic entities and pairs
+        _reset(builder)
+        for i, orient in enumerate(orientations):
+            integrated[i], perturbations[i] = _solve_orientation_replicas(
+                builder, i, orient, sample, kpoints, integrated[i], desc
+            )
+        errors = _replica_errors(builder, integrated, perturbations)
+        _finalize(builder)
+
+        # the errors are reported on the magnetic parameters
+        for pair, pair_error in zip(builder.pairs, errors):
+            if pair.J is not None or pair.J_iso is not None:
+                pair.J_error_meV = pair_error
+        for mag_ent, mag_ent_error in zip(
+            builder.magnetic_entities, errors[len(builder.pairs) :]
+        ):
+            if mag_ent.K is not None:
+                mag_ent.K_error_meV = mag_ent_error
+
+        errors = [np.ravel(e) for e in errors if e is not None]
+        error = float(np.max(np.concatenate(errors), initial=0)) if errors else 0.0
+        if share is not None:
+            error = share(error)
+        if kspace.target_error_meV is None or error < kspace.target_error_meV:
+            break
+        if refinement == kspace.max_refinements:
+            warnings.warn(
+                f"The k points did not reach the target error in {kspace.max_refinements} refinements!"
+            )
+
+
+def _solve(
+    builder: "Builder", sample: Callable, share: Union[Callable, None] = None
+) -> None:
+    """Solves the reference directions with the sampling of the Kspace.
+
+    Parameters
+    ----------
+    builder: Builder
+        The main grogupy object
+    sample: Callable
+        It samples the integrand of a setup to the given holders
+    share: Union[Callable, None], optional
+        It shares the decisions from the root node, by default None
+    """
+
+    # the reverse pairs are filled from their partners
+    with _deduplicated(builder):
+        # the quasi-Monte Carlo samples are refined by the statistical error
+        if builder.kspace.sampling == "sobol":
+            _solve_qmc(builder, sample, share)
+
+        # every reference direction is sampled in the same k point
+        elif _fusable(builder):
+            _solve_fused(builder, sample, share)
+            _finalize(builder)
+
+        else:
+            _solve_refined(builder, sample, share)
+
+
+def _solve_refined(
+    builder: "Builder", sample: Callable, share: Union[Callable, None] = None
+) -> None:
+    """Solves the reference directions and refines the k points until converged.
+
+    The integrated Greens functions of every reference direction are kept,
+    so when the k grid is refined, only the new k points are sampled. The
+    grid is refined until the largest change of the magnetic parameters is
+    below the tolerance of the Kspace.
+
+    Parameters
+    ----------
+    builder: Builder
+        The main grogupy object
+    sample: Callable
+        It samples the integrand of a setup to the given holders
+    share: Union[Callable, None], optional
+        It shares the decisions from the root node, by default None
+    """
+
+    # iterate over the reference directions (quantization axes)
+    integrated = [
+        _solve_orientation(builder, i, orient, sample, share)
+        for i, orient in enumerate(builder.ref_xcf_orientations)
+    ]
+    _finalize(builder)
+
+    kspace = builder.kspace
+    if kspace.tolerance is None:
+        return
+
+    for refinement in range(kspace.max_refinements):
+        observables = _kspace_observables(builder)
+        kset = kspace.kset.copy()
+        kspace.refine()
+
+        # reset hamiltonians, magnetic entities and pairs
+        _reset(builder)
+        integrated = [
+            _solve_orientation(
+                builder, i, orient, sample, share, previous=(kset, integrated[i])
+            )
+            for i, orient in enumerate(builder.ref_xcf_orientations)
+        ]
+        _finalize(builder)
+
+        change = np.max(np.abs(_kspace_observables(builder) - observables), initial=0)
+        if share is not None:
+            change = share(change)
+        if change < kspace.tolerance:
+            break
+    else:
+        warnings.warn(
+            f"The k points did not converge in {kspace.max_refinements} refinements!"
+        )
+
+
+def _serial_solver(builder: "Builder", print_memory: bool = False) -> None:
+    """The solution method on a single process shared by the MPI and non-MPI solvers.
+
+    The k points are sampled sequentially, on a pool of threads or on a pool
+    of processes, based on the ``parallel_mode`` of the builder.
+    """
+
+    # checks for setup
+    _check_setup(builder)
+
+    # reset hamiltonians, magnetic entities and pairs
+    _reset(builder)
+
+    # calculate and print memory stuff
+    if print_memory:
+        _print_memory(builder)
+
+    # sampling the integrand on the contour and the BZ
+    def sample(setup, holders, desc):
+        if builder.parallel_mode == "Threads":
+            partial = _sample_kpoints_threads(
+                builder, setup, desc=f"{desc}, parallel over k on threads"
+            )
+            _reduce_holders(holders, partial)
+        elif builder.parallel_mode == "Processes":
+            partial = _sample_kpoints_processes(
+                builder, setup, desc=f"{desc}, parallel over k on processes"
+            )
+            _reduce_holders(holders, partial)
+        else:
+            kpoints = _tqdm(setup["kpoints"], desc=desc)
+            _sample_kpoints(setup, holders, kpoints, setup["weights"])
+
+    _solve(builder, sample)
+
+
+def _incremental_solver(builder: "Builder", print_memory: bool = False) -> None:
+    """Calculates the new magnetic entities and pairs from the eigen cache.
+
+    The magnetic entities and pairs without energies are solved from the
+    eigen decompositions of a previous solution, the others are not
+    changed. The old magnetic entities of the new pairs are replaced by
+    their copies during the solution, so their results are kept.
+    """
+
+    from grogupy.physics import MagneticEntityList, PairList
+
+    # checks for setup
+    _check_setup(builder)
+    if builder.eigen_cache is None:
+        raise Exception("The incremental solution needs the eigen cache!")
+    if builder.greens_function_solver != "Eigen":
+        raise Exception("The incremental solution needs the Eigen solver!")
+
+    magnetic_entities = builder.magnetic_entities
+    pairs = builder.pairs
+    rotated_hamiltonians = builder._rotated_hamiltonians
+
+    new_mag_ents = [
+        mag_ent for mag_ent in magnetic_entities if mag_ent.energies is None
+    ]
+    new_pairs = [pair for pair in pairs if pair.energies is None]
+    if len(new_mag_ents) == 0 and len(new_pairs) == 0:
+        return
+
+    # the perturbations of the old magnetic entities are needed by the new pairs
+    copies: dict = {}
+    for pair in new_pairs:
+        for mag_ent in (pair.M1, pair.M2):
+            if mag_ent.energies is not None and id(mag_ent) not in copies:
+                copies[id(mag_ent)] = copy.copy(mag_ent)
+    originals = [(pair, pair.M1, pair.M2) for pair in new_pairs]
+    for pair in new_pairs:
+        pair.M1 = copies.get(id(pair.M1), pair.M1)
+        pair.M2 = copies.get(id(pair.M2), pair.M2)
+
+    try:
+        builder.magnetic_entities = MagneticEntityList(
+            new_mag_ents + list(copies.values())
+        )
+        builder.pairs = PairList(new_pairs)
+        builder._rotated_hamiltonians = []
+        _reset(builder)
+
+        if print_memory:
+            _print_memory(builder)
+
+        def sample(setup, holders, desc):
+            kpoints = _tqdm(setup["kpoints"], desc=f"{desc}, from the eigen cache")
+            _sample_kpoints(setup, holders, kpoints, setup["weights"])
+
+        with _deduplicated(builder):
+            for i, orient in enumerate(builder.ref_xcf_orientations):
+                _solve_orientation(builder, i, orient, sample, incremental=True)
+            _finalize(builder)
+    finally:
+        builder.magnetic_entities = magnetic_entities
+        builder.pairs = pairs
+        builder._rotated_hamiltonians = rotated_hamiltonians
+        for pair, M1, M2 in originals:
+            pair.M1 = M1
+            pair.M2 = M2
 
-from .utilities import calc_Vu, onsite_projection, tau_u
 
 if CONFIG.MPI_loaded:
     from mpi4py import MPI
@@ -60,326 +2667,74 @@ if CONFIG.MPI_loaded:
 
         # this is not parallel
         if rank == root_node:
-            # checks for setup
-            if builder.kspace is None:
-                raise Exception("Kspace is not defined!")
-            if builder.contour is None:
-                raise Exception("Kspace is not defined!")
-            if builder.hamiltonian is None:
-                raise Exception("Kspace is not defined!")
-
-            # reset hamiltonians, magnetic entities and pairs
-            builder._rotated_hamiltonians = []
-            for mag_ent in builder.magnetic_entities:
-                mag_ent.reset()
-            for pair in builder.pairs:
-                pair.reset()
-
-            # calculate and print memory stuff
-            # 16 is the size of complex numbers in byte, when using np.float64
-            H_mem = np.sum(
-                [
-                    np.prod(builder.hamiltonian.H.shape) * 16,
-                    np.prod(builder.hamiltonian.S.shape) * 16,
-                ]
-            )
-            mag_ent_mem = (
-                builder.contour.eset * builder.magnetic_entities.SBS**2
-            ).sum() * 16
-            pair_mem = (
-                builder.contour.eset * builder.pairs.SBS1 * builder.pairs.SBS2
-            ).sum() * 16
-            if print_memory:
-                print("\n\n\n")
-                print(
-                    "################################################################################"
-                )
-                print(
-                    "################################################################################"
-                )
-                print("Memory allocated on each MPI rank:")
-                print(f"Memory allocated by rotated Hamilonian: {H_mem/1e6} MB")
-                print(f"Memory allocated by magnetic entities: {mag_ent_mem/1e6} MB")
-                print(f"Memory allocated by pairs: {pair_mem/1e6} MB")
-                print(
-                    f"Total memory allocated in RAM: {(H_mem+mag_ent_mem+pair_mem)/1e6} MB"
-                )
-                print(
-                    "--------------------------------------------------------------------------------"
-                )
-                if builder.greens_function_solver[0].lower() == "p":  # parallel solver
-                    G_mem = (
-                        builder.contour.eset * np.prod(builder.hamiltonian.H.shape) * 16
-                    )
-                elif (
-                    builder.greens_function_solver[0].lower() == "s"
-                ):  # sequentia solver
-                    G_mem = (
-                        builder.max_g_per_loop
-                        * np.prod(builder.hamiltonian.H.shape)
-                        * 16
-                    )
-                else:
-                    raise Exception("Unknown Greens function solver!")
+            _serial_solver(builder, print_memory)
 
-                print(f"Memory allocated for Greens function samples: {G_mem/1e6} MB")
-                print(
-                    f"Total peak memory during solution: {(H_mem+mag_ent_mem+pair_mem+G_mem*25)/1e6} MB"
-                )
-                print(
-                    "################################################################################"
-                )
-                print(
-                    "################################################################################"
-                )
-                print("\n\n\n")
+    def solve_incremental(builder: "Builder", print_memory: bool = False) -> None:
+        """It calculates the new magnetic entities and pairs from the eigen cache.
 
-            # iterate over the reference directions (quantization axes)
-            for i, orient in enumerate(builder.ref_xcf_orientations):
-                # obtain rotated Hamiltonian
-                if builder.low_memory_mode:
-                    rot_H = builder.hamiltonian
-                else:
-                    rot_H = builder.hamiltonian.copy()
-                if not np.allclose(rot_H.orientation, orient["o"]):
-                    rot_H.rotate(orient["o"])
-
-                # setup empty Greens function holders for integration and
-                # initialize rotation storage
-                for mag_ent in builder.magnetic_entities:
-                    mag_ent._Vu1_tmp = []
-                    mag_ent._Vu2_tmp = []
-                    mag_ent._Gii_tmp = np.zeros(
-                        (builder.contour.eset, mag_ent.SBS, mag_ent.SBS),
-                        dtype="complex128",
-                    )
-                for pair in builder.pairs:
-                    pair._Gij_tmp = np.zeros(
-                        (builder.contour.eset, pair.SBS1, pair.SBS2), dtype="complex128"
-                    )
-                    pair._Gji_tmp = np.zeros(
-                        (builder.contour.eset, pair.SBS2, pair.SBS1), dtype="complex128"
-                    )
+        The magnetic entities and pairs without energies are calculated from
+        the eigenvalues and eigenvectors that were cached by a previous
+        solution with the "Eigen" solver, so no Hamiltonian is diagonalised.
+        The other magnetic entities and pairs are not changed.
 
-                # sampling the integrand on the contour and the BZ
-                kpoints = _tqdm(builder.kspace.kpoints, desc=f"Rotation {i+1}")
-                for j, k in enumerate(kpoints):
-
-                    # weight of k point in BZ integral
-                    wk: float = builder.kspace.weights[j]
-
-                    # calculate Hamiltonian and Overlap matrix in a given k point
-                    Hk, Sk = rot_H.HkSk(k)
-
-                    # Calculates the Greens function on all the energy levels
-                    if (
-                        builder.greens_function_solver[0].lower() == "p"
-                    ):  # parallel solver
-                        Gk = np.linalg.inv(
-                            Sk
-                            * builder.contour.samples.reshape(
-                                builder.contour.eset, 1, 1
-                            )
-                            - Hk
-                        )
-
-                        # store the Greens function slice of the magnetic entities
-                        for mag_ent in builder.magnetic_entities:
-                            mag_ent._Gii_tmp += (
-                                onsite_projection(
-                                    Gk,
-                                    mag_ent._spin_box_indices,
-                                    mag_ent._spin_box_indices,
-                                )
-                                * wk
-                            )
-
-                        for pair in builder.pairs:
-                            # add phase shift based on the cell difference
-                            phase: NDArray = np.exp(
-                                1j * 2 * np.pi * k @ pair.supercell_shift.T
-                            )
-                            # store the Greens function slice of the pairs
-                            pair._Gij_tmp += (
-                                onsite_projection(Gk, pair.SBI1, pair.SBI2) * phase * wk
-                            )
-                            pair._Gji_tmp += (
-                                onsite_projection(Gk, pair.SBI2, pair.SBI1) / phase * wk
-                            )
-
-                    # solve Greens function sequentially for the energies, because of memory bound
-                    elif (
-                        builder.greens_function_solver[0].lower() == "s"
-                    ):  # sequential solver
-
-                        # make chunks for reduced parallelization over energy sample points
-                        number_of_chunks = (
-                            np.floor(builder.contour.eset / builder.max_g_per_loop) + 1
-                        )
-                        # constrain to sensible size
-                        if number_of_chunks > builder.contour.eset:
-                            number_of_chunks = builder.contour.eset
-
-                        # create batches using slices on every instance
-                        slices = np.array_split(
-                            range(builder.contour.eset), number_of_chunks
-                        )
-                        # fills the holders sequentially by the Greens function slices on
-                        # a given energy
-                        for slice in slices:
-                            Gk = np.linalg.inv(
-                                Sk
-                                * builder.contour.samples[slice].reshape(
-                                    len(slice), 1, 1
-                                )
-                                - Hk
-                            )
-
-                            # store the Greens function slice of the magnetic entities
-                            for mag_ent in builder.magnetic_entities:
-                                mag_ent._Gii_tmp[slice] += (
-                                    onsite_projection(
-                                        Gk,
-                                        mag_ent._spin_box_indices,
-                                        mag_ent._spin_box_indices,
-                                    )
-                                    * wk
-                                )
-
-                            for pair in builder.pairs:
-                                # add phase shift based on the cell difference
-                                phase: NDArray = np.exp(
-                                    1j * 2 * np.pi * k @ pair.supercell_shift.T
-                                )
-                                # store the Greens function slice of the pairs
-                                pair._Gij_tmp[slice] += (
-                                    onsite_projection(Gk, pair.SBI1, pair.SBI2)
-                                    * phase
-                                    * wk
-                                )
-                                pair._Gji_tmp[slice] += (
-                                    onsite_projection(Gk, pair.SBI2, pair.SBI1)
-                                    / phase
-                                    * wk
-                                )
-                    else:
-                        raise Exception("Unknown Green's function solver!")
-
-                # these are the rotations perpendicular to the quantization axis
-                for u in orient["vw"]:
-                    # section 2.H
-                    H_XCF = rot_H.extract_exchange_field()[3]
-                    Tu: NDArray = np.kron(
-                        np.eye(int(builder.hamiltonian.NO / 2), dtype=int), tau_u(u)
-                    )
-                    Vu1, Vu2 = calc_Vu(H_XCF[rot_H.uc_in_sc_index], Tu)
-
-                    for mag_ent in _tqdm(
-                        builder.magnetic_entities,
-                        desc="Setup perturbations for rotated hamiltonian",
-                    ):
-                        # fill up the perturbed potentials (for now) based on the on-site projections
-                        mag_ent._Vu1_tmp.append(
-                            onsite_projection(
-                                Vu1,
-                                mag_ent._spin_box_indices,
-                                mag_ent._spin_box_indices,
-                            )
-                        )
-                        mag_ent._Vu2_tmp.append(
-                            onsite_projection(
-                                Vu2,
-                                mag_ent._spin_box_indices,
-                                mag_ent._spin_box_indices,
-                            )
-                        )
-
-                if (
-                    builder.spin_model == "isotropic-only"
-                    or builder.spin_model == "isotropic-biquadratic-only"
-                ):
-                    for pair in builder.pairs:
-                        pair.energies = np.array(
-                            [
-                                [
-                                    interaction_energy(
-                                        pair.M1._Vu1_tmp,
-                                        pair.M2._Vu1_tmp,
-                                        pair._Gij_tmp,
-                                        pair._Gji_tmp,
-                                        builder.contour.weights,
-                                    )
-                                ]
-                            ]
-                        )
-                else:
-                    # calculate energies in the current reference hamiltonian direction
-                    for mag_ent in builder.magnetic_entities:
-                        mag_ent.calculate_energies(
-                            builder.contour.weights,
-                            append=True,
-                            third_direction=builder.spin_model == "generalised-grogu",
-                        )
-                    for pair in builder.pairs:
-                        pair.calculate_energies(builder.contour.weights, append=True)
-
-                # if we want to keep all the information for some reason we can do it
-                if not builder.low_memory_mode:
-                    builder._rotated_hamiltonians.append(rot_H)
-                    for mag_ent in builder.magnetic_entities:
-                        mag_ent._Vu1.append(mag_ent._Vu1_tmp)
-                        mag_ent._Vu2.append(mag_ent._Vu2_tmp)
-                        mag_ent._Gii.append(mag_ent._Gii_tmp)
-                    for pair in builder.pairs:
-                        pair._Gij.append(pair._Gij_tmp)
-                        pair._Gji.append(pair._Gji_tmp)
-                # or fill with empty stuff
-                else:
-                    for mag_ent in builder.magnetic_entities:
-                        mag_ent._Vu1.append([])
-                        mag_ent._Vu2.append([])
-                        mag_ent._Gii.append([])
-                    for pair in builder.pairs:
-                        pair._Gij.append([])
-                        pair._Gji.append([])
-
-                    # rotate back hamiltonian for the original DFT orientation
-                    rot_H.rotate(rot_H.scf_xcf_orientation)
-
-            # finalize energies of the magnetic entities and pairs
-            # calculate magnetic parameters
-            for mag_ent in builder.magnetic_entities:
-                # delete temporary stuff
-                del mag_ent._Gii_tmp
-                del mag_ent._Vu1_tmp
-                del mag_ent._Vu2_tmp
-
-                if builder.apply_spin_model:
-                    if builder.spin_model == "generalised-fit":
-                        mag_ent.fit_anisotropy_tensor(builder.ref_xcf_orientations)
-                    elif builder.spin_model == "generalised-grogu":
-                        mag_ent.calculate_anisotropy()
-                    else:
-                        pass
-
-            for pair in builder.pairs:
-                # delete temporary stuff
-                del pair._Gij_tmp
-                del pair._Gji_tmp
-
-                if builder.apply_spin_model:
-                    if builder.spin_model == "generalised-fit":
-                        pair.fit_exchange_tensor(builder.ref_xcf_orientations)
-                    elif builder.spin_model == "generalised-grogu":
-                        pair.calculate_exchange_tensor()
-                    elif builder.spin_model == "isotropic-only":
-                        pair.calculate_isotropic_only()
-                    elif builder.spin_model == "isotropic-biquadratic-only":
-                        pair.calculate_isotropic_biquadratic_only()
-                    else:
-                        raise Exception(
-                            f"Unknown spin model: {builder.spin_model}! Use apply_spin_model=False"
-                        )
+        Parameters
+        ----------
+        builder: Builder
+            The main grogupy object
+        print_memory: bool, optional
+            It can be turned on to print extra memory info, by default False
+        """
+
+        # this is not parallel
+        if rank == root_node:
+            _incremental_solver(builder, print_memory)
+
+    def solve_parallel_over_threads(
+        builder: "Builder", print_memory: bool = False
+    ) -> None:
+        """It calculates the energies by the Greens function method with a pool of threads.
+
+        It inverts the Hamiltonians of all directions set up in the given
+        k-points at the given energy levels. The k-points are distributed
+        over a pool of threads on the root node, because the linear algebra
+        releases the GIL. It does not need MPI, so it is useful on a single
+        machine or in notebooks.
+
+        Parameters
+        ----------
+        builder: Builder
+            The main grogupy object
+        print_memory: bool, optional
+            It can be turned on to print extra memory info, by default False
+        """
+
+        # this is not parallel over the MPI nodes
+        if rank == root_node:
+            _serial_solver(builder, print_memory)
+
+    def solve_parallel_over_processes(
+        builder: "Builder", print_memory: bool = False
+    ) -> None:
+        """It calculates the energies by the Greens function method with a pool of processes.
+
+        It inverts the Hamiltonians of all directions set up in the given
+        k-points at the given energy levels. The k-points are distributed
+        over a pool of processes on the root node. The Hamiltonian and the
+        overlap matrix are shared between the processes, so they are not
+        copied to every worker. It does not need MPI, so it is useful on a
+        single machine.
+
+        Parameters
+        ----------
+        builder: Builder
+            The main grogupy object
+        print_memory: bool, optional
+            It can be turned on to print extra memory info, by default False
+        """
+
+        # this is not parallel over the MPI nodes
+        if rank == root_node:
+            _serial_solver(builder, print_memory)
 
     def solve_parallel_over_k(builder: "Builder", print_memory: bool = False) -> None:
         """It calculates the energies by the Greens function method.
@@ -402,339 +2757,45 @@ if CONFIG.MPI_loaded:
         comm.Barrier()
 
         # checks for setup
-        if builder.kspace is None:
-            raise Exception("Kspace is not defined!")
-        if builder.contour is None:
-            raise Exception("Kspace is not defined!")
-        if builder.hamiltonian is None:
-            raise Exception("Kspace is not defined!")
+        _check_setup(builder)
 
         # reset hamiltonians, magnetic entities and pairs
-        builder._rotated_hamiltonians = []
-        for mag_ent in builder.magnetic_entities:
-            mag_ent.reset()
-        for pair in builder.pairs:
-            pair.reset()
+        _reset(builder)
 
         # calculate and print memory stuff
-        # 16 is the size of complex numbers in byte, when using np.float64
-        H_mem = np.sum(
-            [
-                np.prod(builder.hamiltonian.H.shape) * 16,
-                np.prod(builder.hamiltonian.S.shape) * 16,
-            ]
-        )
-        mag_ent_mem = (
-            builder.contour.eset * builder.magnetic_entities.SBS**2
-        ).sum() * 16
-        pair_mem = (
-            builder.contour.eset * builder.pairs.SBS1 * builder.pairs.SBS2
-        ).sum() * 16
         if print_memory and rank == root_node:
-            print("\n\n\n")
-            print(
-                "################################################################################"
-            )
-            print(
-                "################################################################################"
-            )
-            print("Memory allocated on each MPI rank:")
-            print(f"Memory allocated by rotated Hamilonian: {H_mem/1e6} MB")
-            print(f"Memory allocated by magnetic entities: {mag_ent_mem/1e6} MB")
-            print(f"Memory allocated by pairs: {pair_mem/1e6} MB")
-            print(
-                f"Total memory allocated in RAM: {(H_mem+mag_ent_mem+pair_mem)/1e6} MB"
-            )
-            print(
-                "--------------------------------------------------------------------------------"
-            )
-            if builder.greens_function_solver[0].lower() == "p":  # parallel solver
-                G_mem = builder.contour.eset * np.prod(builder.hamiltonian.H.shape) * 16
-            elif builder.greens_function_solver[0].lower() == "s":  # sequentia solver
-                G_mem = (
-                    builder.max_g_per_loop * np.prod(builder.hamiltonian.H.shape) * 16
-                )
-            else:
-                raise Exception("Unknown Greens function solver!")
-
-            print(f"Memory allocated for Greens function samples: {G_mem/1e6} MB")
-            print(
-                f"Total peak memory during solution: {(H_mem+mag_ent_mem+pair_mem+G_mem*25)/1e6} MB"
-            )
-            print(
-                "################################################################################"
-            )
-            print(
-                "################################################################################"
-            )
-            print("\n\n\n")
-
-        # iterate over the reference directions (quantization axes)
-        for i, orient in enumerate(builder.ref_xcf_orientations):
-            # obtain rotated Hamiltonian
-            if builder.low_memory_mode:
-                rot_H = builder.hamiltonian
-            else:
-                rot_H = builder.hamiltonian.copy()
-            if not np.allclose(rot_H.orientation, orient["o"]):
-                rot_H.rotate(orient["o"])
-
-            # setup empty Greens function holders for integration and
-            # initialize rotation storage
-            for mag_ent in builder.magnetic_entities:
-                mag_ent._Vu1_tmp = []
-                mag_ent._Vu2_tmp = []
-                mag_ent._Gii_tmp = np.zeros(
-                    (builder.contour.eset, mag_ent.SBS, mag_ent.SBS),
-                    dtype="complex128",
-                )
-            for pair in builder.pairs:
-                pair._Gij_tmp = np.zeros(
-                    (builder.contour.eset, pair.SBS1, pair.SBS2), dtype="complex128"
-                )
-                pair._Gji_tmp = np.zeros(
-                    (builder.contour.eset, pair.SBS2, pair.SBS1), dtype="complex128"
-                )
+            _print_memory(builder)
 
+        # sampling the integrand on the contour and the BZ
+        def sample(setup, holders, desc):
             # split k points to parallelize
-            # (this could be outside loop, but it was an easy fix for the
-            # reset of tqdm in each reference direction)
-            parallel_k: list = np.array_split(builder.kspace.kpoints, parallel_size)
-            parallel_w: list = np.array_split(builder.kspace.weights, parallel_size)
+            parallel_k: list = np.array_split(setup["kpoints"], parallel_size)
+            parallel_w: list = np.array_split(setup["weights"], parallel_size)
 
             if rank == root_node:
                 parallel_k[rank] = _tqdm(
                     parallel_k[rank],
-                    desc=f"Rotation {i+1}, parallel over k on CPU{rank}",
-                )
-            for j, k in enumerate(parallel_k[rank]):
-
-                # weight of k point in BZ integral
-                wk: float = parallel_w[rank][j]
-
-                # calculate Hamiltonian and Overlap matrix in a given k point
-                Hk, Sk = rot_H.HkSk(k)
-
-                # Calculates the Greens function on all the energy levels
-                if builder.greens_function_solver[0].lower() == "p":  # parallel solver
-                    Gk = np.linalg.inv(
-                        Sk * builder.contour.samples.reshape(builder.contour.eset, 1, 1)
-                        - Hk
-                    )
-
-                    # store the Greens function slice of the magnetic entities
-                    for mag_ent in builder.magnetic_entities:
-                        mag_ent._Gii_tmp += (
-                            onsite_projection(
-                                Gk, mag_ent._spin_box_indices, mag_ent._spin_box_indices
-                            )
-                            * wk
-                        )
-
-                    for pair in builder.pairs:
-                        # add phase shift based on the cell difference
-                        phase: NDArray = np.exp(
-                            1j * 2 * np.pi * k @ pair.supercell_shift.T
-                        )
-                        # store the Greens function slice of the pairs
-                        pair._Gij_tmp += (
-                            onsite_projection(Gk, pair.SBI1, pair.SBI2) * phase * wk
-                        )
-                        pair._Gji_tmp += (
-                            onsite_projection(Gk, pair.SBI2, pair.SBI1) / phase * wk
-                        )
-
-                # solve Greens function sequentially for the energies, because of memory bound
-                elif (
-                    builder.greens_function_solver[0].lower() == "s"
-                ):  # sequential solver
-
-                    # make chunks for reduced parallelization over energy sample points
-                    number_of_chunks = (
-                        np.floor(builder.contour.eset / builder.max_g_per_loop) + 1
-                    )
-                    # constrain to sensible size
-                    if number_of_chunks > builder.contour.eset:
-                        number_of_chunks = builder.contour.eset
-
-                    # create batches using slices on every instance
-                    slices = np.array_split(
-                        range(builder.contour.eset), number_of_chunks
-                    )
-                    # fills the holders sequentially by the Greens function slices on
-                    # a given energy
-                    for slice in slices:
-                        Gk = np.linalg.inv(
-                            Sk
-                            * builder.contour.samples[slice].reshape(len(slice), 1, 1)
-                            - Hk
-                        )
-
-                        # store the Greens function slice of the magnetic entities
-                        for mag_ent in builder.magnetic_entities:
-                            mag_ent._Gii_tmp[slice] += (
-                                onsite_projection(
-                                    Gk,
-                                    mag_ent._spin_box_indices,
-                                    mag_ent._spin_box_indices,
-                                )
-                                * wk
-                            )
-
-                        for pair in builder.pairs:
-                            # add phase shift based on the cell difference
-                            phase: NDArray = np.exp(
-                                1j * 2 * np.pi * k @ pair.supercell_shift.T
-                            )
-                            # store the Greens function slice of the pairs
-                            pair._Gij_tmp[slice] += (
-                                onsite_projection(Gk, pair.SBI1, pair.SBI2) * phase * wk
-                            )
-                            pair._Gji_tmp[slice] += (
-                                onsite_projection(Gk, pair.SBI2, pair.SBI1) / phase * wk
-                            )
-                else:
-                    raise Exception("Unknown Green's function solver!")
-
-            # sum reduce partial results of mpi nodes and delete temprorary stuff
-            for mag_ent in builder.magnetic_entities:
-                mag_ent._Gii_reduce = np.zeros(
-                    (builder.contour.eset, mag_ent.SBS, mag_ent.SBS),
-                    dtype="complex128",
-                )
-                comm.Reduce(mag_ent._Gii_tmp, mag_ent._Gii_reduce, root=root_node)
-                mag_ent._Gii_tmp = mag_ent._Gii_reduce
-                del mag_ent._Gii_reduce
-
-            for pair in builder.pairs:
-                pair._Gij_reduce = np.zeros(
-                    (builder.contour.eset, pair.SBS1, pair.SBS2), dtype="complex128"
-                )
-                pair._Gji_reduce = np.zeros(
-                    (builder.contour.eset, pair.SBS2, pair.SBS1), dtype="complex128"
-                )
-                comm.Reduce(pair._Gij_tmp, pair._Gij_reduce, root=root_node)
-                comm.Reduce(pair._Gji_tmp, pair._Gji_reduce, root=root_node)
-                pair._Gij_tmp = pair._Gij_reduce
-                pair._Gji_tmp = pair._Gji_reduce
-                del pair._Gij_reduce
-                del pair._Gji_reduce
-
-            # these are the rotations perpendicular to the quantization axis
-            for u in orient["vw"]:
-                # section 2.H
-                H_XCF = rot_H.extract_exchange_field()[3]
-                Tu: NDArray = np.kron(
-                    np.eye(int(builder.hamiltonian.NO / 2), dtype=int), tau_u(u)
+                    desc=f"{desc}, parallel over k on CPU{rank}",
                 )
-                Vu1, Vu2 = calc_Vu(H_XCF[rot_H.uc_in_sc_index], Tu)
-
-                for mag_ent in _tqdm(
-                    builder.magnetic_entities,
-                    desc="Setup perturbations for rotated hamiltonian",
-                ):
-                    # fill up the perturbed potentials (for now) based on the on-site projections
-                    mag_ent._Vu1_tmp.append(
-                        onsite_projection(
-                            Vu1, mag_ent._spin_box_indices, mag_ent._spin_box_indices
-                        )
-                    )
-                    mag_ent._Vu2_tmp.append(
-                        onsite_projection(
-                            Vu2, mag_ent._spin_box_indices, mag_ent._spin_box_indices
-                        )
-                    )
-
-            if (
-                builder.spin_model == "isotropic-only"
-                or builder.spin_model == "isotropic-biquadratic-only"
-            ):
-                for pair in builder.pairs:
-                    pair.energies = np.array(
-                        [
-                            [
-                                interaction_energy(
-                                    pair.M1._Vu1_tmp,
-                                    pair.M2._Vu1_tmp,
-                                    pair._Gij_tmp,
-                                    pair._Gji_tmp,
-                                    builder.contour.weights,
-                                )
-                            ]
-                        ]
-                    )
-            else:
-                # calculate energies in the current reference hamiltonian direction
-                for mag_ent in builder.magnetic_entities:
-                    mag_ent.calculate_energies(
-                        builder.contour.weights,
-                        append=True,
-                        third_direction=builder.spin_model == "generalised-grogu",
-                    )
-                for pair in builder.pairs:
-                    pair.calculate_energies(builder.contour.weights, append=True)
-
-            # if we want to keep all the information for some reason we can do it
-            if not builder.low_memory_mode:
-                builder._rotated_hamiltonians.append(rot_H)
-                for mag_ent in builder.magnetic_entities:
-                    mag_ent._Vu1.append(mag_ent._Vu1_tmp)
-                    mag_ent._Vu2.append(mag_ent._Vu2_tmp)
-                    mag_ent._Gii.append(mag_ent._Gii_tmp)
-                for pair in builder.pairs:
-                    pair._Gij.append(pair._Gij_tmp)
-                    pair._Gji.append(pair._Gji_tmp)
-            # or fill with empty stuff
-            else:
-                for mag_ent in builder.magnetic_entities:
-                    mag_ent._Vu1.append([])
-                    mag_ent._Vu2.append([])
-                    mag_ent._Gii.append([])
-                for pair in builder.pairs:
-                    pair._Gij.append([])
-                    pair._Gji.append([])
-
-                # rotate back hamiltonian for the original DFT orientation
-                rot_H.rotate(rot_H.scf_xcf_orientation)
+            _sample_kpoints(setup, holders, parallel_k[rank], parallel_w[rank])
+
+            # sum reduce partial results of mpi nodes
+            for holder in holders:
+                # the contiguous buffer of the holders is reduced at once
+                buffer = _holder_buffer(holder)
+                if buffer is not None:
+                    holder = [buffer[0][:, buffer[1]]]
+                for G in holder:
+                    G_reduce = np.zeros(G.shape, dtype=G.dtype)
+                    comm.Reduce(np.ascontiguousarray(G), G_reduce, root=root_node)
+                    G[:] = G_reduce
+
+        # the decisions of the refinements are made on the root node
+        _solve(builder, sample, share=lambda value: comm.bcast(value, root=root_node))
 
         # wait for everyone in the end of loop
         comm.Barrier()
 
-        # finalize energies of the magnetic entities and pairs
-        # calculate magnetic parameters
-        for mag_ent in builder.magnetic_entities:
-            # delete temporary stuff
-            del mag_ent._Gii_tmp
-            del mag_ent._Vu1_tmp
-            del mag_ent._Vu2_tmp
-
-            if builder.apply_spin_model:
-                if builder.spin_model == "generalised-fit":
-                    mag_ent.fit_anisotropy_tensor(builder.ref_xcf_orientations)
-                elif builder.spin_model == "generalised-grogu":
-                    mag_ent.calculate_anisotropy()
-                else:
-                    pass
-
-        for pair in builder.pairs:
-            # delete temporary stuff
-            del pair._Gij_tmp
-            del pair._Gji_tmp
-
-            if builder.apply_spin_model:
-                if builder.spin_model == "generalised-fit":
-                    pair.fit_exchange_tensor(builder.ref_xcf_orientations)
-                elif builder.spin_model == "generalised-grogu":
-                    pair.calculate_exchange_tensor()
-                elif builder.spin_model == "isotropic-only":
-                    pair.calculate_isotropic_only()
-                elif builder.spin_model == "isotropic-biquadratic-only":
-                    pair.calculate_isotropic_biquadratic_only()
-                else:
-                    raise Exception(
-                        f"Unknown spin model: {builder.spin_model}! Use apply_spin_model=False"
-                    )
-
 else:
 
     def default_solver(builder: "Builder", print_memory: bool = False) -> None:
@@ -754,309 +2815,76 @@ else:
             It can be turned on to print extra memory info, by default False
         """
 
-        # checks for setup
-        if builder.kspace is None:
-            raise Exception("Kspace is not defined!")
-        if builder.contour is None:
-            raise Exception("Kspace is not defined!")
-        if builder.hamiltonian is None:
-            raise Exception("Kspace is not defined!")
+        _serial_solver(builder, print_memory)
 
-        # reset hamiltonians, magnetic entities and pairs
-        builder._rotated_hamiltonians = []
-        for mag_ent in builder.magnetic_entities:
-            mag_ent.reset()
-        for pair in builder.pairs:
-            pair.reset()
+    def solve_incremental(builder: "Builder", print_memory: bool = False) -> None:
+        """It calculates the new magnetic entities and pairs from the eigen cache.
 
-        # calculate and print memory stuff
-        # 16 is the size of complex numbers in byte, when using np.float64
-        H_mem = np.sum(
-            [
-                np.prod(builder.hamiltonian.H.shape) * 16,
-                np.prod(builder.hamiltonian.S.shape) * 16,
-            ]
-        )
-        mag_ent_mem = (
-            builder.contour.eset * builder.magnetic_entities.SBS**2
-        ).sum() * 16
-        pair_mem = (
-            builder.contour.eset * builder.pairs.SBS1 * builder.pairs.SBS2
-        ).sum() * 16
-        if print_memory:
-            print("\n\n\n")
-            print(
-                "################################################################################"
-            )
-            print(
-                "################################################################################"
-            )
-            print("Memory allocated on each MPI rank:")
-            print(f"Memory allocated by rotated Hamilonian: {H_mem/1e6} MB")
-            print(f"Memory allocated by magnetic entities: {mag_ent_mem/1e6} MB")
-            print(f"Memory allocated by pairs: {pair_mem/1e6} MB")
-            print(
-                f"Total memory allocated in RAM: {(H_mem+mag_ent_mem+pair_mem)/1e6} MB"
-            )
-            print(
-                "--------------------------------------------------------------------------------"
-            )
-            if builder.greens_function_solver[0].lower() == "p":  # parallel solver
-                G_mem = builder.contour.eset * np.prod(builder.hamiltonian.H.shape) * 16
-            elif builder.greens_function_solver[0].lower() == "s":  # sequentia solver
-                G_mem = (
-                    builder.max_g_per_loop * np.prod(builder.hamiltonian.H.shape) * 16
-                )
-            else:
-                raise Exception("Unknown Greens function solver!")
+        The magnetic entities and pairs without energies are calculated from
+        the eigenvalues and eigenvectors that were cached by a previous
+        solution with the "Eigen" solver, so no Hamiltonian is diagonalised.
+        The other magnetic entities and pairs are not changed.
 
-            print(f"Memory allocated for Greens function samples: {G_mem/1e6} MB")
-            print(
-                f"Total peak memory during solution: {(H_mem+mag_ent_mem+pair_mem+G_mem*25)/1e6} MB"
-            )
-            print(
-                "################################################################################"
-            )
-            print(
-                "################################################################################"
-            )
-            print("\n\n\n")
+        Parameters
+        ----------
+        builder: Builder
+            The main grogupy object
+        print_memory: bool, optional
+            It can be turned on to print extra memory info, by default False
+        """
 
-        # iterate over the reference directions (quantization axes)
-        for i, orient in enumerate(builder.ref_xcf_orientations):
-            # obtain rotated Hamiltonian
-            if builder.low_memory_mode:
-                rot_H = builder.hamiltonian
-            else:
-                rot_H = builder.hamiltonian.copy()
-            if not np.allclose(rot_H.orientation, orient["o"]):
-                rot_H.rotate(orient["o"])
-
-            # setup empty Greens function holders for integration and
-            # initialize rotation storage
-            for mag_ent in builder.magnetic_entities:
-                mag_ent._Vu1_tmp = []
-                mag_ent._Vu2_tmp = []
-                mag_ent._Gii_tmp = np.zeros(
-                    (builder.contour.eset, mag_ent.SBS, mag_ent.SBS),
-                    dtype="complex128",
-                )
-            for pair in builder.pairs:
-                pair._Gij_tmp = np.zeros(
-                    (builder.contour.eset, pair.SBS1, pair.SBS2), dtype="complex128"
-                )
-                pair._Gji_tmp = np.zeros(
-                    (builder.contour.eset, pair.SBS2, pair.SBS1), dtype="complex128"
-                )
+        _incremental_solver(builder, print_memory)
 
-            # sampling the integrand on the contour and the BZ
-            kpoints = _tqdm(builder.kspace.kpoints, desc=f"Rotation {i+1}")
-            for j, k in enumerate(kpoints):
+    def solve_parallel_over_k(builder: "Builder", print_memory: bool = False) -> None:
+        """It calculates the energies by the Greens function method.
 
-                # weight of k point in BZ integral
-                wk: float = builder.kspace.weights[j]
+        It inverts the Hamiltonians of all directions set up in the given
+        k-points at the given energy levels. The solution is parallelized over
+        k-points. It uses the `greens_function_solver` instance variable which
+        controls the solution method over the energy samples. Generally this is
+        the fastest solution method for smaller systems.
 
-                # calculate Hamiltonian and Overlap matrix in a given k point
-                Hk, Sk = rot_H.HkSk(k)
+        Parameters
+        ----------
+        builder: Builder
+            The main grogupy object
+        print_memory: bool, optional
+            It can be turned on to print extra memory info, by default False
+        """
 
-                # Calculates the Greens function on all the energy levels
-                if builder.greens_function_solver[0].lower() == "p":  # parallel solver
-                    Gk = np.linalg.inv(
-                        Sk * builder.contour.samples.reshape(builder.contour.eset, 1, 1)
-                        - Hk
-                    )
+        raise Exception("MPI is not available!")
 
-                    # store the Greens function slice of the magnetic entities
-                    for mag_ent in builder.magnetic_entities:
-                        mag_ent._Gii_tmp += (
-                            onsite_projection(
-                                Gk, mag_ent._spin_box_indices, mag_ent._spin_box_indices
-                            )
-                            * wk
-                        )
-
-                    for pair in builder.pairs:
-                        # add phase shift based on the cell difference
-                        phase: NDArray = np.exp(
-                            1j * 2 * np.pi * k @ pair.supercell_shift.T
-                        )
-                        # store the Greens function slice of the pairs
-                        pair._Gij_tmp += (
-                            onsite_projection(Gk, pair.SBI1, pair.SBI2) * phase * wk
-                        )
-                        pair._Gji_tmp += (
-                            onsite_projection(Gk, pair.SBI2, pair.SBI1) / phase * wk
-                        )
-
-                # solve Greens function sequentially for the energies, because of memory bound
-                elif (
-                    builder.greens_function_solver[0].lower() == "s"
-                ):  # sequential solver
-
-                    # make chunks for reduced parallelization over energy sample points
-                    number_of_chunks = (
-                        np.floor(builder.contour.eset / builder.max_g_per_loop) + 1
-                    )
-                    # constrain to sensible size
-                    if number_of_chunks > builder.contour.eset:
-                        number_of_chunks = builder.contour.eset
+    def solve_parallel_over_threads(
+        builder: "Builder", print_memory: bool = False
+    ) -> None:
+        """It calculates the energies by the Greens function method with a pool of threads.
 
-                    # create batches using slices on every instance
-                    slices = np.array_split(
-                        range(builder.contour.eset), number_of_chunks
-                    )
-                    # fills the holders sequentially by the Greens function slices on
-                    # a given energy
-                    for slice in slices:
-                        Gk = np.linalg.inv(
-                            Sk
-                            * builder.contour.samples[slice].reshape(len(slice), 1, 1)
-                            - Hk
-                        )
-
-                        # store the Greens function slice of the magnetic entities
-                        for mag_ent in builder.magnetic_entities:
-                            mag_ent._Gii_tmp[slice] += (
-                                onsite_projection(
-                                    Gk,
-                                    mag_ent._spin_box_indices,
-                                    mag_ent._spin_box_indices,
-                                )
-                                * wk
-                            )
-
-                        for pair in builder.pairs:
-                            # add phase shift based on the cell difference
-                            phase: NDArray = np.exp(
-                                1j * 2 * np.pi * k @ pair.supercell_shift.T
-                            )
-                            # store the Greens function slice of the pairs
-                            pair._Gij_tmp[slice] += (
-                                onsite_projection(Gk, pair.SBI1, pair.SBI2) * phase * wk
-                            )
-                            pair._Gji_tmp[slice] += (
-                                onsite_projection(Gk, pair.SBI2, pair.SBI1) / phase * wk
-                            )
-                else:
-                    raise Exception("Unknown Green's function solver!")
-
-            # these are the rotations perpendicular to the quantization axis
-            for u in orient["vw"]:
-                # section 2.H
-                H_XCF = rot_H.extract_exchange_field()[3]
-                Tu: NDArray = np.kron(
-                    np.eye(int(builder.hamiltonian.NO / 2), dtype=int), tau_u(u)
-                )
-                Vu1, Vu2 = calc_Vu(H_XCF[rot_H.uc_in_sc_index], Tu)
-
-                for mag_ent in _tqdm(
-                    builder.magnetic_entities,
-                    desc="Setup perturbations for rotated hamiltonian",
-                ):
-                    # fill up the perturbed potentials (for now) based on the on-site projections
-                    mag_ent._Vu1_tmp.append(
-                        onsite_projection(
-                            Vu1, mag_ent._spin_box_indices, mag_ent._spin_box_indices
-                        )
-                    )
-                    mag_ent._Vu2_tmp.append(
-                        onsite_projection(
-                            Vu2, mag_ent._spin_box_indices, mag_ent._spin_box_indices
-                        )
-                    )
+        It inverts the Hamiltonians of all directions set up in the given
+        k-points at the given energy levels. The k-points are distributed
+        over a pool of threads, because the linear algebra releases the GIL.
+        It does not need MPI, so it is useful on a single machine or in
+        notebooks.
 
-            if builder.spin_model == "isotopic-only":
-                for pair in builder.pairs:
-                    pair.energies = np.array(
-                        [
-                            [
-                                interaction_energy(
-                                    pair.M1._Vu1_tmp,
-                                    pair.M2._Vu1_tmp,
-                                    pair._Gij_tmp,
-                                    pair._Gji_tmp,
-                                    builder.contour.weights,
-                                )
-                            ]
-                        ]
-                    )
-            else:
-                # calculate energies in the current reference hamiltonian direction
-                for mag_ent in builder.magnetic_entities:
-                    mag_ent.calculate_energies(
-                        builder.contour.weights,
-                        append=True,
-                        third_direction=builder.spin_model == "generalised-grogu",
-                    )
-                for pair in builder.pairs:
-                    pair.calculate_energies(builder.contour.weights, append=True)
-
-            # if we want to keep all the information for some reason we can do it
-            if not builder.low_memory_mode:
-                builder._rotated_hamiltonians.append(rot_H)
-                for mag_ent in builder.magnetic_entities:
-                    mag_ent._Vu1.append(mag_ent._Vu1_tmp)
-                    mag_ent._Vu2.append(mag_ent._Vu2_tmp)
-                    mag_ent._Gii.append(mag_ent._Gii_tmp)
-                for pair in builder.pairs:
-                    pair._Gij.append(pair._Gij_tmp)
-                    pair._Gji.append(pair._Gji_tmp)
-            # or fill with empty stuff
-            else:
-                for mag_ent in builder.magnetic_entities:
-                    mag_ent._Vu1.append([])
-                    mag_ent._Vu2.append([])
-                    mag_ent._Gii.append([])
-                for pair in builder.pairs:
-                    pair._Gij.append([])
-                    pair._Gji.append([])
-
-                # rotate back hamiltonian for the original DFT orientation
-                rot_H.rotate(rot_H.scf_xcf_orientation)
-
-        # finalize energies of the magnetic entities and pairs
-        # calculate magnetic parameters
-        for mag_ent in builder.magnetic_entities:
-            # delete temporary stuff
-            del mag_ent._Gii_tmp
-            del mag_ent._Vu1_tmp
-            del mag_ent._Vu2_tmp
-
-            if builder.apply_spin_model:
-                if builder.spin_model == "generalised-fit":
-                    mag_ent.fit_anisotropy_tensor(builder.ref_xcf_orientations)
-                elif builder.spin_model == "generalised-grogu":
-                    mag_ent.calculate_anisotropy()
-                else:
-                    pass
+        Parameters
+        ----------
+        builder: Builder
+            The main grogupy object
+        print_memory: bool, optional
+            It can be turned on to print extra memory info, by default False
+        """
 
-        for pair in builder.pairs:
-            # delete temporary stuff
-            del pair._Gij_tmp
-            del pair._Gji_tmp
-
-            if builder.apply_spin_model:
-                if builder.spin_model == "generalised-fit":
-                    pair.fit_exchange_tensor(builder.ref_xcf_orientations)
-                elif builder.spin_model == "generalised-grogu":
-                    pair.calculate_exchange_tensor()
-                elif builder.spin_model == "isotropic-only":
-                    pair.calculate_isotropic_only()
-                elif builder.spin_model == "isotropic-biquadratic-only":
-                    pair.calculate_isotropic_biquadratic_only()
-                else:
-                    raise Exception(
-                        f"Unknown spin model: {builder.spin_model}! Use apply_spin_model=False"
-                    )
+        _serial_solver(builder, print_memory)
 
-    def solve_parallel_over_k(builder: "Builder", print_memory: bool = False) -> None:
-        """It calculates the energies by the Greens function method.
+    def solve_parallel_over_processes(
+        builder: "Builder", print_memory: bool = False
+    ) -> None:
+        """It calculates the energies by the Greens function method with a pool of processes.
 
         It inverts the Hamiltonians of all directions set up in the given
-        k-points at the given energy levels. The solution is parallelized over
-        k-points. It uses the `greens_function_solver` instance variable which
-        controls the solution method over the energy samples. Generally this is
-        the fastest solution method for smaller systems.
+        k-points at the given energy levels. The k-points are distributed
+        over a pool of processes. The Hamiltonian and the overlap matrix are
+        shared between the processes, so they are not copied to every
+        worker. It does not need MPI, so it is useful on a single machine.
 
         Parameters
         ----------
@@ -1066,7 +2894,7 @@ else:
             It can be turned on to print extra memory info, by default False
         """
 
-        raise Exception("MPI is not available!")
+        _serial_solver(builder, print_memory)
 
 
 if __name__ == "__main__":
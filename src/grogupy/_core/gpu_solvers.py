@@ -28,7 +28,7 @@ from grogupy._tqdm import _tqdm
 from grogupy.config import CONFIG
 from grogupy.physics.utilities import interaction_energy
 
-from .utilities import calc_Vu, onsite_projection, tau_u
+from .utilities import calc_onsite_Vu, onsite_projection
 
 if TYPE_CHECKING:
     from grogupy.physics.builder import Builder
@@ -318,8 +318,8 @@ if CONFIG.is_GPU:
                     builder.max_g_per_loop,
                     builder.greens_function_solver,
                     0,
-                    builder.kspace.kpoints,
-                    builder.kspace.weights,
+                    builder.kspace.full_kpoints,
+                    builder.kspace.full_weights,
                     builder.magnetic_entities.SBI,
                     builder.pairs.SBI1,
                     builder.pairs.SBI2,
@@ -341,30 +341,18 @@ if CONFIG.is_GPU:
                 pair._Gij_tmp = G_pair_ij_reduce[i]
                 pair._Gji_tmp = G_pair_ji_reduce[i]
 
+            # section 2.H
+            H_XCF = rot_H.extract_exchange_field()[3][rot_H.uc_in_sc_index]
             # these are the rotations perpendicular to the quantization axis
             for u in orient["vw"]:
-                # section 2.H
-                H_XCF = rot_H.extract_exchange_field()[3]
-                Tu: NDArray = np.kron(
-                    np.eye(int(builder.hamiltonian.NO / 2), dtype=int), tau_u(u)
-                )
-                Vu1, Vu2 = calc_Vu(H_XCF[rot_H.uc_in_sc_index], Tu)
-
                 for mag_ent in _tqdm(
                     builder.magnetic_entities,
                     desc="Setup perturbations for rotated hamiltonian",
                 ):
-                    # fill up the perturbed potentials (for now) based on the on-site projections
-                    mag_ent._Vu1_tmp.append(
-                        onsite_projection(
-                            Vu1, mag_ent._spin_box_indices, mag_ent._spin_box_indices
-                        )
-                    )
-                    mag_ent._Vu2_tmp.append(
-                        onsite_projection(
-                            Vu2, mag_ent._spin_box_indices, mag_ent._spin_box_indices
-                        )
-                    )
+                    # the perturbed potentials are only needed on-site
+                    Vu1, Vu2 = calc_onsite_Vu(H_XCF, u, mag_ent._spin_box_indices)
+                    mag_ent._Vu1_tmp.append(Vu1)
+                    mag_ent._Vu2_tmp.append(Vu2)
 
             if (
                 builder.spin_model == "isotropic-only"
@@ -570,8 +558,8 @@ if CONFIG.is_GPU:
             # split k points to parallelize
             # (this could be outside loop, but it was an easy fix for the
             # reset of tqdm in each reference direction)
-            parallel_k = np.array_split(builder.kspace.kpoints, parallel_size)
-            parallel_w = np.array_split(builder.kspace.weights, parallel_size)
+            parallel_k = np.array_split(builder.kspace.full_kpoints, parallel_size)
+            parallel_w = np.array_split(builder.kspace.full_weights, parallel_size)
             with ThreadPoolExecutor(max_workers=parallel_size) as executor:
                 futures = [
                     executor.submit(
@@ -614,30 +602,18 @@ if CONFIG.is_GPU:
                 pair._Gij_tmp = G_pair_ij_reduce[i]
                 pair._Gji_tmp = G_pair_ji_reduce[i]
 
+            # section 2.H
+            H_XCF = rot_H.extract_exchange_field()[3][rot_H.uc_in_sc_index]
             # these are the rotations perpendicular to the quantization axis
             for u in orient["vw"]:
-                # section 2.H
-                H_XCF = rot_H.extract_exchange_field()[3]
-                Tu: NDArray = np.kron(
-                    np.eye(int(builder.hamiltonian.NO / 2), dtype=int), tau_u(u)
-                )
-                Vu1, Vu2 = calc_Vu(H_XCF[rot_H.uc_in_sc_index], Tu)
-
                 for mag_ent in _tqdm(
                     builder.magnetic_entities,
                     desc="Setup perturbations for rotated hamiltonian",
                 ):
-                    # fill up the perturbed potentials (for now) based on the on-site projections
-                    mag_ent._Vu1_tmp.append(
-                        onsite_projection(
-                            Vu1, mag_ent._spin_box_indices, mag_ent._spin_box_indices
-                        )
-                    )
-                    mag_ent._Vu2_tmp.append(
-                        onsite_projection(
-                            Vu2, mag_ent._spin_box_indices, mag_ent._spin_box_indices
-                        )
-                    )
+                    # the perturbed potentials are only needed on-site
+                    Vu1, Vu2 = calc_onsite_Vu(H_XCF, u, mag_ent._spin_box_indices)
+                    mag_ent._Vu1_tmp.append(Vu1)
+                    mag_ent._Vu2_tmp.append(Vu2)
 
             if (
                 builder.spin_model == "isotropic-only"
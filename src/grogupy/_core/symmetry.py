@@ -0,0 +1,380 @@
+# Copyright (c) [2024-2025] [Grogupy Team]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import itertools
+from math import factorial
+from typing import Union
+
+import numpy as np
+import sisl
+from numpy.typing import NDArray
+from scipy.sparse import csr_matrix, diags, kron
+from scipy.special import lpmv
+
+from .constants import TAU_0, TAU_X, TAU_Y, TAU_Z
+from .utilities import make_kset
+
+
+def lattice_rotations(cell: NDArray, tol: float = 1e-5) -> NDArray:
+    """The point group of the lattice in fractional coordinates.
+
+    Every integer matrix with elements in {-1, 0, 1} is tried, which is
+    enough for the usual, not too skewed unit cells. A matrix ``M`` is
+    accepted if the corresponding cartesian transformation is orthogonal.
+
+    Parameters
+    ----------
+    cell: NDArray
+        The lattice vectors in the rows
+    tol: float, optional
+        Tolerance of the orthogonality, by default 1e-5
+
+    Returns
+    -------
+    NDArray
+        The integer matrices, which act on the fractional coordinates as
+        column vectors, the identity is the first one
+    """
+
+    cell = np.asarray(cell, dtype=float)
+    M = np.array(list(itertools.product([-1, 0, 1], repeat=9))).reshape(-1, 3, 3)
+    M = M[np.abs(np.round(np.linalg.det(M))) == 1]
+
+    # cartesian transformation R = A^T M A^-T
+    R = cell.T @ M @ np.linalg.inv(cell.T)
+    orthogonal = np.abs(R @ R.transpose(0, 2, 1) - np.eye(3)).max(axis=(1, 2)) < tol
+
+    M = M[orthogonal]
+    identity = (M == np.eye(3, dtype=int)).all(axis=(1, 2))
+
+    return np.concatenate([M[identity], M[~identity]])
+
+
+def space_group_operations(
+    geometry: sisl.Geometry, tol: float = 1e-4
+) -> list[tuple[NDArray, NDArray, NDArray]]:
+    """The symmetry operations of the geometry.
+
+    An operation maps the fractional coordinates ``f`` to ``M f + t``, where
+    the atom ``a`` goes to the atom ``perm[a]`` shifted by the lattice vector
+    ``shifts[a]``. Only one translation is kept for every ``M``, so pure
+    translations of supercells are dropped.
+
+    Parameters
+    ----------
+    geometry: sisl.Geometry
+        The geometry of the system
+    tol: float, optional
+        Tolerance of the atomic positions in Angstrom, by default 1e-4
+
+    Returns
+    -------
+    list[tuple[NDArray, NDArray, NDArray]]
+        The ``M``, ``perm`` and ``shifts`` of the operations, the identity is
+        the first one
+    """
+
+    cell = geometry.cell
+    fxyz = geometry.fxyz
+    species = geometry.atoms.species
+
+    operations = []
+    for M in lattice_rotations(cell):
+        mapped = fxyz @ M.T
+        for b in np.nonzero(species == species[0])[0]:
+            image = mapped + (fxyz[b] - mapped[0])
+
+            # distances of the images from the atoms modulo the lattice
+            diff = image[:, None, :] - fxyz[None, :, :]
+            diff -= np.round(diff)
+            distance = np.linalg.norm(diff @ cell, axis=-1)
+            match = (distance < tol) & (species[:, None] == species[None, :])
+
+            if not (match.sum(axis=1) == 1).all():
+                continue
+            perm = np.argmax(match, axis=1)
+            if len(np.unique(perm)) != len(perm):
+                continue
+
+            shifts = np.round(image - fxyz[perm]).astype(int)
+            operations.append((M, perm, shifts))
+            break
+
+    return operations
+
+
+def real_spherical_harmonics(l: int, m: int, r: NDArray) -> NDArray:
+    """The real spherical harmonics in the convention of Siesta and sisl.
+
+    Parameters
+    ----------
+    l: int
+        Degree of the spherical harmonics
+    m: int
+        Order of the spherical harmonics
+    r: NDArray
+        Unit vectors in the rows
+
+    Returns
+    -------
+    NDArray
+        The values in the given directions
+    """
+
+    theta = np.arctan2(r[:, 1], r[:, 0])
+    cos_phi = np.clip(r[:, 2], -1, 1)
+
+    factor = np.sqrt((2 * l + 1) / (4 * np.pi))
+    if m == 0:
+        return factor * lpmv(m, l, cos_phi)
+
+    factor *= np.sqrt(2 * factorial(l - m) / factorial(l + m))
+    if m < 0:
+        return -((-1) ** m) * factor * lpmv(m, l, cos_phi) * np.sin(m * theta)
+    return factor * lpmv(m, l, cos_phi) * np.cos(m * theta)
+
+
+def orbital_representation(atom: sisl.Atom, rotation: NDArray) -> Union[NDArray, None]:
+    """The transformation of the orbitals of an atom under a rotation.
+
+    The orbitals of a shell with the same ``n``, ``l``, ``zeta`` and
+    polarization are mixed by the real spherical harmonics, which are
+    sampled on random points of the unit sphere.
+
+    Parameters
+    ----------
+    atom: sisl.Atom
+        The atom with ``AtomicOrbital`` orbitals
+    rotation: NDArray
+        The cartesian rotation matrix, it can be improper
+
+    Returns
+    -------
+    Union[NDArray, None]
+        ``D``, where the rotated orbital ``j`` is ``sum_i D[i, j]`` times the
+        orbital ``i``, or None if the orbitals are not complete shells of
+        atomic orbitals
+    """
+
+    rng = np.random.default_rng(0)
+    points = rng.normal(size=(64, 3))
+    points /= np.linalg.norm(points, axis=1)[:, None]
+    # the orbitals at the inverse rotated points
+    rotated = points @ rotation
+
+    shells = {}
+    for i, orb in enumerate(atom.orbitals):
+        if not isinstance(orb, sisl.AtomicOrbital):
+            return None
+        shells.setdefault((orb.n, orb.l, orb.zeta, orb.P), []).append(i)
+
+    D = np.zeros((atom.no, atom.no))
+    for (n, l, zeta, P), idx in shells.items():
+        if sorted(atom.orbitals[i].m for i in idx) != list(range(-l, l + 1)):
+            return None
+        ms = [atom.orbitals[i].m for i in idx]
+        Y = np.array([real_spherical_harmonics(l, m, points) for m in ms]).T
+        Y_rot = np.array([real_spherical_harmonics(l, m, rotated) for m in ms]).T
+        D[np.ix_(idx, idx)] = np.linalg.lstsq(Y, Y_rot, rcond=None)[0]
+
+    return D
+
+
+def spin_representation(rotation: NDArray) -> NDArray:
+    """The SU(2) matrix of the proper part of a rotation.
+
+    Parameters
+    ----------
+    rotation: NDArray
+        The cartesian rotation matrix, it can be improper
+
+    Returns
+    -------
+    NDArray
+        The 2x2 spin rotation matrix
+    """
+
+    # spin is an axial vector, so only the proper part acts on it
+    R = rotation * np.linalg.det(rotation)
+    angle = np.arccos(np.clip((np.trace(R) - 1) / 2, -1, 1))
+    if np.isclose(angle, 0):
+        return TAU_0.copy()
+
+    if np.isclose(angle, np.pi):
+        # the axis is the eigenvector with eigenvalue 1
+        w, v = np.linalg.eigh((R + np.eye(3)) / 2)
+        axis = v[:, np.argmax(w)]
+    else:
+        axis = np.array([R[2, 1] - R[1, 2], R[0, 2] - R[2, 0], R[1, 0] - R[0, 1]])
+        axis /= 2 * np.sin(angle)
+
+    sigma = axis[0] * TAU_X + axis[1] * TAU_Y + axis[2] * TAU_Z
+    return np.cos(angle / 2) * TAU_0 - 1j * np.sin(angle / 2) * sigma
+
+
+def spin_orbital_representation(
+    geometry: sisl.Geometry,
+    operation: tuple[NDArray, NDArray, NDArray],
+    spin: bool = True,
+) -> Union[tuple[csr_matrix, NDArray], None]:
+    """The transformation of the spin box basis under a symmetry operation.
+
+    The Bloch states in k are mapped to ``M^-T k`` by ``U * exp(i 2 pi
+    (M^-T k) shifts)``, where the phase belongs to the columns.
+
+    Parameters
+    ----------
+    geometry: sisl.Geometry
+        The geometry of the system
+    operation: tuple[NDArray, NDArray, NDArray]
+        The ``M``, ``perm`` and ``shifts`` of the operation
+    spin: bool, optional
+        If it is True, then the spin is rotated with the lattice, otherwise
+        the spin is left unchanged, by default True
+
+    Returns
+    -------
+    Union[tuple[csr_matrix, NDArray], None]
+        The spin box representation without the phases and the lattice
+        shifts of the spin box indices, or None if the orbitals can not be
+        rotated
+    """
+
+    M, perm, shifts = operation
+    cell = geometry.cell
+    rotation = cell.T @ M @ np.linalg.inv(cell.T)
+
+    # the representation only depends on the species
+    representations = {}
+    for specie, atom in enumerate(geometry.atoms.atom):
+        representations[specie] = orbital_representation(atom, rotation)
+        if representations[specie] is None:
+            return None
+
+    rows, cols, data = [], [], []
+    for a in range(geometry.na):
+        D = representations[geometry.atoms.species[a]]
+        o1, o2 = geometry.a2o(a), geometry.a2o(perm[a])
+        i, j = np.nonzero(np.abs(D) > 1e-12)
+        rows.append(o2 + i)
+        cols.append(o1 + j)
+        data.append(D[i, j])
+
+    U_orb = csr_matrix(
+        (np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))),
+        shape=(geometry.no, geometry.no),
+    )
+    U_spin = spin_representation(rotation) if spin else TAU_0
+    U = kron(U_orb, U_spin, format="csr")
+
+    orbital_shifts = np.repeat(shifts[geometry.o2a(np.arange(geometry.no))], 2, axis=0)
+
+    return U, orbital_shifts
+
+
+def operation_phase(U: csr_matrix, orbital_shifts: NDArray, k: NDArray) -> csr_matrix:
+    """The spin box representation of a symmetry operation in k.
+
+    Parameters
+    ----------
+    U: csr_matrix
+        The representation from ``spin_orbital_representation``
+    orbital_shifts: NDArray
+        The lattice shifts of the spin box indices
+    k: NDArray
+        The k point that is mapped
+
+    Returns
+    -------
+    csr_matrix
+        The representation, which maps the Bloch states in ``k`` to the
+        rotated k point
+    """
+
+    return U @ diags(np.exp(1j * 2 * np.pi * orbital_shifts @ k))
+
+
+def k_rotation(M: NDArray) -> NDArray:
+    """The action of a symmetry operation on the fractional k points."""
+
+    return np.round(np.linalg.inv(M).T).astype(int)
+
+
+def kset_compatible(kset: Union[list, NDArray], N: NDArray) -> bool:
+    """Checks that the k rotation maps the grid of ``make_kset`` to itself."""
+
+    kset = np.array(kset)
+    scaled = kset[:, None] * N / kset[None, :]
+
+    return np.allclose(scaled, np.round(scaled))
+
+
+def is_group(elements: list[tuple[NDArray, int]]) -> bool:
+    """Checks that the k rotations with time reversal flags are closed."""
+
+    keys = {(tuple(N.flatten()), theta) for N, theta in elements}
+    for (N1, t1), (N2, t2) in itertools.product(elements, repeat=2):
+        if (tuple((N1 @ N2).flatten()), t1 ^ t2) not in keys:
+            return False
+
+    return True
+
+
+def irreducible_kset(
+    kset: Union[list, NDArray], k_rotations: list[NDArray]
+) -> tuple[NDArray, NDArray]:
+    """The irreducible k points of the grid of ``make_kset``.
+
+    Parameters
+    ----------
+    kset: Union[list, NDArray]
+        The number of k points in each direction
+    k_rotations: list[NDArray]
+        The integer matrices acting on the fractional k points, they must
+        form a group, which maps the grid to itself
+
+    Returns
+    -------
+    kpoints: NDArray
+        The irreducible k points
+    weights: NDArray
+        The number of k points in their star divided by the size of the grid
+    """
+
+    kset = np.array(kset, dtype=int)
+    kpoints = make_kset(kset)
+    idx = np.rint(kpoints * kset).astype(int) % kset
+    lin = np.ravel_multi_index(idx.T, kset)
+
+    # the smallest index in the star is the representative
+    representative = lin.copy()
+    for N in k_rotations:
+        image = np.rint((kpoints @ N.T) * kset).astype(int) % kset
+        representative = np.minimum(representative, np.ravel_multi_index(image.T, kset))
+
+    irreducible = representative == lin
+    counts = np.bincount(representative, minlength=kset.prod())
+
+    return kpoints[irreducible], counts[lin[irreducible]] / len(kpoints)
+
+
+if __name__ == "__main__":
+    pass
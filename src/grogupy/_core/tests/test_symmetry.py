@@ -0,0 +1,101 @@
+# Copyright (c) [2024-2025] [Grogupy Team]
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import numpy as np
+import pytest
+import sisl
+
+from grogupy._core.constants import TAU_X, TAU_Y, TAU_Z
+from grogupy._core.symmetry import *
+
+pytestmark = [pytest.mark.core]
+
+
+class TestSymmetry:
+    @pytest.mark.parametrize(
+        "cell, order",
+        [
+            (np.eye(3), 48),
+            ([[1, 0, 0], [-0.5, np.sqrt(3) / 2, 0], [0, 0, 5]], 24),
+            ([[1, 0, 0], [0.1, 1.3, 0], [0.2, 0.3, 1.7]], 2),
+        ],
+    )
+    def test_lattice_rotations(self, cell, order):
+        M = lattice_rotations(cell)
+        assert len(M) == order
+        assert (M[0] == np.eye(3)).all()
+
+    def test_space_group_operations(self):
+        geometry = sisl.geom.graphene()
+        operations = space_group_operations(geometry)
+        assert len(operations) == 24
+        for M, perm, shifts in operations:
+            image = geometry.fxyz @ M.T
+            image += geometry.fxyz[perm[0]] + shifts[0] - image[0]
+            assert np.allclose(image, geometry.fxyz[perm] + shifts, atol=1e-4)
+
+    def test_orbital_representation(self):
+        orbitals = [
+            sisl.AtomicOrbital("s", R=1),
+            sisl.AtomicOrbital("pxZ1", R=1),
+            sisl.AtomicOrbital("pyZ1", R=1),
+            sisl.AtomicOrbital("pzZ1", R=1),
+        ] + [sisl.AtomicOrbital(n=3, l=2, m=m, R=1) for m in range(-2, 3)]
+        atom = sisl.Atom(26, orbitals=orbitals)
+        rotation = np.array([[0, -1, 0], [1, 0, 0], [0, 0, 1]])
+
+        D = orbital_representation(atom, rotation)
+        assert np.allclose(D @ D.T, np.eye(atom.no))
+        assert np.isclose(D[0, 0], 1)
+        # px goes to py under a rotation around z
+        px, py = 1, 2
+        assert np.isclose(abs(D[py, px]), 1)
+
+        # incomplete shells can not be rotated
+        assert (
+            orbital_representation(sisl.Atom(26, orbitals=orbitals[:2]), rotation)
+            is None
+        )
+
+    def test_spin_representation(self):
+        rotation = np.array([[0, -1, 0], [1, 0, 0], [0, 0, 1]])
+        U = spin_representation(rotation)
+        sigma = [TAU_X, TAU_Y, TAU_Z]
+        for i in range(3):
+            rotated = sum(rotation[j, i] * sigma[j] for j in range(3))
+            assert np.allclose(U @ sigma[i] @ U.conj().T, rotated)
+        # the spin is not changed by the inversion
+        assert np.allclose(abs(spin_representation(-np.eye(3))), np.eye(2))
+
+    def test_irreducible_kset(self):
+        M = lattice_rotations(np.diag([1, 1, 5]))
+        N = [k_rotation(m) for m in M]
+        assert all(kset_compatible([4, 4, 1], n) for n in N)
+        assert is_group([(n, 0) for n in N])
+
+        kpoints, weights = irreducible_kset([4, 4, 1], N)
+        assert len(kpoints) == 6
+        assert np.isclose(weights.sum(), 1)
+        assert not kset_compatible([4, 2, 1], N[np.argmax([n[0, 1] != 0 for n in N])])
+
+
+if __name__ == "__main__":
+    pass
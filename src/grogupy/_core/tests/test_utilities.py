@@ -19,6 +19,7 @@
 # SOFTWARE.
 
 import pytest
+import sisl
 from numpy.testing import assert_allclose
 
 from grogupy._core.utilities import *
@@ -70,21 +71,267 @@ class TestCore:
     def test_calc_Vu(self):
         raise NotImplementedError
 
-    @pytest.mark.xfail(raises=NotImplementedError)
+    def test_calc_onsite_Vu(self):
+        NO = 12
+        A = np.random.random((NO, NO)) + 1j * np.random.random((NO, NO))
+        H = A + A.conj().T
+        u = np.array([1, 2, -1])
+        idx = np.array([2, 3, 8, 9])
+
+        Tu = np.kron(np.eye(NO // 2), tau_u(u))
+        Vu1, Vu2 = calc_Vu(H, Tu)
+        onsite_Vu1, onsite_Vu2 = calc_onsite_Vu(H, u, idx)
+        assert_allclose(onsite_Vu1, onsite_projection(Vu1, idx, idx))
+        assert_allclose(onsite_Vu2, onsite_projection(Vu2, idx, idx))
+
+    def test_time_reversal(self):
+        NS, NO = 3, 8
+        M = np.random.random((NS, NO, NO)) + 1j * np.random.random((NS, NO, NO))
+        TAUY = np.kron(np.eye(NO // 2), TAU_Y)
+
+        assert_allclose(time_reversal(M), TAUY @ M.conj() @ TAUY)
+        # the compressed form is reversed on the nonzero elements
+        M[np.random.random(M.shape) < 0.5] = 0
+        assert_allclose(
+            time_reversal(spin_box_csr(M)).toarray(),
+            spin_box_csr(time_reversal(M)).toarray(),
+        )
+
+    def test_exchange_hamiltonian(self):
+        NS, NO = 3, 8
+        XCF = np.random.random((3, NS, NO // 2, NO // 2))
+
+        assert_allclose(
+            exchange_hamiltonian(XCF),
+            sum(np.kron(XCF[i], tau) for i, tau in enumerate([TAU_X, TAU_Y, TAU_Z])),
+        )
+        # the compressed exchange field gives the compressed Hamiltonian
+        XCF[np.random.random(XCF.shape) < 0.5] = 0
+        assert_allclose(
+            exchange_hamiltonian([spin_box_csr(xcf) for xcf in XCF]).toarray(),
+            spin_box_csr(exchange_hamiltonian(XCF)).toarray(),
+        )
+
     def test_build_hh_ss(self):
-        raise NotImplementedError
+        geom = sisl.geom.graphene().tile(2, 0)
+        dh = sisl.Hamiltonian(geom, spin=sisl.Spin("so"), orthogonal=False)
+        for i in range(geom.no):
+            for j in geom.close(geom.o2a(i), R=[0.1, 1.5])[1]:
+                dh[i, j] = np.random.random(9)
+
+        hh, ss = build_hh_ss(dh)
+        uc = dh.lattice.sc_index([0, 0, 0])
+        # the spin up block of the unit cell
+        h11 = (dh.tocsr(0) + dh.tocsr(dh.M11i) * 1j)[:, uc * dh.no : (uc + 1) * dh.no]
+        assert_allclose(hh[uc, 0::2, 0::2], (h11 + h11.T.conj()).toarray() / 2)
+        assert_allclose(ss[uc, 0::2, 1::2], 0)
+        # the matrices are hermitian
+        partners = dh.lattice.sc_index(-dh.sc_off)
+        assert_allclose(hh, hh[partners].conj().transpose(0, 2, 1))
+        assert_allclose(ss, ss[partners].conj().transpose(0, 2, 1))
+
+        # the sparse form is the compressed dense form
+        sparse_hh, sparse_ss = build_hh_ss(dh, sparse=True)
+        assert_allclose(sparse_hh.toarray(), spin_box_csr(hh).toarray())
+        assert_allclose(sparse_ss.toarray(), spin_box_csr(ss).toarray())
 
     @pytest.mark.xfail(raises=NotImplementedError)
     def test_make_contour(self):
         raise NotImplementedError
 
+    def test_make_kronrod_contour(self):
+        ze, we, wg, segments = make_kronrod_contour(-10, 0, 1, 100)
+        # the embedded rule is the Gauss-Legendre contour
+        ze_gauss, we_gauss = make_contour(-10, 0, 7, 100)
+        assert_allclose(ze[1::2], ze_gauss)
+        assert_allclose(wg[1::2], we_gauss)
+        assert_allclose(wg[::2], 0)
+
+        ze, we, wg, segments = make_kronrod_contour(-10, 0, 4, 1000)
+        assert len(ze) == len(we) == len(wg) == 60
+        assert np.isclose(we.sum(), 10)
+        # the segments can be given explicitly
+        ze2, we2, wg2, segments2 = make_kronrod_contour(-10, 0, segments, 1000)
+        assert_allclose(ze, ze2)
+        assert_allclose(we, we2)
+        assert_allclose(segments, segments2)
+
     @pytest.mark.xfail(raises=NotImplementedError)
     def test_make_kset(self):
         raise NotImplementedError
 
-    @pytest.mark.xfail(raises=NotImplementedError)
+    def test_make_trs_kset(self):
+        kset = np.array([4, 3, 2])
+        kpoints, weights = make_trs_kset(kset)
+        full = make_kset(kset)
+        assert np.isclose(weights.sum(), 1)
+
+        # the weights of the merged points are doubled
+        for k, w in zip(kpoints, weights):
+            self_partner = np.allclose((2 * k * kset) % kset, 0)
+            assert np.isclose(w, (1 if self_partner else 2) / len(full))
+
+    def test_make_qmc_kset(self):
+        kpoints = make_qmc_kset([4, 1, 3], 16, 3, seed=2)
+        assert kpoints.shape == (3, 16, 3)
+        assert np.allclose(kpoints[:, :, 1], 0)
+        # the replicas are scrambled independently
+        assert not np.allclose(kpoints[0], kpoints[1])
+        # the samples can be extended
+        assert_allclose(make_qmc_kset([4, 1, 3], 32, 3, seed=2)[:, :16], kpoints)
+
+        with pytest.raises(Exception):
+            make_qmc_kset([4, 1, 3], 10, 3)
+
+    def test_kpoints_on_kset(self):
+        kset = np.array([3, 2, 1])
+        fine = make_kset(2 * kset)
+        on_kset = kpoints_on_kset(fine, kset)
+        assert on_kset.sum() == kset.prod()
+        # the coarse grid is nested in the refined grid
+        assert_allclose(
+            np.sort(fine[on_kset], axis=0), np.sort(make_kset(kset), axis=0)
+        )
+
     def test_hsk(self):
-        raise NotImplementedError
+        NS, NO = 9, 8
+        H = np.random.random((NS, NO, NO)) + 1j * np.random.random((NS, NO, NO))
+        H[np.random.random(H.shape) < 0.7] = 0
+        S = np.random.random((NS, NO, NO))
+        sc_off = np.array([[i, j, 0] for i in range(-1, 2) for j in range(-1, 2)])
+        k = np.array([0.1, -0.3, 0])
+
+        phases = np.exp(-2j * np.pi * sc_off @ k)
+        Hk, Sk = hsk(H, S, sc_off, k)
+        assert_allclose(Hk, np.einsum("a,abc->bc", phases, H))
+        assert_allclose(Sk, np.einsum("a,abc->bc", phases, S))
+        # the compressed matrices give the same dense matrices
+        cHk, cSk = hsk(spin_box_csr(H), spin_box_csr(S), sc_off, k)
+        assert_allclose(cHk, Hk)
+        assert_allclose(cSk, Sk)
+
+    def test_rotated_hsk(self):
+        NS, NO = 5, 8
+        hTRS = np.random.random((NS, NO, NO)) + 1j * np.random.random((NS, NO, NO))
+        XCF = np.random.random((4, NS, NO // 2, NO // 2))
+        S = np.random.random((NS, NO, NO))
+        sc_off = np.random.randint(-1, 2, (NS, 3))
+        k = np.array([0.1, -0.3, 0])
+        rotations = np.zeros((2, 4, 4))
+        rotations[0] = np.eye(4)
+        rotations[1, 1:, 1:] = RotMa2b(np.array([0, 0, 1]), np.array([1, 0, 0]))
+
+        Hks, Sk = rotated_hsk(hTRS, XCF, S, sc_off, rotations, k)
+        for Hk, rotation in zip(Hks, rotations):
+            xcf = np.einsum("ij,jklm->iklm", rotation, XCF)
+            H = hTRS + sum(
+                np.kron(xcf[i], tau)
+                for i, tau in enumerate([np.eye(2), TAU_X, TAU_Y, TAU_Z])
+            )
+            assert_allclose(Hk, hsk(H, S, sc_off, k)[0])
+        assert_allclose(Sk, hsk(hTRS, S, sc_off, k)[1])
+
+    def test_greens_function_columns(self):
+        NO = 20
+        A = np.random.random((NO, NO)) + 1j * np.random.random((NO, NO))
+        Hk = A + A.conj().T
+        Sk = np.eye(NO) + 0.01 * (A @ A.conj().T)
+        samples = np.array([-1 + 0.5j, 0.1j, 2 + 0.01j])
+        columns = np.array([1, 2, 7, 8, 15])
+
+        G = np.linalg.inv(Sk * samples.reshape(len(samples), 1, 1) - Hk)
+        assert_allclose(
+            greens_function_columns(Hk, Sk, samples, columns),
+            onsite_projection(G, columns, columns),
+        )
+
+    def test_greens_function_eigen(self):
+        NO = 20
+        A = np.random.random((NO, NO)) + 1j * np.random.random((NO, NO))
+        Hk = A + A.conj().T
+        Sk = np.eye(NO) + 0.01 * (A @ A.conj().T)
+        samples = np.array([-1 + 0.5j, 0.1j, 2 + 0.01j])
+        columns = np.array([1, 2, 7, 8, 15])
+
+        G = np.linalg.inv(Sk * samples.reshape(len(samples), 1, 1) - Hk)
+        assert_allclose(
+            greens_function_eigen(Hk, Sk, samples, columns),
+            onsite_projection(G, columns, columns),
+        )
+
+    def test_sparse_hsk(self):
+        NS, NO = 9, 12
+        H = np.random.random((NS, NO, NO)) + 1j * np.random.random((NS, NO, NO))
+        H[np.random.random(H.shape) < 0.7] = 0
+        S = np.random.random((NS, NO, NO))
+        sc_off = np.array([[i, j, 0] for i in range(-1, 2) for j in range(-1, 2)])
+        k = np.array([0.1, -0.3, 0])
+
+        Hk, Sk = hsk(H, S, sc_off, k)
+        sHk, sSk = sparse_hsk(spin_box_csr(H), spin_box_csr(S), sc_off, k)
+        assert_allclose(sHk.toarray(), Hk)
+        assert_allclose(sSk.toarray(), Sk)
+
+    def test_supercell_block(self):
+        NS, NO = 5, 8
+        H = np.random.random((NS, NO, NO))
+
+        assert_allclose(supercell_block(H, 2), H[2])
+        assert_allclose(supercell_block(spin_box_csr(H), 2).toarray(), H[2])
+
+    def test_greens_function_sparse(self):
+        NO = 20
+        A = np.random.random((NO, NO)) + 1j * np.random.random((NO, NO))
+        A[np.random.random(A.shape) < 0.7] = 0
+        Hk = A + A.conj().T
+        Sk = np.eye(NO)
+        samples = np.array([-1 + 0.5j, 0.1j, 2 + 0.01j])
+        columns = np.array([1, 2, 7, 8, 15])
+
+        G = np.linalg.inv(Sk * samples.reshape(len(samples), 1, 1) - Hk)
+        sHk, sSk = sparse_hsk(
+            spin_box_csr(Hk[None]), spin_box_csr(Sk[None]), np.zeros((1, 3))
+        )
+        assert_allclose(
+            greens_function_sparse(sHk, sSk, samples, columns),
+            onsite_projection(G, columns, columns),
+        )
+
+    def test_block_tridiagonal_layers(self):
+        # a chain of atoms in random order
+        order = np.random.permutation(8)
+        connectivity = np.zeros((8, 8), dtype=bool)
+        for i in range(7):
+            connectivity[order[i], order[i + 1]] = True
+
+        layers = block_tridiagonal_layers(connectivity)
+        assert len(layers) == 8
+        assert np.array_equal(np.sort(np.concatenate(layers)), np.arange(8))
+        layer_index = np.zeros(8, dtype=int)
+        for i, layer in enumerate(layers):
+            layer_index[layer] = i
+        a, b = np.nonzero(connectivity)
+        assert (np.abs(layer_index[a] - layer_index[b]) <= 1).all()
+
+    def test_greens_function_recursive(self):
+        N, b = 5, 4
+        NO = N * b
+        A = np.random.random((NO, NO)) + 1j * np.random.random((NO, NO))
+        for i in range(N):
+            for j in range(N):
+                if abs(i - j) > 1:
+                    A[i * b : (i + 1) * b, j * b : (j + 1) * b] = 0
+        Hk = A + A.conj().T
+        Sk = np.eye(NO)
+        samples = np.array([-1 + 0.5j, 0.1j, 2 + 0.01j])
+        columns = np.array([1, 2, 7, 8, 15])
+        layers = [np.arange(i * b, (i + 1) * b) for i in range(N)]
+
+        G = np.linalg.inv(Sk * samples.reshape(len(samples), 1, 1) - Hk)
+        assert_allclose(
+            greens_function_recursive(Hk, Sk, samples, columns, layers),
+            onsite_projection(G, columns, columns),
+        )
 
     @pytest.mark.xfail(raises=NotImplementedError)
     def test_process_ref_directions(self):
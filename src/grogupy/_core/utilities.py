@@ -23,12 +23,23 @@ from typing import Any, Union
 import numpy as np
 import sisl
 from numpy.typing import NDArray
+from scipy.linalg import eigh
+from scipy.sparse import coo_matrix, csc_matrix, csr_matrix, issparse
+from scipy.sparse.linalg import splu
 from scipy.special import roots_legendre
+from scipy.stats import qmc
 
 from grogupy._tqdm import _tqdm
 from grogupy.config import CONFIG
 
-from .constants import TAU_X, TAU_Y, TAU_Z
+from .constants import (
+    GAUSS_WEIGHTS,
+    KRONROD_NODES,
+    KRONROD_WEIGHTS,
+    TAU_X,
+    TAU_Y,
+    TAU_Z,
+)
 
 if CONFIG.is_GPU:
     # initialize parallel GPU stuff
@@ -494,16 +505,156 @@ def calc_Vu(H: NDArray, Tu: NDArray) -> tuple[NDArray, NDArray]:
     return Vu1, Vu2
 
 
-def build_hh_ss(dh: sisl.physics.Hamiltonian) -> tuple[NDArray, NDArray]:
+def calc_onsite_Vu(H: NDArray, u: NDArray, idx: NDArray) -> tuple[NDArray, NDArray]:
+    """Calculates the on-site projection of the local perturbation.
+
+    The rotation ``Tu = kron(eye(NO/2), tau_u(u))`` is block diagonal in
+    the spin boxes, so the on-site projection of the commutators in
+    ``calc_Vu`` only depends on the on-site projection of the Hamiltonian.
+    The spin rotation is applied on the spin boxes of the projection, so
+    the dense rotation matrix of the whole system is never formed.
+
+    Parameters
+    ----------
+        H: Union[(NO, NO) NDArray, (NO, NO) csr_matrix]
+            Hamiltonian
+        u: NDArray
+            The direction of the rotation
+        idx: NDArray
+            The spin box indexes of the orbitals, both spins of the
+            orbitals must be included
+
+    Returns
+    -------
+        Vu1: NDArray
+            On-site projection of the first order perturbed matrix
+        Vu2: NDArray
+            On-site projection of the second order perturbed matrix
+    """
+
+    n = len(idx) // 2
+    H = onsite_projection(H, idx, idx)
+    # the compressed Hamiltonian is only expanded on-site
+    if issparse(H):
+        H = H.toarray()
+    H = H.reshape(n, 2, n, 2)
+    t = tau_u(u)
+
+    def commutator_Tu(M: NDArray) -> NDArray:
+        # M @ Tu - Tu @ M in spin box form
+        return np.einsum("asbt,tr->asbr", M, t) - np.einsum("rs,asbt->arbt", t, M)
+
+    C = commutator_Tu(H)
+    Vu1 = 1j / 2 * C  # equation 100
+    Vu2 = 1 / 8 * commutator_Tu(-C)  # equation 100
+
+    return Vu1.reshape(2 * n, 2 * n), Vu2.reshape(2 * n, 2 * n)
+
+
+def time_reversal(M: NDArray) -> NDArray:
+    """Time reversal of matrices in spin box representation.
+
+    It is ``TAUY @ M.conj() @ TAUY`` with ``TAUY = kron(eye(NO/2), TAU_Y)``,
+    but instead of the dense products it swaps the spins and changes the
+    sign of the spin off-diagonal elements, so it is exact and it scales
+    with the number of elements. The compressed matrices of ``spin_box_csr``
+    are reversed on their nonzero elements.
+
+    Parameters
+    ----------
+        M: Union[NDArray, csr_matrix]
+            Matrices in spin box representation with shape (..., NO, NO) or
+            in compressed spin box form with shape (NO, NS * NO)
+
+    Returns
+    -------
+        Union[NDArray, csr_matrix]
+            The time reversed matrices
+    """
+
+    if issparse(M):
+        M = M.tocoo()
+        # the supercells start at even columns, so the spins are swapped
+        # by the last bit of the indices
+        sign = np.where(M.row % 2 == M.col % 2, 1, -1)
+        return csr_matrix((sign * M.data.conj(), (M.row ^ 1, M.col ^ 1)), shape=M.shape)
+
+    n = M.shape[-1] // 2
+    spin_box = M.reshape(M.shape[:-2] + (n, 2, n, 2))
+
+    out = spin_box[..., ::-1, :, ::-1].conj()
+    out[..., 0, :, 1] *= -1
+    out[..., 1, :, 0] *= -1
+
+    return out.reshape(M.shape)
+
+
+def exchange_hamiltonian(XCF: NDArray) -> NDArray:
+    """Spin box representation of the exchange field.
+
+    It is the sum of the kronecker products of the exchange field with the
+    Pauli matrices, but the spin blocks are filled directly. The compressed
+    exchange field gives the exchange Hamiltonian in the layout of
+    ``spin_box_csr``.
+
+    Parameters
+    ----------
+        XCF: Union[NDArray, list[csr_matrix]]
+            The exchange field with shape (3, ..., NO/2, NO/2) or the three
+            compressed components with shape (NO/2, NS * NO/2)
+
+    Returns
+    -------
+        Union[NDArray, csr_matrix]
+            The exchange Hamiltonian with shape (..., NO, NO) or (NO, NS * NO)
+    """
+
+    X, Y, Z = XCF
+    if issparse(X):
+        row, col, data = [], [], []
+        for block, a, b in [
+            (Z, 0, 0),
+            (X - 1j * Y, 0, 1),
+            (X + 1j * Y, 1, 0),
+            (-Z, 1, 1),
+        ]:
+            block = block.tocoo()
+            row.append(2 * block.row + a)
+            col.append(2 * block.col + b)
+            data.append(block.data.astype("complex128"))
+        row, col, data = map(np.concatenate, (row, col, data))
+        return csr_matrix((data, (row, col)), shape=(2 * X.shape[0], 2 * X.shape[1]))
+
+    n = X.shape[-1]
+    spin_box = np.empty(
+        X.shape[:-2] + (n, 2, n, 2), dtype=np.result_type(X, Y, Z, np.complex128)
+    )
+    spin_box[..., 0, :, 0] = Z
+    spin_box[..., 0, :, 1] = X - 1j * Y
+    spin_box[..., 1, :, 0] = X + 1j * Y
+    spin_box[..., 1, :, 1] = -Z
+
+    return spin_box.reshape(X.shape[:-2] + (2 * n, 2 * n))
+
+
+def build_hh_ss(
+    dh: sisl.physics.Hamiltonian, sparse: bool = False
+) -> Union[tuple[NDArray, NDArray], tuple[csr_matrix, csr_matrix]]:
     """It builds the Hamiltonian and Overlap matrix from the sisl.dh class.
 
     It restructures the data in the SPIN BOX representation, where NS is
-    the number of supercells and NO is the number of orbitals.
+    the number of supercells and NO is the number of orbitals. The nonzero
+    elements of the spin components are scattered directly to the spin box
+    layout and the hermitisation is done on the nonzero elements, so the
+    dense matrices are only built for the output.
 
     Parameters
     ----------
         dh: sisl.physics.Hamiltonian
             Hamiltonian read in by sisl
+        sparse: bool, optional
+            If it is True, the matrices are returned in the sparse layout of
+            ``spin_box_csr``, by default False
 
     Returns
     -------
@@ -521,7 +672,6 @@ def build_hh_ss(dh: sisl.physics.Hamiltonian) -> tuple[NDArray, NDArray]:
     # it will be zero, when we convert to complex
     if dh.spin.kind == 3:
         h11 += dh.tocsr(dh.M11i) * 1.0j
-    h11 = h11.toarray().reshape(NO, dh.n_s, NO).transpose(0, 2, 1).astype("complex128")
 
     # this is known for polarized, non-collinear and spin orbit
     h22 = dh.tocsr(1)  # 1 is M22 or M22r
@@ -529,21 +679,14 @@ def build_hh_ss(dh: sisl.physics.Hamiltonian) -> tuple[NDArray, NDArray]:
     # it will be zero, when we convert to complex
     if dh.spin.kind == 3:
         h22 += dh.tocsr(dh.M22i) * 1.0j
-    h22 = h22.toarray().reshape(NO, dh.n_s, NO).transpose(0, 2, 1).astype("complex128")
 
     # if it is non-colinear or spin orbit, then these are known
     if dh.spin.kind == 2 or dh.spin.kind == 3:
         h12 = dh.tocsr(2)  # 2 is dh.M12r
         h12 += dh.tocsr(3) * 1.0j  # 3 is dh.M12i
-        h12 = (
-            h12.toarray()
-            .reshape(NO, dh.n_s, NO)
-            .transpose(0, 2, 1)
-            .astype("complex128")
-        )
     # if it is polarized then this should be zero
     elif dh.spin.kind == 1:
-        h12 = np.zeros_like(h11).astype("complex128")
+        h12 = None
     else:
         raise Exception("Unpolarized DFT calculation cannot be used!")
 
@@ -551,111 +694,87 @@ def build_hh_ss(dh: sisl.physics.Hamiltonian) -> tuple[NDArray, NDArray]:
     if dh.spin.kind == 3:
         h21 = dh.tocsr(dh.M21r)
         h21 += dh.tocsr(dh.M21i) * 1.0j
-        h21 = (
-            h21.toarray()
-            .reshape(NO, dh.n_s, NO)
-            .transpose(0, 2, 1)
-            .astype("complex128")
-        )
     # if it is non-colinear or polarized then this should be zero
     elif dh.spin.kind == 1 or dh.spin.kind == 2:
-        h21 = np.zeros_like(h11).astype("complex128")
+        h21 = None
     else:
         raise Exception("Unpolarized DFT calculation cannot be used!")
 
-    sov = (
-        dh.tocsr(dh.S_idx)
-        .toarray()
-        .reshape(NO, dh.n_s, NO)
-        .transpose(0, 2, 1)
-        .astype("complex128")
-    )
-
-    # Reorganization of Hamiltonian and overlap matrix elements to SPIN BOX representation
-    U = np.vstack(
-        [
-            np.kron(np.eye(NO, dtype=int), np.array([1, 0])),
-            np.kron(np.eye(NO, dtype=int), np.array([0, 1])),
-        ]
-    )
+    sov = dh.tocsr(dh.S_idx)
 
-    # This is the permutation that transforms ud1ud2 to u12d12
-    # That is this transforms FROM SPIN BOX to ORBITAL BOX => U
-    # the inverse transformation is U.T u12d12 to ud1ud2
-    # That is FROM ORBITAL BOX to SPIN BOX => U.T
+    # the supercell of the hermitian conjugate partner
+    partners = dh.lattice.sc_index(-dh.sc_off)
 
     # progress bar
-    bar = _tqdm(None, total=3 * dh.n_s, desc="Setting up Hamiltonian")
+    bar = _tqdm(None, total=2, desc="Setting up Hamiltonian")
 
     # From now on everything is in SPIN BOX!!
-    if CONFIG.is_CPU:
-        hh = []
-        for i in range(dh.n_s):
-            row1 = np.hstack([h11[:, :, i], h12[:, :, i]])
-            row2 = np.hstack([h21[:, :, i], h22[:, :, i]])
-            block = np.vstack([row1, row2])
-            hh.append(U.T @ block @ U)
-            bar.update()
-        hh = np.array(hh)
-
-        ss = []
-        for i in range(dh.n_s):
-            row1 = np.hstack([sov[:, :, i], sov[:, :, i] * 0])
-            row2 = np.hstack([sov[:, :, i] * 0, sov[:, :, i]])
-            block = np.vstack([row1, row2])
-            ss.append(U.T @ block @ U)
-            bar.update()
-        ss = np.array(ss)
-
-        for i in range(dh.n_s):
-            j = dh.lattice.sc_index(-dh.sc_off[i])
-            h1, h1d = hh[i], hh[j]
-            hh[i], hh[j] = (h1 + h1d.T.conj()) / 2, (h1d + h1.T.conj()) / 2
-            s1, s1d = ss[i], ss[j]
-            ss[i], ss[j] = (s1 + s1d.T.conj()) / 2, (s1d + s1.T.conj()) / 2
-            bar.update()
-
-    elif CONFIG.is_GPU:
-        h11 = cp.array(h11)
-        h12 = cp.array(h12)
-        h21 = cp.array(h21)
-        h22 = cp.array(h22)
-        sov = cp.array(sov)
-        U = cp.array(U)
-
-        hh = []
-        for i in range(dh.n_s):
-            row1 = cp.hstack([h11[:, :, i], h12[:, :, i]])
-            row2 = cp.hstack([h21[:, :, i], h22[:, :, i]])
-            block = cp.vstack([row1, row2])
-            hh.append(U.T @ block @ U)
-            bar.update()
-
-        ss = []
-        for i in range(dh.n_s):
-            row1 = cp.hstack([sov[:, :, i], sov[:, :, i] * 0])
-            row2 = cp.hstack([sov[:, :, i] * 0, sov[:, :, i]])
-            block = cp.vstack([row1, row2])
-            ss.append(U.T @ block @ U)
-            bar.update()
-
-        for i in range(dh.n_s):
-            j = dh.lattice.sc_index(-dh.sc_off[i])
-            h1, h1d = hh[i], hh[j]
-            hh[i], hh[j] = (h1 + h1d.T.conj()) / 2, (h1d + h1.T.conj()) / 2
-            s1, s1d = ss[i], ss[j]
-            ss[i], ss[j] = (s1 + s1d.T.conj()) / 2, (s1d + s1.T.conj()) / 2
-            bar.update()
-
-        hh = np.array([h.get() for h in hh])
-        ss = np.array([s.get() for s in ss])
-
-    else:
-        raise ValueError(f"Unknown architecture: {CONFIG.architecture}")
+    # the orbital i with spin a is the row 2 * i + a
+    hh = _spin_box_matrix(
+        [(h11, 0, 0), (h12, 0, 1), (h21, 1, 0), (h22, 1, 1)], NO, partners, sparse
+    )
+    bar.update()
+    ss = _spin_box_matrix([(sov, 0, 0), (sov, 1, 1)], NO, partners, sparse)
+    bar.update()
 
     return hh, ss
 
 
+def _spin_box_matrix(
+    components: list[tuple[Union[csr_matrix, None], int, int]],
+    NO: int,
+    partners: NDArray,
+    sparse: bool,
+) -> Union[NDArray, csr_matrix]:
+    """Scatters the spin components to the hermitised spin box matrix.
+
+    Parameters
+    ----------
+        components: list[tuple[Union[csr_matrix, None], int, int]]
+            The (NO, NS * NO) sparse spin components and their spin indices,
+            the missing components are None
+        NO: int
+            Number of orbitals in the unit cell
+        partners: NDArray
+            The supercell index of the opposite supercell shift
+        sparse: bool
+            Wether the matrix is returned in the layout of ``spin_box_csr``
+
+    Returns
+    -------
+        Union[NDArray, csr_matrix]
+            The (NS, 2 * NO, 2 * NO) matrix or its sparse form
+    """
+
+    sc, row, col, data = [], [], [], []
+    for component, a, b in components:
+        if component is None:
+            continue
+        component = component.tocoo()
+        component.sum_duplicates()
+        supercell, orbital = np.divmod(component.col, NO)
+        sc.append(supercell)
+        row.append(2 * component.row + a)
+        col.append(2 * orbital + b)
+        data.append(component.data.astype("complex128"))
+    sc, row, col, data = map(np.concatenate, (sc, row, col, data))
+
+    # the hermitian conjugate of the partner supercell is averaged in
+    sc = np.concatenate((sc, partners[sc]))
+    row, col = np.concatenate((row, col)), np.concatenate((col, row))
+    data = np.concatenate((data, data.conj())) / 2
+
+    NS = len(partners)
+    if sparse:
+        return csr_matrix((data, (row, sc * 2 * NO + col)), shape=(2 * NO, NS * 2 * NO))
+
+    return (
+        coo_matrix((data, (sc * 2 * NO + row, col)), shape=(NS * 2 * NO, 2 * NO))
+        .toarray()
+        .reshape(NS, 2 * NO, 2 * NO)
+    )
+
+
 def make_contour(
     emin: float = -20, emax: float = 0.0, enum: int = 42, p: float = 150
 ) -> tuple[NDArray, NDArray]:
@@ -698,6 +817,66 @@ def make_contour(
     return ze, we
 
 
+def make_kronrod_contour(
+    emin: float = -20,
+    emax: float = 0.0,
+    segments: Union[int, NDArray] = 3,
+    p: float = 150,
+) -> tuple[NDArray, NDArray, NDArray, NDArray]:
+    """Contour generator with an embedded error estimate.
+
+    It uses the same path and mapping as ``make_contour``, but the mapped
+    interval is split to segments and each segment is integrated by the 15
+    point Gauss-Kronrod rule. The embedded 7 point Gauss rule uses a subset
+    of the samples, so the difference of the two rules estimates the error
+    of the integral on each segment without extra samples.
+
+    Parameters
+    ----------
+        emin: int, optional
+            Energy minimum of the contour. Defaults to -20
+        emax: float, optional
+            Energy maximum of the contour. Defaults to 0.0, so the Fermi level
+        segments: Union[int, NDArray], optional
+            Either the number of equal segments or the bounds of the segments
+            in the mapped variable with shape (number of segments, 2). Defaults to 3
+        p: int, optional
+            Shape parameter that describes the distribution of the sample points. Defaults to 150
+
+    Returns
+    -------
+        ze: NDArray
+            Contour points, 15 for each segment
+        we: NDArray
+            Weights of the Kronrod rule along the contour
+        wg: NDArray
+            Weights of the embedded Gauss rule, zero on the Kronrod only points
+        segments: NDArray
+            The bounds of the segments in the mapped variable
+    """
+
+    R = (emax - emin) / 2  # radius
+    z0 = (emax + emin) / 2  # center point
+    if isinstance(segments, (int, np.integer)):
+        y1 = -np.log(1 + np.pi * p)  # lower bound
+        y2 = 0  # upper bound
+        bounds = np.linspace(y1, y2, segments + 1)
+        segments = np.stack((bounds[:-1], bounds[1:]), axis=1)
+    segments = np.asarray(segments, dtype=float)
+    y1 = segments[:, 0:1]
+    y2 = segments[:, 1:2]
+
+    y = ((y2 - y1) / 2 * KRONROD_NODES + (y2 + y1) / 2).flatten()
+    phi = (np.exp(-y) - 1) / p  # angle parameter
+    ze = z0 + R * np.exp(1j * phi)  # complex points for path
+    jacobian = -np.repeat((y2 - y1).flatten() / 2, len(KRONROD_NODES))
+    jacobian = jacobian * np.exp(-y) / p * 1j * (ze - z0)
+    we = jacobian * np.tile(KRONROD_WEIGHTS, len(segments))
+    wg = jacobian * np.tile(GAUSS_WEIGHTS, len(segments))
+
+    return ze, we, wg, segments
+
+
 def make_kset(kset: Union[list, NDArray] = np.array([1, 1, 1])) -> NDArray:
     """Simple k-grid generator to sample the Brillouin zone.
 
@@ -724,18 +903,130 @@ def make_kset(kset: Union[list, NDArray] = np.array([1, 1, 1])) -> NDArray:
     return kset
 
 
+def make_qmc_kset(
+    kset: Union[list, NDArray] = np.array([1, 1, 1]),
+    points: int = 16,
+    replicas: int = 8,
+    seed: int = 0,
+) -> NDArray:
+    """Quasi-Monte Carlo k point generator to sample the Brillouin zone.
+
+    It uses independently scrambled Sobol sequences, so the replicas are
+    independent estimates of the Brillouin zone integral and their spread
+    is a statistical error estimate. The first points of a longer sequence
+    are the points of a shorter sequence with the same seed, so the samples
+    can be extended.
+
+    Parameters
+    ----------
+        kset: Union[list, NDArray], optional
+            Only the directions with more than one k point are sampled. Defaults to [1,1,1]
+        points: int, optional
+            The number of k points in each replica, it must be a power of two. Defaults to 16
+        replicas: int, optional
+            The number of independent replicas. Defaults to 8
+        seed: int, optional
+            The seed of the scrambling. Defaults to 0
+
+    Returns
+    -------
+        NDArray
+            The k points with shape (replicas, points, 3)
+    """
+
+    periodic = np.array(kset) > 1
+    m = int(np.log2(points))
+    if 2**m != points:
+        raise Exception(f"The number of points must be a power of two: {points}")
+
+    kpoints = np.zeros((replicas, points, 3))
+    if not periodic.any():
+        return kpoints
+    for r, rng in enumerate(np.random.SeedSequence(seed).spawn(replicas)):
+        sobol = qmc.Sobol(
+            d=periodic.sum(), scramble=True, seed=np.random.default_rng(rng)
+        )
+        kpoints[r][:, periodic] = sobol.random_base2(m) - 0.5
+
+    return kpoints
+
+
+def kpoints_on_kset(kpoints: NDArray, kset: Union[list, NDArray]) -> NDArray:
+    """Checks which k points are on the grid of ``make_kset``.
+
+    The grids of ``make_kset`` are nested, when the number of k points is
+    multiplied by an integer, so it can be used to find the new points of a
+    refined grid.
+
+    Parameters
+    ----------
+        kpoints: NDArray
+            The k points with shape (number of k points, 3)
+        kset: Union[list, NDArray]
+            The number of k points of the grid in each direction
+
+    Returns
+    -------
+        NDArray
+            True for the k points that are on the grid
+    """
+
+    scaled = np.asarray(kpoints) * np.asarray(kset)
+
+    return np.isclose(scaled, np.round(scaled)).all(axis=1)
+
+
+def make_trs_kset(
+    kset: Union[list, NDArray] = np.array([1, 1, 1])
+) -> tuple[NDArray, NDArray]:
+    """K-grid generator, where the k and -k points are merged.
+
+    The grid of ``make_kset`` is closed under k -> -k modulo the reciprocal
+    lattice vectors. From every k, -k pair only one k point is kept with
+    doubled weight, the k points that are their own partners are kept with
+    their original weight.
+
+    Parameters
+    ----------
+        kset: Union[list, NDArray]
+            The number of k points in each direction
+
+    Returns
+    -------
+        kpoints: NDArray
+            The k points of the reduced grid
+        weights: NDArray
+            The weights of the k points, they sum up to one
+    """
+
+    kset = np.array(kset, dtype=int)
+    kpoints = make_kset(kset)
+
+    # integer indices of the k points and their partners on the grid
+    idx = np.rint(kpoints * kset).astype(int) % kset
+    k = np.ravel_multi_index(idx.T, kset)
+    minus_k = np.ravel_multi_index(((-idx) % kset).T, kset)
+
+    keep = k <= minus_k
+    weights = np.where(k == minus_k, 1, 2)[keep] / len(kpoints)
+
+    return kpoints[keep], weights
+
+
 def hsk(
     H: NDArray, S: NDArray, sc_off: NDArray, k: tuple = (0, 0, 0)
 ) -> tuple[NDArray, NDArray]:
     """Speed up Hk and Sk generation.
 
     Calculates the Hamiltonian and the Overlap matrix at a given k point. It is faster that the sisl version.
+    The compressed matrices of ``spin_box_csr`` are folded by ``sparse_hsk``
+    and only the matrices at the k point are dense.
 
     Parameters
     ----------
-        H: NDArray
+        H: Union[NDArray, csr_matrix]
             Hamiltonian in spin box form
-        ss: NDArray
+        ss: Union[NDArray, csr_matrix]
             Overlap matrix in spin box form
         sc_off: list
             supercell indexes of the Hamiltonian
@@ -750,6 +1041,10 @@ def hsk(
             Overlap matrix at the given k point
     """
 
+    if issparse(H):
+        HK, SK = sparse_hsk(H, S, sc_off, k)
+        return HK.toarray(), SK.toarray()
+
     k_n: NDArray = np.asarray(k, np.float64).squeeze()
 
     # this generates the list of phases
@@ -762,6 +1057,421 @@ def hsk(
     return HK, SK
 
 
+def rotated_hsk(
+    hTRS: NDArray,
+    XCF: NDArray,
+    S: NDArray,
+    sc_off: NDArray,
+    rotations: NDArray,
+    k: tuple = (0, 0, 0),
+) -> tuple[list[NDArray], NDArray]:
+    """Hamiltonians of several rotated exchange fields and the overlap at a k point.
+
+    The time reversal symmetric part, the time reversal broken part and the
+    overlap matrix are Fourier transformed once, then the Hamiltonian of
+    every rotation is a linear combination of them. The time reversal broken
+    part is given by its scalar part and the exchange field, which are the
+    coefficients of the unit and the Pauli matrices.
+
+    Parameters
+    ----------
+        hTRS: NDArray
+            Time reversal symmetric part of the Hamiltonian in spin box form
+        XCF: NDArray
+            The scalar part and the exchange field with shape
+            (4, supercells, NO/2, NO/2)
+        S: NDArray
+            Overlap matrix in spin box form
+        sc_off: list
+            supercell indexes of the Hamiltonian
+        rotations: NDArray
+            The 4x4 matrices acting on the scalar part and the exchange
+            field, the lower right block is the rotation of the exchange field
+        k: tuple, optional
+            The k point where the matrices are set up. Defaults to (0, 0, 0)
+
+    Returns
+    -------
+        list[NDArray]
+            Hamiltonians of the rotations at the given k point
+        NDArray
+            Overlap matrix at the given k point
+    """
+
+    k_n: NDArray = np.asarray(k, np.float64).squeeze()
+    phases = np.exp(-1j * 2 * np.pi * k_n @ sc_off.T)
+
+    hk = np.einsum("abc,a->bc", hTRS, phases)
+    SK = np.einsum("abc,a->bc", S, phases)
+    XCFk = np.einsum("iabc,a->ibc", XCF, phases)
+
+    # the spin box form of the exchange field is the kronecker product
+    # with the Pauli matrices
+    taus = np.array([np.eye(2), TAU_X, TAU_Y, TAU_Z])
+    HK = []
+    for R in rotations:
+        xcf = np.einsum("ij,jbc->ibc", R, XCFk)
+        HK.append(hk + np.einsum("ibc,ist->bsct", xcf, taus).reshape(hk.shape))
+
+    return HK, SK
+
+
+def greens_function_columns(
+    Hk: NDArray, Sk: NDArray, samples: NDArray, columns: NDArray
+) -> NDArray:
+    """Green's function restricted to the given orbital columns.
+
+    Instead of the full inversion of ``z * Sk - Hk`` it LU factorises the
+    matrix on every energy sample and solves only for the requested unit
+    vectors. The rows are restricted to the same indices, so the result is
+    the compact block of the Green's function on the given subspace.
+
+    Parameters
+    ----------
+        Hk: (NO, NO) NDArray
+            Hamiltonian at a given k point
+        Sk: (NO, NO) NDArray
+            Overlap matrix at a given k point
+        samples: (eset,) NDArray
+            Energy samples along the contour
+        columns: (m,) NDArray
+            Sorted orbital indices of the subspace
+
+    Returns
+    -------
+        NDArray
+            The (eset, m, m) block of the Green's function on the subspace
+    """
+
+    rhs = np.zeros((Hk.shape[-1], len(columns)), dtype=np.complex128)
+    rhs[columns, np.arange(len(columns))] = 1
+
+    # the LU factorisation and the back substitution is done by LAPACK gesv
+    G = np.linalg.solve(Sk * samples.reshape(len(samples), 1, 1) - Hk, rhs[None])
+
+    return G[:, columns, :]
+
+
+def greens_function_eigen(
+    Hk: NDArray, Sk: NDArray, samples: NDArray, columns: NDArray
+) -> NDArray:
+    """Green's function on the given orbitals from the generalised eigenproblem.
+
+    It diagonalises ``Hk v = e Sk v`` once and assembles the Green's
+    function on every energy sample from the spectral decomposition.
+
+    Parameters
+    ----------
+        Hk: (NO, NO) NDArray
+            Hamiltonian at a given k point
+        Sk: (NO, NO) NDArray
+            Overlap matrix at a given k point
+        samples: (eset,) NDArray
+            Energy samples along the contour
+        columns: (m,) NDArray
+            Sorted orbital indices of the subspace
+
+    Returns
+    -------
+        NDArray
+            The (eset, m, m) block of the Green's function on the subspace
+    """
+
+    eigenvalues, eigenvectors = eigh(Hk, Sk)
+
+    return spectral_greens_function(eigenvalues, eigenvectors[columns], samples)
+
+
+def spectral_greens_function(
+    eigenvalues: NDArray, eigenvectors: NDArray, samples: NDArray
+) -> NDArray:
+    """Assembles the Green's function from the spectral decomposition.
+
+    The Green's function is ``V diag(1 / (z - e)) V^H`` on every energy
+    sample, where only the needed rows of the eigenvectors are given.
+
+    Parameters
+    ----------
+        eigenvalues: (NO,) NDArray
+            Eigenvalues of the generalised eigenproblem
+        eigenvectors: (m, NO) NDArray
+            The rows of the S-orthonormal eigenvectors on the subspace
+        samples: (eset,) NDArray
+            Energy samples along the contour
+
+    Returns
+    -------
+        NDArray
+            The (eset, m, m) block of the Green's function on the subspace
+    """
+
+    resolvent = 1 / (samples.reshape(len(samples), 1) - eigenvalues)
+
+    return (eigenvectors * resolvent[:, None, :]) @ eigenvectors.conj().T
+
+
+def spin_box_csr(H: NDArray, tol: float = 0) -> csr_matrix:
+    """Compresses the spin box matrices of all the supercells.
+
+    The result uses the same layout as ``sisl``, the columns of the
+    supercell ``i`` are the orbital indices shifted by ``i * NO``.
+
+    Parameters
+    ----------
+        H: (NS, NO, NO) NDArray
+            Hamiltonian or overlap matrix in spin box form
+        tol: float, optional
+            Elements with smaller absolute value are dropped, by default 0
+
+    Returns
+    -------
+        csr_matrix
+            The (NO, NS * NO) sparse matrix
+    """
+
+    sc, row, col = np.nonzero(np.abs(H) > tol)
+
+    return csr_matrix(
+        (H[sc, row, col], (row, sc * H.shape[-1] + col)),
+        shape=(H.shape[-1], H.shape[0] * H.shape[-1]),
+    )
+
+
+def supercell_block(
+    M: Union[NDArray, csr_matrix], index: int
+) -> Union[NDArray, csr_matrix]:
+    """The spin box matrix of one supercell.
+
+    Parameters
+    ----------
+        M: Union[(NS, NO, NO) NDArray, (NO, NS * NO) csr_matrix]
+            Hamiltonian or overlap matrix in spin box or compressed spin box form
+        index: int
+            The index of the supercell
+
+    Returns
+    -------
+        Union[NDArray, csr_matrix]
+            The (NO, NO) matrix of the supercell, it is compressed if ``M`` is
+    """
+
+    if issparse(M):
+        NO = M.shape[0]
+        return M[:, index * NO : (index + 1) * NO]
+
+    return M[index]
+
+
+def sparse_hsk(
+    H: csr_matrix, S: csr_matrix, sc_off: NDArray, k: tuple = (0, 0, 0)
+) -> tuple[csc_matrix, csc_matrix]:
+    """Sparse version of ``hsk``.
+
+    Parameters
+    ----------
+        H: (NO, NS * NO) csr_matrix
+            Hamiltonian in compressed spin box form
+        S: (NO, NS * NO) csr_matrix
+            Overlap matrix in compressed spin box form
+        sc_off: list
+            supercell indexes of the Hamiltonian
+        k: tuple, optional
+            The k point where the matrices are set up. Defaults to (0, 0, 0)
+
+    Returns
+    -------
+        csc_matrix
+            Hamiltonian at the given k point
+        csc_matrix
+            Overlap matrix at the given k point
+    """
+
+    k_n: NDArray = np.asarray(k, np.float64).squeeze()
+    NO = H.shape[0]
+
+    # this generates the list of phases
+    phases = np.exp(-1j * 2 * np.pi * k_n @ sc_off.T)
+
+    # folding the supercells with the phases is a sparse product
+    P = csr_matrix(
+        (
+            np.repeat(phases, NO),
+            (np.arange(len(phases) * NO), np.tile(np.arange(NO), len(phases))),
+        ),
+        shape=(len(phases) * NO, NO),
+    )
+
+    return csc_matrix(H @ P), csc_matrix(S @ P)
+
+
+def greens_function_sparse(
+    Hk: csc_matrix, Sk: csc_matrix, samples: NDArray, columns: NDArray
+) -> NDArray:
+    """Green's function on the given orbitals with a sparse LU factorisation.
+
+    It factorises the sparse ``z * Sk - Hk`` matrix for every energy sample
+    and solves only for the requested unit vectors.
+
+    Parameters
+    ----------
+        Hk: (NO, NO) csc_matrix
+            Hamiltonian at a given k point
+        Sk: (NO, NO) csc_matrix
+            Overlap matrix at a given k point
+        samples: (eset,) NDArray
+            Energy samples along the contour
+        columns: (m,) NDArray
+            Sorted orbital indices of the subspace
+
+    Returns
+    -------
+        NDArray
+            The (eset, m, m) block of the Green's function on the subspace
+    """
+
+    rhs = np.zeros((Hk.shape[-1], len(columns)), dtype=np.complex128)
+    rhs[columns, np.arange(len(columns))] = 1
+
+    G = np.empty((len(samples), len(columns), len(columns)), dtype=np.complex128)
+    for i, z in enumerate(samples):
+        G[i] = splu(csc_matrix(z * Sk - Hk)).solve(rhs)[columns]
+
+    return G
+
+
+def block_tridiagonal_layers(connectivity: NDArray) -> list[NDArray]:
+    """Partitions the atoms to layers with block tridiagonal couplings.
+
+    It uses the level sets of a breadth first search on the connectivity
+    graph started from a peripheral atom, so every atom is only coupled
+    to the atoms in the same or in the neighbouring layers.
+
+    Parameters
+    ----------
+        connectivity: (na, na) NDArray
+            Boolean matrix, it is True if two atoms are coupled in any supercell
+
+    Returns
+    -------
+        list[NDArray]
+            The atomic indices in each layer
+    """
+
+    connectivity = np.logical_or(connectivity, connectivity.T)
+    na = len(connectivity)
+
+    def level_sets(start: int) -> list[NDArray]:
+        visited = np.zeros(na, dtype=bool)
+        visited[start] = True
+        levels = [np.array([start])]
+        while True:
+            front = connectivity[levels[-1]].any(axis=0) & ~visited
+            if not front.any():
+                break
+            visited |= front
+            levels.append(np.nonzero(front)[0])
+        return levels
+
+    layers: list[NDArray] = []
+    remaining = np.arange(na)
+    # disconnected parts are independent, so they are just stacked
+    while len(remaining) > 0:
+        # a pseudo peripheral atom is the end of the longest search
+        levels = level_sets(remaining[0])
+        levels = level_sets(levels[-1][0])
+        layers += levels
+        remaining = np.setdiff1d(remaining, np.concatenate(levels))
+
+    return layers
+
+
+def greens_function_recursive(
+    Hk: NDArray,
+    Sk: NDArray,
+    samples: NDArray,
+    columns: NDArray,
+    layers: list[NDArray],
+) -> NDArray:
+    """Green's function on the given orbitals with the recursive method.
+
+    The orbitals are ordered by the layers, where ``z * Sk - Hk`` is block
+    tridiagonal. The left and right connected Green's functions are built
+    by a sweep over the layers and only the blocks of the layers that
+    contain the requested orbitals are calculated.
+
+    Parameters
+    ----------
+        Hk: (NO, NO) NDArray
+            Hamiltonian at a given k point
+        Sk: (NO, NO) NDArray
+            Overlap matrix at a given k point
+        samples: (eset,) NDArray
+            Energy samples along the contour
+        columns: (m,) NDArray
+            Sorted orbital indices of the subspace
+        layers: list[NDArray]
+            The orbital indices in each layer
+
+    Returns
+    -------
+        NDArray
+            The (eset, m, m) block of the Green's function on the subspace
+    """
+
+    z = samples.reshape(len(samples), 1, 1)
+    N = len(layers)
+
+    def block(i: int, j: int) -> NDArray:
+        idx = np.ix_(layers[i], layers[j])
+        return z * Sk[idx] - Hk[idx]
+
+    # diagonal, upper and lower blocks
+    A_d = [block(i, i) for i in range(N)]
+    A_u = [block(i, i + 1) for i in range(N - 1)]
+    A_l = [block(i + 1, i) for i in range(N - 1)]
+
+    # left and right connected Green's functions
+    gL = [np.linalg.inv(A_d[0])]
+    for i in range(1, N):
+        gL.append(np.linalg.inv(A_d[i] - A_l[i - 1] @ gL[i - 1] @ A_u[i - 1]))
+    gR = [np.linalg.inv(A_d[-1])]
+    for i in range(N - 2, -1, -1):
+        gR.insert(0, np.linalg.inv(A_d[i] - A_u[i] @ gR[0] @ A_l[i]))
+
+    # positions of the requested orbitals in the layers and in the output
+    local, position = [], []
+    for layer in layers:
+        mask = np.isin(layer, columns)
+        local.append(np.nonzero(mask)[0])
+        position.append(np.searchsorted(columns, layer[mask]))
+    needed = [i for i in range(N) if len(local[i]) > 0]
+
+    G = np.zeros((len(samples), len(columns), len(columns)), dtype=np.complex128)
+    for q in needed:
+        # the diagonal block is connected from both sides
+        sigma = np.zeros_like(A_d[q])
+        if q > 0:
+            sigma += A_l[q - 1] @ gL[q - 1] @ A_u[q - 1]
+        if q < N - 1:
+            sigma += A_u[q] @ gR[q + 1] @ A_l[q]
+        G_pq = np.linalg.inv(A_d[q] - sigma)[..., local[q]]
+        G[:, position[q][:, None], position[q]] = G_pq[..., local[q], :]
+
+        # sweep upwards
+        G_up = G_pq
+        for p in range(q - 1, needed[0] - 1, -1):
+            G_up = -gL[p] @ A_u[p] @ G_up
+            G[:, position[p][:, None], position[q]] = G_up[..., local[p], :]
+
+        # sweep downwards
+        G_down = G_pq
+        for p in range(q + 1, needed[-1] + 1):
+            G_down = -gR[p] @ A_l[p - 1] @ G_down
+            G[:, position[p][:, None], position[q]] = G_down[..., local[p], :]
+
+    return G
+
+
 def process_ref_directions(
     ref_xcf_orientations: Union[list[list[float]], NDArray, list[dict]],
     spin_model: str = "generalised-fit",
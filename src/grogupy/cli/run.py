@@ -121,8 +121,12 @@ def main():
     # Add solvers and parallellizations
     simulation.low_memory_mode = params["lowmemorymode"]
     simulation.parallel_mode = params["parallelmode"]
+    simulation.max_workers = params["maxworkers"]
     simulation.greens_function_solver = params["greensfunctionsolver"]
     simulation.max_g_per_loop = params["maxgperloop"]
+    simulation.energy_chunk_size = params["energychunksize"]
+    simulation.pair_accumulation = params["pairaccumulation"]
+    simulation.eigen_cache = params["eigencache"]
     simulation.apply_spin_model = params["applyspinmodel"]
     simulation.spin_model = params["spinmodel"]
 
@@ -145,6 +149,15 @@ def main():
     # Define Kspace
     kspace = Kspace(
         kset=params["kset"],
+        trs=params["kspacetrs"],
+        symmetrize=params["kspacesymmetrize"],
+        tolerance=params["kspacetolerance"],
+        factor=params["kspacefactor"],
+        max_refinements=params["kspacemaxrefinements"],
+        sampling=params["kspacesampling"],
+        replicas=params["kspacereplicas"],
+        target_error_meV=params["kspacetargeterror"],
+        seed=params["kspaceseed"],
     )
 
     # Define Contour
@@ -156,6 +169,7 @@ def main():
         emin_shift=params["eminshift"],
         emax_shift=params["emaxshift"],
         eigfile=infile,
+        tolerance=params["etolerance"],
     )
 
     # Define Hamiltonian from sisl
@@ -261,7 +261,11 @@ def load(
     else:
         dat = infile
 
-    if list(dat.keys()) == [
+    # the newer versions only add keys to the states, which get their
+    # defaults when they are loaded, so the keys of the first versions are
+    # searched regardless of their order
+    keys = set(dat.keys())
+    if keys >= {
         "times",
         "kspace",
         "contour",
@@ -279,10 +283,10 @@ def load(
         "_rotated_hamiltonians",
         "SLURM_ID",
         "_Builder__version",
-    ]:
+    }:
         return load_Builder(infile)
 
-    elif list(dat.keys()) == [
+    elif keys >= {
         "times",
         "kspace",
         "contour",
@@ -293,14 +297,14 @@ def load(
         "_rotated_hamiltonians",
         "SLURM_ID",
         "_Builder__version",
-    ]:
+    }:
         b = load_Builder(infile)
         warnings.warn(
             f"There is a mismatch between Builder ({b.version}) and current ({__version__}) version!"
         )
         return b
 
-    elif list(dat.keys()) == [
+    elif keys >= {
         "times",
         "_dh",
         "_ds",
@@ -314,9 +318,9 @@ def load(
         "_Hamiltonian__cell",
         "_Hamiltonian__sc_off",
         "_Hamiltonian__uc_in_sc_index",
-    ]:
+    }:
         return load_Hamiltonian(infile)
-    elif list(dat.keys()) == [
+    elif keys >= {
         "_dh",
         "M1",
         "M2",
@@ -348,9 +352,9 @@ def load(
         "_Pair__J_S_mRy",
         "_Pair__J_iso_meV",
         "_Pair__J_iso_mRy",
-    ]:
+    }:
         return load_Pair(infile)
-    elif list(dat.keys()) == [
+    elif keys >= {
         "_dh",
         "_ds",
         "infile",
@@ -387,11 +391,11 @@ def load(
         "_MagneticEntity__K_mRy",
         "_MagneticEntity__K_consistency_meV",
         "_MagneticEntity__K_consistency_mRy",
-    ]:
+    }:
         return load_MagneticEntity(infile)
-    elif list(dat.keys()) == ["times", "_Kspace__kset", "kpoints", "weights"]:
+    elif keys >= {"times", "_Kspace__kset", "kpoints", "weights"}:
         return load_Kspace(infile)
-    elif list(dat.keys()) == [
+    elif keys >= {
         "times",
         "_Contour__automatic_emin",
         "_eigfile",
@@ -401,9 +405,9 @@ def load(
         "_esetp",
         "samples",
         "weights",
-    ]:
+    }:
         return load_Contour(infile)
-    elif list(dat.keys()) == ["_DefaultTimer__start_measure", "_times"]:
+    elif keys >= {"_DefaultTimer__start_measure", "_times"}:
         return load_DefaultTimer(infile)
     else:
         raise Exception("Unknown pickle format!")
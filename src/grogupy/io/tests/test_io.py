@@ -22,6 +22,7 @@ import os
 import pickle
 
 import pytest
+import sisl
 
 import grogupy
 import grogupy.batch
@@ -107,6 +108,72 @@ class TestIO:
         assert isinstance(pair2, grogupy.Pair)
         assert pair == pair2
 
+    def test_load_save_round_trip(self, tmp_path):
+        geometry = sisl.geom.graphene()
+        dh = sisl.Hamiltonian(geometry, spin="p", orthogonal=False)
+        dm = sisl.DensityMatrix(geometry, spin="p", orthogonal=False)
+        for i in range(geometry.no):
+            dh[i, i] = [1, -1, 1]
+            dm[i, i] = [0.6, 0.4, 1]
+        builder = grogupy.Builder([[0, 0, 1]])
+        builder.add_kspace(grogupy.Kspace([2, 2, 1], trs=True))
+        builder.add_contour(grogupy.Contour(30, 100, -5, tolerance=0.01))
+        builder.add_hamiltonian(grogupy.Hamiltonian((dh, dm)))
+        builder.layers = [[0], [1]]
+
+        # the keys of the first versions of the states
+        first_keys = [
+            (
+                builder,
+                [
+                    "times",
+                    "kspace",
+                    "contour",
+                    "hamiltonian",
+                    "magnetic_entities",
+                    "pairs",
+                    "_Builder__low_memory_mode",
+                    "_Builder__greens_function_solver",
+                    "_Builder__max_g_per_loop",
+                    "_Builder__parallel_mode",
+                    "_Builder__architecture",
+                    "_Builder__apply_spin_model",
+                    "_Builder__spin_model",
+                    "ref_xcf_orientations",
+                    "_rotated_hamiltonians",
+                    "SLURM_ID",
+                    "_Builder__version",
+                ],
+            ),
+            (builder.kspace, ["times", "_Kspace__kset", "kpoints", "weights"]),
+            (
+                builder.contour,
+                [
+                    "times",
+                    "_Contour__automatic_emin",
+                    "_eigfile",
+                    "_emin",
+                    "_emax",
+                    "_eset",
+                    "_esetp",
+                    "samples",
+                    "weights",
+                ],
+            ),
+        ]
+        path = str(tmp_path / "round_trip.pkl")
+        for instance, keys in first_keys:
+            state = instance.__getstate__()
+            first = pickle.loads(pickle.dumps({key: state[key] for key in keys}))
+            # the loaded states get the new keys, so they are saved again
+            for start in (instance, grogupy.load(first)):
+                grogupy.save(start, path, compress=0)
+                loaded = grogupy.load(path)
+                assert isinstance(loaded, type(instance))
+                assert loaded == start
+                grogupy.save(loaded, path, compress=0)
+                assert grogupy.load(path) == loaded
+
     def test_load_save_Builder(self):
         builder = load_Builder("./benchmarks/test_builder.pkl")
         assert isinstance(builder, grogupy.Builder)
@@ -340,12 +340,22 @@ DEFAULT_INPUT = dict(
     infolder="./",
     infile=None,
     kset=None,
+    kspacetrs=False,
+    kspacesymmetrize=False,
+    kspacetolerance=None,
+    kspacefactor=2,
+    kspacemaxrefinements=3,
+    kspacesampling="grid",
+    kspacereplicas=8,
+    kspacetargeterror=None,
+    kspaceseed=None,
     eset=1000,
     esetp=10000,
     emin=None,
     emax=0,
     eminshift=-5,
     emaxshift=0,
+    etolerance=None,
     scfxcforientation=[0, 0, 1],
     refxcforientations=[[1, 0, 0], [0, 1, 0], [0, 0, 1]],
     pairs=None,
@@ -356,11 +366,15 @@ DEFAULT_INPUT = dict(
     kwargsformagent=dict(l=None),
     maxpairsperloop=1000,
     maxgperloop=1,
+    energychunksize=None,
     lowmemorymode=False,
     greensfunctionsolver="Parallel",
+    pairaccumulation="Direct",
+    eigencache=None,
     applyspinmodel=True,
     spinmodel="generalised-grogu",
     parallelmode=None,
+    maxworkers=None,
     outmagneticmoment="total",
     savemagnopy=False,
     magnopyprecision=None,
@@ -55,7 +55,10 @@ Utilities
    spin_tracer                  Spin tracer utility
    parse_magnetic_entity        Function to get the orbital indices of a given magnetic entity.
    interaction_energy           The interaction energy variation upon rotations.
+   interaction_energies         The interaction energy variations of all the combinations of rotations.
    second_order_energy          The second order energy variation upon rotations.
+   onsite_energies              The energy variations of all the rotations on a magnetic entity.
+   anisotropy_energies          The energies of the rotations that are needed for the anisotropy tensor.
    calculate_anisotropy_tensor  Calculates the renormalized anisotropy tensor from the energies.
    fit_anisotropy_tensor        Fits the anisotropy tensor to the energies
    calculate_exchange_tensor    Calculates the exchange tensor from the energies
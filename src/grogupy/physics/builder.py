@@ -127,11 +127,35 @@ class Builder:
     pairs: PairList
         List of pairs
     low_memory_mode: bool, optional
-        The memory mode of the calculation, by default False
-    greens_function_solver: {"Sequential", "Parallel"}
-        The solution method for the Hamiltonian inversion, by default "Parallel"
+        The memory mode of the calculation, by default False. When it is
+        False, the reference directions are sampled in one pass over the k
+        points on CPU
+    greens_function_solver: {"Sequential", "Parallel", "Columns", "Eigen", "Sparse", "Recursive"}
+        The solution method for the Hamiltonian inversion, "Columns" solves only
+        for the orbitals of the magnetic entities, "Eigen" diagonalises the
+        Hamiltonian once per k point, "Sparse" uses a sparse LU factorisation,
+        "Recursive" uses the block tridiagonal structure of layered systems,
+        by default "Parallel"
+    layers: Union[None, list[list[int]]], optional
+        The atomic indices in each layer for the "Recursive" solver, if it is
+        None, then the layers are detected from the Hamiltonian, by default None
+    pair_accumulation: {"Direct", "FFT"}, optional
+        The accumulation of the Greens functions of the pairs, "Direct" adds
+        the phase factor of every pair in every k point, "FFT" stores the
+        Greens function of the magnetic entities on the regular k grid and
+        obtains every pair by one Fourier transform, by default "Direct"
     max_g_per_loop: int, optional
         Maximum number of greens function samples per loop, by default 1
+    eigen_cache: Union[None, str], optional
+        The folder of the memory mapped cache of the eigenvalues and
+        eigenvectors in every k point and reference direction, it is written
+        by the "Eigen" solver and it is used by ``solve(incremental=True)``,
+        by default None
+    energy_chunk_size: Union[None, int], optional
+        The number of contour samples that are integrated over the k points
+        at once, the energies of a chunk are reduced before the next chunk,
+        so only the Greens functions of one chunk are kept in memory, if it
+        is None, then all the samples are integrated at once, by default None
     apply_spin_model: bool, optional
         If it is True, then the exchange and anisotropy tensors are calculated,
         by default True
@@ -139,7 +163,13 @@ class Builder:
         The solution method for the exchange and anisotropy tensor, by default
         "generalised-fit"
     parallel_mode: Union[None, str], optional
-        The parallelization mode for the Hamiltonian inversions, by default None
+        The parallelization mode for the Hamiltonian inversions, it can be "K"
+        for MPI over the k points, "Threads" for a pool of threads over the
+        k points or "Processes" for a pool of processes over the k points,
+        by default None
+    max_workers: int, optional
+        The number of workers in the thread or process parallelization, by
+        default the number of CPUs
     architecture: {"CPU", "GPU"}, optional
         The architecture of the machine that grogupy is run on, by default 'CPU'
     SLURM_ID: str
@@ -180,7 +210,12 @@ class Builder:
         self.__low_memory_mode: bool = False
         self.__greens_function_solver: str = "Parallel"
         self.__max_g_per_loop: int = 1
+        self.__energy_chunk_size: Union[None, int] = None
+        self.__eigen_cache: Union[None, str] = None
+        self.__layers: Union[None, list[list[int]]] = None
+        self.__pair_accumulation: str = "Direct"
         self.__parallel_mode: Union[None, str] = None
+        self.__max_workers: int = os.cpu_count()
         self.__architecture: str = CONFIG.architecture
         self.__apply_spin_model: bool = True
         self.__spin_model: str = "generalised-grogu"
@@ -249,6 +284,12 @@ class Builder:
             temp.__setstate__(h)
             out.append(temp)
         state["_rotated_hamiltonians"] = out
+        # older versions did not have the new solver settings
+        state.setdefault("_Builder__layers", None)
+        state.setdefault("_Builder__max_workers", os.cpu_count())
+        state.setdefault("_Builder__pair_accumulation", "Direct")
+        state.setdefault("_Builder__energy_chunk_size", None)
+        state.setdefault("_Builder__eigen_cache", None)
 
         self.__dict__ = state
 
@@ -262,7 +303,12 @@ class Builder:
                 and self.__low_memory_mode == value.__low_memory_mode
                 and self.__greens_function_solver == value.__greens_function_solver
                 and self.__max_g_per_loop == value.__max_g_per_loop
+                and self.__energy_chunk_size == value.__energy_chunk_size
+                and self.__eigen_cache == value.__eigen_cache
+                and self.__layers == value.__layers
+                and self.__pair_accumulation == value.__pair_accumulation
                 and self.__parallel_mode == value.__parallel_mode
+                and self.__max_workers == value.__max_workers
                 and self.__architecture == value.__architecture
                 and self.__spin_model == value.__spin_model
                 and self.SLURM_ID == value.SLURM_ID
@@ -337,11 +383,13 @@ class Builder:
             out += "Parallelization is over: Nothing" + newline
         else:
             out += f"Parallelization is over: {self.parallel_mode}" + newline
+        if self.parallel_mode in ("Threads", "Processes"):
+            out += f"Number of workers: {self.__max_workers}" + newline
         out += (
             f"Solver used for Greens function calculation: {self.greens_function_solver}"
             + newline
         )
-        if self.greens_function_solver[0].lower() == "s":
+        if self.greens_function_solver == "Sequential":
             max_g = self.__max_g_per_loop
         else:
             if self.contour is not None:
@@ -349,6 +397,13 @@ class Builder:
             else:
                 max_g = "Not defined"
         out += f"Maximum number of Greens function samples per batch: {max_g}" + newline
+        if self.eigen_cache is not None:
+            out += f"Eigen cache: {self.eigen_cache}" + newline
+        out += f"Accumulation of the pairs: {self.pair_accumulation}" + newline
+        if self.energy_chunk_size is not None:
+            out += (
+                f"Contour samples per energy chunk: {self.energy_chunk_size}" + newline
+            )
 
         out += f"Spin model: {self.spin_model}" + newline
         out += section + newline
@@ -374,6 +429,25 @@ class Builder:
         if self.kspace is not None:
             out += f"Number of k points: {self.kspace.kset.prod()}" + newline
             out += f"K points in each directions: {self.kspace.kset}" + newline
+            if self.kspace.trs:
+                out += f"K points after k/-k reduction: {self.kspace.NK}" + newline
+            if self.kspace.symmetrize:
+                out += "Only the irreducible k points are sampled" + newline
+            if self.kspace.sampling == "sobol":
+                out += (
+                    f"Quasi-Monte Carlo sampling with {self.kspace.replicas} replicas"
+                    + newline
+                )
+                if self.kspace.target_error_meV is not None:
+                    out += (
+                        f"Target error of the k point sampling: {self.kspace.target_error_meV} meV"
+                        + newline
+                    )
+            elif self.kspace.tolerance is not None:
+                out += (
+                    f"Tolerance of the k point refinement: {self.kspace.tolerance} meV"
+                    + newline
+                )
         else:
             out += f"Number of k points: Not defined" + newline
             out += f"K points in each directions: Not defined" + newline
@@ -381,6 +455,11 @@ class Builder:
         if self.contour is not None:
             out += f"Eset: {self.contour.eset}" + newline
             out += f"Esetp: {self.contour.esetp}" + newline
+            if self.contour.adaptive:
+                out += (
+                    f"Tolerance of the adaptive contour: {self.contour.tolerance} meV"
+                    + newline
+                )
             if self.contour.automatic_emin:
                 out += (
                     f"Ebot: {self.contour.emin}        WARNING: This was automatically determined!"
@@ -509,10 +588,22 @@ class Builder:
 
     @greens_function_solver.setter
     def greens_function_solver(self, value: str) -> None:
-        if value.lower()[0] == "s":
+        if value.lower() == "sparse":
+            if self.__architecture != "CPU":
+                raise Exception(
+                    f"{value} is not a permitted Green's function solver, when the architecture is {self.__architecture}."
+                )
+            self.__greens_function_solver = "Sparse"
+        elif value.lower()[0] == "s":
             self.__greens_function_solver = "Sequential"
         elif value.lower()[0] == "p":
             self.__greens_function_solver = "Parallel"
+        elif value.lower()[0] == "c" and self.__architecture == "CPU":
+            self.__greens_function_solver = "Columns"
+        elif value.lower()[0] == "e" and self.__architecture == "CPU":
+            self.__greens_function_solver = "Eigen"
+        elif value.lower()[0] == "r" and self.__architecture == "CPU":
+            self.__greens_function_solver = "Recursive"
         else:
             raise Exception(
                 f"{value} is not a permitted Green's function solver, when the architecture is {self.__architecture}."
@@ -531,6 +622,67 @@ class Builder:
         else:
             raise Exception("It should be a positive integer.")
 
+    @property
+    def eigen_cache(self) -> Union[None, str]:
+        """The folder of the cache of the eigen decompositions, by default None."""
+        return self.__eigen_cache
+
+    @eigen_cache.setter
+    def eigen_cache(self, value: Union[None, str]) -> None:
+        if value is None:
+            self.__eigen_cache = None
+        elif self.__architecture == "CPU":
+            self.__eigen_cache = os.fspath(value)
+        else:
+            raise Exception(
+                f"The eigen cache is not available, when the architecture is {self.__architecture}."
+            )
+
+    @property
+    def energy_chunk_size(self) -> Union[None, int]:
+        """The number of contour samples that are integrated at once, by default None."""
+        return self.__energy_chunk_size
+
+    @energy_chunk_size.setter
+    def energy_chunk_size(self, value: Union[None, int]) -> None:
+        if value is None:
+            self.__energy_chunk_size = None
+        elif (value - int(value)) < 1e-5 and value >= 1:
+            self.__energy_chunk_size = int(value)
+        else:
+            raise Exception("It should be a positive integer or None.")
+
+    @property
+    def layers(self) -> Union[None, list[list[int]]]:
+        """The atomic indices in each layer for the recursive solver."""
+        return self.__layers
+
+    @layers.setter
+    def layers(self, value: Union[None, list[list[int]]]) -> None:
+        if value is None:
+            self.__layers = None
+        else:
+            try:
+                self.__layers = [[int(atom) for atom in layer] for layer in value]
+            except:
+                raise Exception("The layers must be a list of lists of atoms!")
+
+    @property
+    def pair_accumulation(self) -> str:
+        """The accumulation of the Greens functions of the pairs, by default "Direct"."""
+        return self.__pair_accumulation
+
+    @pair_accumulation.setter
+    def pair_accumulation(self, value: str) -> None:
+        if value.lower()[0] == "d":
+            self.__pair_accumulation = "Direct"
+        elif value.lower()[0] == "f" and self.__architecture == "CPU":
+            self.__pair_accumulation = "FFT"
+        else:
+            raise Exception(
+                f"{value} is not a permitted pair accumulation, when the architecture is {self.__architecture}."
+            )
+
     @property
     def parallel_mode(self) -> Union[str, None]:
         """The parallelization mode for the Hamiltonian inversions, by default None."""
@@ -542,9 +694,27 @@ class Builder:
             self.__parallel_mode = None
         elif value[0].lower() == "k":
             self.__parallel_mode = "K"
+        elif value[0].lower() == "t" and self.__architecture == "CPU":
+            self.__parallel_mode = "Threads"
+        elif value[0].lower() == "p" and self.__architecture == "CPU":
+            self.__parallel_mode = "Processes"
         else:
             raise Exception(f"Unknown parallel mode: {value}!")
 
+    @property
+    def max_workers(self) -> int:
+        """The number of workers in the thread or process parallelization, by default the number of CPUs."""
+        return self.__max_workers
+
+    @max_workers.setter
+    def max_workers(self, value) -> None:
+        if value is None:
+            self.__max_workers = os.cpu_count()
+        elif (value - int(value)) < 1e-5 and value >= 1:
+            self.__max_workers = int(value)
+        else:
+            raise Exception("It should be a positive integer.")
+
     @property
     def architecture(self) -> str:
         """The architecture of the machine that grogupy is run on, by default 'CPU'."""
@@ -975,17 +1145,27 @@ class Builder:
             # add pairs
             self.pairs.append(pair)
 
-    def solve(self, print_memory: bool = False) -> None:
+    def solve(self, print_memory: bool = False, incremental: bool = False) -> None:
         """Wrapper for Greens function solver.
 
         The parallelization of the Brillouin sampling can be turned on and
         off. And the parallelization of the energy samples can be tweaked by
         a batch size. CPU and GPU solvers are availabel.
 
+        When ``incremental`` is True, only the magnetic entities and pairs
+        without energies are calculated from the ``eigen_cache`` of a previous
+        solution with the "Eigen" solver, so no Hamiltonian is diagonalised.
+
+        The adaptive ``contour`` is refined in place, so it contains the final
+        energy samples after the solution.
+
         Parameters
         ----------
         print_memory: bool, optional
             It can be turned on to print extra memory info, by default False
+        incremental: bool, optional
+            If it is True, then only the new magnetic entities and pairs are
+            calculated from the eigen cache, by default False
         """
 
         # reset times
@@ -1004,6 +1184,39 @@ class Builder:
             warnings.warn(
                 "There are unnecessary perpendicular directions for the anisotropy or exchange solver!"
             )
+        if (
+            self.contour is not None
+            and self.contour.adaptive
+            and self.__architecture.lower()[0] == "g"
+        ):
+            warnings.warn(
+                "The adaptive contour is only refined on CPU, the initial samples are used!"
+            )
+        if (
+            self.kspace is not None
+            and (
+                self.kspace.tolerance is not None
+                or self.kspace.target_error_meV is not None
+            )
+            and self.__architecture.lower()[0] == "g"
+        ):
+            warnings.warn(
+                "The k points are only refined on CPU, the initial grid is used!"
+            )
+        if (
+            self.__energy_chunk_size is not None
+            and self.__architecture.lower()[0] == "g"
+        ):
+            warnings.warn(
+                "The energy chunks are only streamed on CPU, all the samples are integrated at once!"
+            )
+
+        if (
+            self.hamiltonian is not None
+            and self.hamiltonian.sparse
+            and self.__architecture.lower()[0] == "g"
+        ):
+            raise Exception("The compressed Hamiltonian is only used on CPU!")
 
         # check the perpendicularity of directions
         for ref in self.ref_xcf_orientations:
@@ -1013,8 +1226,17 @@ class Builder:
             if not np.allclose(perp, np.zeros_like(perp)):
                 raise Exception(f"Not all directions are perpendicular to {o}!")
 
+        # the new magnetic entities and pairs from the eigen cache
+        if incremental:
+            if self.__architecture.lower()[0] == "c":  # cpu
+                from .._core.cpu_solvers import solve_incremental as solver
+            else:
+                raise Exception(
+                    f"The incremental solution is not available, when the architecture is {self.__architecture}."
+                )
+
         # no parallelization
-        if self.__parallel_mode is None:
+        elif self.__parallel_mode is None:
             # choose architecture solver
             if self.__architecture.lower()[0] == "c":  # cpu
                 from .._core.cpu_solvers import default_solver as solver
@@ -1023,6 +1245,20 @@ class Builder:
             else:
                 raise Exception(f"Unknown architecture: {self.__architecture}")
 
+        # k point parallelization on threads
+        elif self.__parallel_mode == "Threads":
+            if self.__architecture.lower()[0] == "c":  # cpu
+                from .._core.cpu_solvers import solve_parallel_over_threads as solver
+            else:
+                raise Exception(f"Unknown architecture: {self.__architecture}")
+
+        # k point parallelization on processes
+        elif self.__parallel_mode == "Processes":
+            if self.__architecture.lower()[0] == "c":  # cpu
+                from .._core.cpu_solvers import solve_parallel_over_processes as solver
+            else:
+                raise Exception(f"Unknown architecture: {self.__architecture}")
+
         # k point parallelization
         elif self.__parallel_mode[0].lower() == "k":
             # choose architecture solver
@@ -24,7 +24,7 @@ from typing import Union
 import numpy as np
 from numpy.typing import NDArray
 
-from grogupy._core.utilities import make_contour
+from grogupy._core.utilities import make_contour, make_kronrod_contour
 from grogupy.batch.timing import DefaultTimer
 
 from .utilities import automatic_emin
@@ -52,6 +52,9 @@ class Contour:
         It is added to the emax value, by default 0
     eigfile : Union[str, None]
         Either the path to the siesta .EIG or the .fdf file
+    tolerance : Union[float, None], optional
+        The tolerance of the energies in meV for the adaptive contour, by
+        default None
 
     Examples
     --------
@@ -67,8 +70,24 @@ class Contour:
     >>> print(contour)
     <grogupy.Contour emin=-17.80687896, emax=0, eset=600, esetp=1000>
 
+    When the ``tolerance`` is given, the contour is adaptive. The mapped
+    interval is split to segments of 15 point Gauss-Kronrod rules, so the
+    number of samples is rounded up to a multiple of 15. During the solution
+    the integration error of the pair and anisotropy energies is estimated
+    from the embedded Gauss rule and the segments are bisected until the
+    error is below the tolerance. The refinement is done by the CPU solvers
+    in place, so after the solution the samples, weights and ``eset`` of the
+    instance are the refined ones. Add a copy to the Builder to keep the
+    initial contour.
+
+    >>> contour = Contour(eset=100, esetp=1000, emin=-20, tolerance=0.001)
+    >>> print(contour)
+    <grogupy.Contour emin=-25, emax=0, eset=105, esetp=1000, tolerance=0.001>
+
     Methods
     -------
+    refine(segments) :
+        Bisects the given segments of the adaptive contour.
     to_dict() :
         Returns the instance data as a dictionary.
     copy() :
@@ -80,6 +99,10 @@ class Contour:
         The samples along the contour
     weights: NDArray
         The weights of the corresponding samples
+    gauss_weights: Union[NDArray, None]
+        The weights of the embedded Gauss rule of the adaptive contour
+    segments: Union[NDArray, None]
+        The bounds of the segments of the adaptive contour in the mapped variable
     times: grogupy.batch.timing.DefaultTimer
         It contains and measures runtime
     """
@@ -93,6 +116,7 @@ class Contour:
         emin_shift: float = -5,
         emax_shift: float = 0,
         eigfile: Union[str, None] = None,
+        tolerance: Union[float, None] = None,
     ) -> None:
         """This functions sets up the energy integral.
 
@@ -115,6 +139,9 @@ class Contour:
             It is added to the emax value, by default 0
         eigfile : Union[str, None]
             Either the path to the siesta .EIG or the .fdf file
+        tolerance : Union[float, None], optional
+            The tolerance of the energies in meV for the adaptive contour, by
+            default None
         """
 
         self.times: DefaultTimer = DefaultTimer()
@@ -136,8 +163,11 @@ class Contour:
 
         self._eset: int = eset
         self._esetp: float = esetp
+        self._tolerance: Union[float, None] = tolerance
         self.samples: NDArray = np.empty(1)
         self.weights: NDArray = np.empty(1)
+        self.gauss_weights: Union[NDArray, None] = None
+        self.segments: Union[NDArray, None] = None
         self.__make_contour()
         self.times.measure("setup", restart=True)
 
@@ -150,13 +180,20 @@ class Contour:
         times = object.__new__(DefaultTimer)
         times.__setstate__(state["times"])
         state["times"] = times
+        # older versions did not have the adaptive contour
+        state.setdefault("_tolerance", None)
+        state.setdefault("gauss_weights", None)
+        state.setdefault("segments", None)
 
         self.__dict__ = state
 
     def __repr__(self) -> str:
         """String representation of the instance."""
 
-        out = f"<grogupy.Contour emin={self.emin}, emax={self.emax}, eset={self.eset}, esetp={self.esetp}>"
+        out = f"<grogupy.Contour emin={self.emin}, emax={self.emax}, eset={self.eset}, esetp={self.esetp}"
+        if self.adaptive:
+            out += f", tolerance={self.tolerance}"
+        out += ">"
 
         return out
 
@@ -169,6 +206,8 @@ class Contour:
                 and self._emax == value._emax
                 and self._eset == value._eset
                 and self._esetp == value._esetp
+                and self._tolerance == value._tolerance
+                and len(self.samples) == len(value.samples)
                 and np.allclose(self.samples, value.samples)
                 and np.allclose(self.weights, value.weights)
             ):
@@ -202,6 +241,16 @@ class Contour:
         """Assymmetry parameter of the contour generation."""
         return self._esetp
 
+    @property
+    def tolerance(self) -> Union[float, None]:
+        """Tolerance of the energies in meV for the adaptive contour."""
+        return self._tolerance
+
+    @property
+    def adaptive(self) -> bool:
+        """Wether the contour is refined during the solution."""
+        return self._tolerance is not None
+
     @emin.setter
     def emin(self, value: float) -> None:
         self._emin = value
@@ -222,6 +271,11 @@ class Contour:
         self._esetp = value
         self.__make_contour()
 
+    @tolerance.setter
+    def tolerance(self, value: Union[float, None]) -> None:
+        self._tolerance = value
+        self.__make_contour()
+
     def __make_contour(self) -> None:
         """It calculates the samples and weights.
 
@@ -229,9 +283,60 @@ class Contour:
         and dumps them to the instance attributes `samples` and `weights`.
         """
 
-        ze, we = make_contour(self.emin, self.emax, self.eset, self.esetp)
+        if self.adaptive:
+            segments = max(1, int(np.ceil(self._eset / 15)))
+            self.__make_segments(segments)
+        else:
+            ze, we = make_contour(self.emin, self.emax, self.eset, self.esetp)
+            self.samples: NDArray = ze
+            self.weights: NDArray = we
+            self.gauss_weights = None
+            self.segments = None
+
+    def __make_segments(self, segments: Union[int, NDArray]) -> None:
+        """It calculates the samples and weights of the adaptive contour."""
+
+        ze, we, wg, segments = make_kronrod_contour(
+            self.emin, self.emax, segments, self.esetp
+        )
         self.samples: NDArray = ze
         self.weights: NDArray = we
+        self.gauss_weights = wg
+        self.segments = segments
+        self._eset = len(ze)
+
+    def refine(self, segments: NDArray) -> NDArray:
+        """Bisects the given segments of the adaptive contour.
+
+        The samples of the segments that are not refined are unchanged, so
+        the Greens functions calculated on them can be reused.
+
+        Parameters
+        ----------
+        segments : NDArray
+            Boolean mask of the segments that are bisected
+
+        Returns
+        -------
+        NDArray
+            Boolean mask of the new segments
+        """
+
+        if not self.adaptive:
+            raise Exception("Only the adaptive contour can be refined!")
+
+        bounds: list = []
+        new: list = []
+        for (y1, y2), refine in zip(self.segments, segments):
+            if refine:
+                bounds += [(y1, (y1 + y2) / 2), ((y1 + y2) / 2, y2)]
+                new += [True, True]
+            else:
+                bounds.append((y1, y2))
+                new.append(False)
+        self.__make_segments(np.array(bounds))
+
+        return np.array(new)
 
     def copy(self):
         """Returns the deepcopy of the instance.
@@ -25,8 +25,17 @@ from typing import Union
 import numpy as np
 import sisl
 from numpy.typing import NDArray
-
-from grogupy._core import TAU_X, TAU_Y, TAU_Z, RotMa2b, build_hh_ss, hsk
+from scipy.sparse import csr_matrix, issparse
+
+from grogupy._core import (
+    RotMa2b,
+    build_hh_ss,
+    exchange_hamiltonian,
+    hsk,
+    spin_box_csr,
+    supercell_block,
+    time_reversal,
+)
 from grogupy._tqdm import _tqdm
 from grogupy.batch.timing import DefaultTimer
 from grogupy.config import CONFIG
@@ -55,6 +64,9 @@ class Hamiltonian:
         Path to the .fdf file or the sisl Hamiltonian and Density matrix, DM is optional
     scf_xcf_orientation: Union[list, NDArray]. optional
         The reference orientation, by default [0,0,1]
+    sparse: bool, optional
+        If it is True, then ``H`` and ``S`` are stored in the compressed
+        spin box form, by default False
 
     Examples
     --------
@@ -66,6 +78,26 @@ class Hamiltonian:
     >>> print(hamiltonian)
     <grogupy.Hamiltonian scf_xcf_orientation=[0 0 1], orientation=[0 0 1], NO=84>
 
+    The exchange field is extracted only once and it is kept until a new
+    ``H`` is set. The rotations recombine the kept parts, so the rotated
+    Hamiltonian does not have to be decomposed again. The kept arrays are
+    read-only and they are not saved.
+
+    >>> hTRS, hTRB, XCF, H_XCF = hamiltonian.extract_exchange_field()
+    >>> hamiltonian.rotate([1, 0, 0])
+    >>> XCF_x = hamiltonian.extract_exchange_field()[2]
+
+    Most of the supercell blocks of large systems are almost empty, so the
+    Hamiltonian and the overlap matrix can be kept in the compressed spin
+    box form of ``spin_box_csr``. The rotations, ``HkSk`` and the CPU
+    solvers use the compressed matrices directly, only the matrices in the
+    k points are dense. The compressed matrices are also pickled in this
+    form.
+
+    >>> hamiltonian = Hamiltonian(fdf_path, scf_xcf_orientation, sparse=True)
+    >>> hamiltonian.sparse
+    True
+
     Methods
     -------
     extract_exchange_field() :
@@ -85,10 +117,12 @@ class Hamiltonian:
         The sisl density matrix or None if it is not given
     infile: str
         The path to the .fdf file
-    H: NDArray
+    H: Union[NDArray, csr_matrix]
         Hamiltonian built from the sisl Hamiltonian
-    S: NDArray
+    S: Union[NDArray, csr_matrix]
         Overlap matrix built from the sisl Hamiltonian
+    sparse: bool
+        Wether ``H`` and ``S`` are stored in the compressed spin box form
     scf_xcf_orientation: NDArray
         Orientation of the DFT exchange field
     orientation: NDArray
@@ -118,6 +152,7 @@ class Hamiltonian:
             tuple[sisl.physics.Hamiltonian, Union[sisl.physics.DensityMatrix, None]],
         ],
         scf_xcf_orientation: Union[list, NDArray] = np.array([0, 0, 1]),
+        sparse: bool = False,
     ) -> None:
         """Initialize hamiltonian"""
 
@@ -155,9 +190,10 @@ class Hamiltonian:
         if self._dh.spin.kind == 3:
             self._spin_state: str = "SPIN-ORBIT"
 
-        H, S = build_hh_ss(self._dh)
-        self.H: NDArray = H
-        self.S: NDArray = S
+        H, S = build_hh_ss(self._dh, sparse=sparse)
+        self.__exchange_field: Union[None, tuple] = None
+        self.H: Union[NDArray, csr_matrix] = H
+        self.S: Union[NDArray, csr_matrix] = S
         self.scf_xcf_orientation: NDArray = np.array(scf_xcf_orientation)
         if (self.scf_xcf_orientation != 0).sum() != 1:
             warnings.warn(
@@ -177,7 +213,12 @@ class Hamiltonian:
         Hamiltonian.number_of_hamiltonians += 1
 
     def __getstate__(self):
-        state = self.__dict__.copy()
+        # the exchange field can be extracted again
+        state = {
+            ("H" if key == "_Hamiltonian__H" else key): value
+            for key, value in self.__dict__.items()
+            if key != "_Hamiltonian__exchange_field"
+        }
         state["times"] = state["times"].__getstate__()
         return state
 
@@ -185,6 +226,11 @@ class Hamiltonian:
         times = object.__new__(DefaultTimer)
         times.__setstate__(state["times"])
         state["times"] = times
+        state = {
+            ("_Hamiltonian__H" if key == "H" else key): value
+            for key, value in state.items()
+        }
+        state["_Hamiltonian__exchange_field"] = None
 
         self.__dict__ = state
 
@@ -195,8 +241,8 @@ class Hamiltonian:
                 and np.allclose(self._dh.Sk().toarray(), value._dh.Sk().toarray())
                 and self.infile == value.infile
                 and self._spin_state == value._spin_state
-                and np.allclose(self.H, value.H)
-                and np.allclose(self.S, value.S)
+                and _allclose(self.H, value.H)
+                and _allclose(self.S, value.S)
                 and np.allclose(self.scf_xcf_orientation, value.scf_xcf_orientation)
                 and np.allclose(self.orientation, value.orientation)
             ):
@@ -266,13 +312,38 @@ class Hamiltonian:
         self.__uc_in_sc_index = self._dh.sc_index([0, 0, 0])
         return self.__uc_in_sc_index
 
+    @property
+    def sparse(self) -> bool:
+        """Wether ``H`` and ``S`` are stored in the compressed spin box form."""
+        return issparse(self.H)
+
+    @property
+    def H(self) -> Union[NDArray, csr_matrix]:
+        """Hamiltonian built from the sisl Hamiltonian."""
+        return self.__H
+
+    @H.setter
+    def H(self, value: Union[NDArray, csr_matrix]) -> None:
+        self.__H = value
+        # the exchange field of the new Hamiltonian is extracted again
+        self.__exchange_field = None
+
     @property
     def H_uc(self) -> NDArray:
-        return self.H[self.uc_in_sc_index]
+        H_uc = supercell_block(self.H, self.uc_in_sc_index)
+        if issparse(H_uc):
+            return H_uc.toarray()
+        return H_uc
 
     def extract_exchange_field(self) -> tuple[NDArray, NDArray, NDArray, NDArray]:
         """Extract the exchange field and other useful quantities.
 
+        The quantities are calculated only once for the Hamiltonian and they
+        are returned as read-only arrays. They are calculated again when a
+        new ``H`` is set, but not when ``H`` is changed in place. The parts
+        of the compressed Hamiltonian are compressed and the exchange field
+        is the list of its three compressed components.
+
         Returns
         -------
         hTRS: NDArray
@@ -290,93 +361,50 @@ class Hamiltonian:
             Exchange field has non negligible scalar part.
         """
 
-        # progress bar
-        bar = _tqdm(
-            None, total=3 + 2 * self.nsc.prod(), desc="Extracting exchange field"
-        )
-
-        if CONFIG.is_CPU:
-            # identifying TRS and TRB parts of the Hamiltonian
-            TAUY: NDArray = np.kron(np.eye(int(self.NO / 2)), TAU_Y)
-
-            hTR: list = []
-            for i in range(self.nsc.prod()):
-                hTR.append(TAUY @ self.H[i].conj() @ TAUY)
-                bar.update()
-            hTR = np.array(hTR)
-
-            hTRS: NDArray = (self.H + hTR) / 2
-            hTRB: NDArray = (self.H - hTR) / 2
-
-            # extracting the exchange field
-            traced: list = []
-            for i in range(self.nsc.prod()):
-                traced.append(spin_tracer(hTRB[i]))
-                bar.update()
-
-            XCF: NDArray = np.array(
-                [
-                    np.array([f["x"] / 2 for f in traced]),
-                    np.array([f["y"] / 2 for f in traced]),
-                    np.array([f["z"] / 2 for f in traced]),
-                ]
-            )
-
-            H_XCF: NDArray = np.zeros(
-                (self.nsc.prod(), self.NO, self.NO), dtype="complex128"
-            )
-            for i, tau in enumerate([TAU_X, TAU_Y, TAU_Z]):
-                H_XCF += np.kron(XCF[i], tau)
-                bar.update()
-
-        elif CONFIG.is_GPU:
-            # identifying TRS and TRB parts of the Hamiltonian
-            TAUY: "CNDArray" = cp.kron(cp.eye(int(self.NO / 2)), cp.array(TAU_Y))
-
-            tmp: list = []
-            for i in range(self.nsc.prod()):
-                tmp.append((TAUY @ cp.array(self.H[i]).conj() @ TAUY).get())
-                bar.update()
-            hTR: NDArray = np.array(tmp)
-
-            # release this from memory
-            TAUY = None
-
-            hTRS: NDArray = (self.H + hTR) / 2
-            hTRB: NDArray = (self.H - hTR) / 2
-
-            # extracting the exchange field equation 77
-            traced: list = []
-            for i in range(self.nsc.prod()):
-                traced.append(spin_tracer(hTRB[i]))
-                bar.update()
-
-            XCF: "CNDArray" = cp.array(
-                [
-                    cp.array([f["x"] / 2 for f in traced]),
-                    cp.array([f["y"] / 2 for f in traced]),
-                    cp.array([f["z"] / 2 for f in traced]),
-                ]
-            )
-
-            H_XCF: NDArray = np.zeros(
-                (self.nsc.prod(), self.NO, self.NO), dtype="complex128"
-            )
-            for i, tau in enumerate([TAU_X, TAU_Y, TAU_Z]):
-                H_XCF += cp.kron(XCF[i], cp.array(tau)).get()
-                bar.update()
+        if self.__exchange_field is not None:
+            return self.__exchange_field
 
-            XCF, H_XCF = XCF.get(), H_XCF
-        else:
-            raise ValueError(f"Unknown architecture: {CONFIG.architecture}")
+        # progress bar
+        bar = _tqdm(None, total=3, desc="Extracting exchange field")
+
+        # identifying TRS and TRB parts of the Hamiltonian, the spin box
+        # kernels are elementwise, so they run on the host for both
+        # architectures
+        hTR: NDArray = time_reversal(self.H)
+        hTRS: NDArray = (self.H + hTR) / 2
+        hTRB: NDArray = (self.H - hTR) / 2
+        bar.update()
+
+        # extracting the exchange field equation 77
+        traced: dict = spin_tracer(hTRB)
+        XCF: Union[NDArray, list] = [traced["x"] / 2, traced["y"] / 2, traced["z"] / 2]
+        if not self.sparse:
+            XCF = np.array(XCF)
+        bar.update()
+
+        H_XCF: NDArray = exchange_hamiltonian(XCF)
+        bar.update()
 
         # check if exchange field has scalar part
-        max_xcfs: float = abs(np.array([f["c"] / 2 for f in traced])).max()
+        max_xcfs: float = abs(traced["c"] / 2).max()
         if max_xcfs > 1e-12:
             warnings.warn(
                 f"Exchange field has non negligible scalar part. Largest value is {max_xcfs}"
             )
-        return hTRS, hTRB, XCF, H_XCF
+
+        self.__keep_exchange_field(hTRS, hTRB, XCF, H_XCF)
+        return self.__exchange_field
+
+    def __keep_exchange_field(
+        self, hTRS: NDArray, hTRB: NDArray, XCF: NDArray, H_XCF: NDArray
+    ) -> None:
+        """Keeps the exchange field of the current Hamiltonian."""
+
+        # the compressed matrices are kept as they are
+        for array in (hTRS, hTRB, XCF, H_XCF):
+            if isinstance(array, np.ndarray):
+                array.flags.writeable = False
+        self.__exchange_field = (hTRS, hTRB, XCF, H_XCF)
 
     def rotate(self, orientation: Union[NDArray, list]) -> None:
         """It rotates the exchange field of the Hamiltonian.
@@ -395,36 +423,21 @@ class Hamiltonian:
         hTRS, hTRB, XCF, H_XCF = self.extract_exchange_field()
         # obtain rotated exchange field and Hamiltonian
         R: NDArray = RotMa2b(self.orientation, orientation)
-        XCF: NDArray = np.einsum("ij,jklm->iklm", R, XCF)
-
-        if CONFIG.is_CPU:
-            H_XCF: NDArray = np.zeros(
-                (self.nsc.prod(), self.NO, self.NO), dtype=np.complex128
-            )
-            for i, tau in _tqdm(
-                enumerate([TAU_X, TAU_Y, TAU_Z]),
-                total=3,
-                desc="Rotating Exchange field",
-            ):
-                H_XCF += np.kron(XCF[i], tau)
-        elif CONFIG.is_GPU:
-            H_XCF: "CNDArray" = cp.zeros(
-                (self.nsc.prod(), self.NO, self.NO), dtype=np.complex128
-            )
-            XCF = cp.array(XCF)
-            for i, tau in _tqdm(
-                enumerate([TAU_X, TAU_Y, TAU_Z]),
-                total=3,
-                desc="Rotating Exchange field",
-            ):
-                H_XCF += cp.kron(XCF[i], cp.array(tau))
-            H_XCF = H_XCF.get()
+        if self.sparse:
+            XCF = [
+                R[i, 0] * XCF[0] + R[i, 1] * XCF[1] + R[i, 2] * XCF[2] for i in range(3)
+            ]
         else:
-            raise Exception(f"Unknown architecture: {CONFIG.architecture}")
+            XCF = np.einsum("ij,jklm->iklm", R, XCF)
+
+        H_XCF = exchange_hamiltonian(XCF)
 
         # obtain total Hamiltonian with the rotated exchange field
-        self.H: NDArray = hTRS + H_XCF  # equation 76
+        self.H = hTRS + H_XCF  # equation 76
         self.orientation = orientation
+        # the rotated exchange field is time reversal breaking without a
+        # scalar part, so the decomposition is known
+        self.__keep_exchange_field(hTRS, H_XCF, XCF, H_XCF)
 
     def HkSk(self, k: tuple = (0, 0, 0)) -> tuple[NDArray, NDArray]:
         """Sets up the Hamiltonian and the overlap matrix at a given k-point.
@@ -454,7 +467,21 @@ class Hamiltonian:
             The copied instance.
         """
 
-        return copy.deepcopy(self)
+        new = copy.deepcopy(self)
+        # the read-only exchange field can be shared
+        new.__exchange_field = self.__exchange_field
+
+        return new
+
+
+def _allclose(a: Union[NDArray, csr_matrix], b: Union[NDArray, csr_matrix]) -> bool:
+    """Compares the dense or the compressed spin box matrices."""
+
+    if issparse(a) or issparse(b):
+        a, b = [m if issparse(m) else spin_box_csr(m) for m in (a, b)]
+        return a.shape == b.shape and np.allclose((a - b).data, 0)
+
+    return np.allclose(a, b)
 
 
 if __name__ == "__main__":
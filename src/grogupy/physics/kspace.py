@@ -24,7 +24,7 @@ from typing import Union
 import numpy as np
 from numpy.typing import NDArray
 
-from grogupy._core.utilities import make_kset
+from grogupy._core.utilities import make_kset, make_qmc_kset, make_trs_kset
 from grogupy.batch.timing import DefaultTimer
 
 
@@ -35,6 +35,31 @@ class Kspace:
     ----------
     kset: np.ndarray
         The number of k points in each direction
+    trs: bool, optional
+        If it is True, then the k and -k points are merged to one k point
+        with doubled weight, by default False
+    symmetrize: bool, optional
+        If it is True, then only the irreducible k points of the symmetries
+        of the Hamiltonian are sampled, by default False
+    tolerance: Union[float, None], optional
+        The tolerance of the exchange and anisotropy tensors in meV for the
+        refinement of the grid, by default None
+    factor: int, optional
+        The number of k points is multiplied by this in every direction
+        with more than one k point in a refinement, by default 2
+    max_refinements: int, optional
+        The maximum number of refinements, by default 3
+    sampling: {"grid", "sobol"}, optional
+        The uniform grid or the quasi-Monte Carlo sampling of the Brillouin
+        zone, by default "grid"
+    replicas: int, optional
+        The number of independent replicas of the quasi-Monte Carlo
+        sampling, by default 8
+    target_error_meV: Union[float, None], optional
+        The target statistical error of the exchange and anisotropy tensors
+        in meV for the quasi-Monte Carlo sampling, by default None
+    seed: Union[int, None], optional
+        The seed of the quasi-Monte Carlo sampling, by default None
 
     Examples
     --------
@@ -51,8 +76,52 @@ class Kspace:
     >>> print(kspace)
     <grogupy.Kspace kset=[100 100   1], NK=10000>
 
+    When the Hamiltonian is real in real space, the Greens function in -k
+    is the transpose of the Greens function in k, so it is enough to
+    sample half of the Brillouin zone. The solver falls back to the full
+    grid for the reference directions where the rotated Hamiltonian is
+    complex.
+
+    >>> kspace = Kspace(kset=[100,100,1], trs=True)
+    >>> print(kspace)
+    <grogupy.Kspace kset=[100 100   1], NK=5002>
+
+    The symmetries of the geometry can be used to sample only the
+    irreducible wedge of the Brillouin zone. The symmetries depend on the
+    rotated Hamiltonian, so the irreducible k points are found by the
+    solver for every reference direction and the ``kpoints`` of the
+    instance are not changed.
+
+    >>> kspace = Kspace(kset=[100,100,1], symmetrize=True)
+
+    When the ``tolerance`` is given, the solver refines the grid until the
+    largest change of the exchange and anisotropy tensors is below the
+    tolerance. The grids are nested, so the contribution of the k points of
+    the coarser grid is reused and only the new k points are sampled. The
+    ``kset`` of the instance is the converged grid after the solution.
+
+    >>> kspace = Kspace(kset=[10,10,1], tolerance=0.01)
+    >>> kspace.refine()
+    >>> print(kspace)
+    <grogupy.Kspace kset=[20 20  1], NK=400>
+
+    For metals the uniform grid converges slowly, so the Brillouin zone can
+    be sampled by independently scrambled Sobol sequences. The number of k
+    points in each replica is the smallest power of two that gives at least
+    ``kset.prod()`` k points in total and only the directions with more than
+    one k point are sampled. The spread of the replicas gives a statistical
+    error estimate of the exchange and anisotropy tensors and the number of
+    k points is doubled until the error is below ``target_error_meV``.
+
+    >>> kspace = Kspace(kset=[10,10,1], sampling="sobol", replicas=4, target_error_meV=0.01)
+    >>> print(kspace)
+    <grogupy.Kspace kset=[10 10  1], NK=128>
+
     Methods
     -------
+    refine() :
+        Multiplies the number of k points by the refinement factor, or
+        doubles the number of quasi-Monte Carlo k points.
     to_dict(all) :
         Returns the instance data as a dictionary.
     copy() :
@@ -64,20 +133,74 @@ class Kspace:
         Total number of kpoints, by default 1
     kset : int, optional
         Number of kpoints in each direction, by default np.array([1,1,1])
+    trs : bool, optional
+        Wether the k and -k points are merged, by default False
+    symmetrize : bool, optional
+        Wether the irreducible k points are sampled, by default False
+    tolerance : Union[float, None], optional
+        The tolerance of the refinement of the grid in meV, by default None
+    factor : int, optional
+        The refinement factor of the grid, by default 2
+    max_refinements : int, optional
+        The maximum number of refinements, by default 3
+    sampling : str
+        The sampling of the Brillouin zone, by default "grid"
+    replicas : int, optional
+        The number of replicas of the quasi-Monte Carlo sampling, by default 8
+    target_error_meV : Union[float, None], optional
+        The target statistical error in meV, by default None
+    seed : int
+        The seed of the quasi-Monte Carlo sampling
     kpoints : NDArray
         The samples in the Brillouin zone
     weights : NDArray
         The weights of the corresponding samples
+    full_kpoints : NDArray
+        The samples of the full grid, without the k/-k reduction
+    full_weights : NDArray
+        The weights of the samples of the full grid
     times : grogupy.batch.timing.DefaultTimer
         It contains and measures runtime
     """
 
-    def __init__(self, kset: Union[list[int], NDArray] = np.array([1, 1, 1])) -> None:
+    def __init__(
+        self,
+        kset: Union[list[int], NDArray] = np.array([1, 1, 1]),
+        trs: bool = False,
+        symmetrize: bool = False,
+        tolerance: Union[float, None] = None,
+        factor: int = 2,
+        max_refinements: int = 3,
+        sampling: str = "grid",
+        replicas: int = 8,
+        target_error_meV: Union[float, None] = None,
+        seed: Union[int, None] = None,
+    ) -> None:
         """Initialize kspace sampling."""
         self.times: DefaultTimer = DefaultTimer()
         self.__kset: NDArray = np.array(kset, dtype=int)
-        self.kpoints: NDArray = make_kset(self.__kset)
-        self.weights: NDArray = np.ones(len(self.kpoints)) / len(self.kpoints)
+        self.__trs: bool = trs
+        self.symmetrize: bool = symmetrize
+        self.tolerance: Union[float, None] = tolerance
+        self.factor: int = factor
+        self.max_refinements: int = max_refinements
+        if sampling not in ("grid", "sobol"):
+            raise Exception(f"Unknown sampling: {sampling}. Use grid or sobol!")
+        self.__sampling: str = sampling
+        if sampling == "sobol" and replicas < 2:
+            raise Exception("At least two replicas are needed for the error estimate!")
+        self.replicas: int = replicas
+        self.target_error_meV: Union[float, None] = target_error_meV
+        # the seed is kept, so the samples can be extended
+        if seed is None:
+            seed = int(np.random.SeedSequence().generate_state(1)[0])
+        self.seed: int = seed
+        self.__points: int = int(
+            2 ** np.ceil(np.log2(max(1, self.__kset.prod() / replicas)))
+        )
+        self.kpoints: NDArray = np.empty(1)
+        self.weights: NDArray = np.empty(1)
+        self.__make_kset()
         self.times.measure("setup", restart=True)
 
     def __getstate__(self):
@@ -89,6 +212,17 @@ class Kspace:
         times = object.__new__(DefaultTimer)
         times.__setstate__(state["times"])
         state["times"] = times
+        # older versions did not have the k/-k reduction
+        state.setdefault("_Kspace__trs", False)
+        state.setdefault("symmetrize", False)
+        state.setdefault("tolerance", None)
+        state.setdefault("factor", 2)
+        state.setdefault("max_refinements", 3)
+        state.setdefault("_Kspace__sampling", "grid")
+        state.setdefault("replicas", 8)
+        state.setdefault("target_error_meV", None)
+        state.setdefault("seed", 0)
+        state.setdefault("_Kspace__points", 1)
 
         self.__dict__ = state
 
@@ -96,6 +230,15 @@ class Kspace:
         if isinstance(value, Kspace):
             if (
                 np.allclose(self.__kset, value.__kset)
+                and self.__trs == value.__trs
+                and self.symmetrize == value.symmetrize
+                and self.tolerance == value.tolerance
+                and self.factor == value.factor
+                and self.max_refinements == value.max_refinements
+                and self.__sampling == value.__sampling
+                and self.replicas == value.replicas
+                and self.target_error_meV == value.target_error_meV
+                and len(self.kpoints) == len(value.kpoints)
                 and np.allclose(self.kpoints, value.kpoints)
                 and np.allclose(self.weights, value.weights)
             ):
@@ -123,8 +266,77 @@ class Kspace:
     @kset.setter
     def kset(self, value: Union[list, NDArray]) -> None:
         self.__kset = np.array(value)
-        self.kpoints: NDArray = make_kset(self.__kset)
-        self.weights: NDArray = np.ones(len(self.kpoints)) / len(self.kpoints)
+        self.__points = int(
+            2 ** np.ceil(np.log2(max(1, self.__kset.prod() / self.replicas)))
+        )
+        self.__make_kset()
+
+    @property
+    def trs(self) -> bool:
+        """Wether the k and -k points are merged."""
+        return self.__trs
+
+    @trs.setter
+    def trs(self, value: bool) -> None:
+        self.__trs = value
+        self.__make_kset()
+
+    @property
+    def sampling(self) -> str:
+        """The sampling of the Brillouin zone."""
+        return self.__sampling
+
+    @property
+    def full_kpoints(self) -> NDArray:
+        """The samples of the full grid, without the k/-k reduction."""
+        if self.__sampling == "sobol":
+            return self.kpoints
+        return make_kset(self.__kset)
+
+    @property
+    def full_weights(self) -> NDArray:
+        """The weights of the samples of the full grid."""
+        if self.__sampling == "sobol":
+            return self.weights
+        return np.ones(self.__kset.prod()) / self.__kset.prod()
+
+    def __make_kset(self) -> None:
+        """It calculates the samples and weights.
+
+        It calculates the samples and weights based on the instance attributes
+        and dumps them to the instance attributes `kpoints` and `weights`.
+        """
+
+        # the k and -k points are averaged by the solver
+        if self.__sampling == "sobol":
+            self.kpoints = make_qmc_kset(
+                self.__kset, self.__points, self.replicas, self.seed
+            ).reshape(-1, 3)
+            self.weights = np.ones(len(self.kpoints)) / len(self.kpoints)
+        elif self.__trs:
+            self.kpoints, self.weights = make_trs_kset(self.__kset)
+        else:
+            self.kpoints = self.full_kpoints
+            self.weights = self.full_weights
+
+    def refine(self) -> None:
+        """Multiplies the number of k points by the refinement factor.
+
+        Only the directions with more than one k point are refined, so the
+        grid stays two dimensional for layered systems. The quasi-Monte Carlo
+        samples are extended to the double of the k points in each replica,
+        so the old k points are kept.
+        """
+
+        if self.__sampling == "sobol":
+            self.__points *= 2
+            self.__make_kset()
+            return
+
+        if (self.__kset == 1).all():
+            raise Exception("The Gamma point can not be refined!")
+
+        self.kset = np.where(self.__kset > 1, self.__kset * self.factor, self.__kset)
 
     def copy(self):
         """Returns the deepcopy of the instance.
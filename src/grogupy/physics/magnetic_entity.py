@@ -33,12 +33,11 @@ from grogupy import __version__
 from grogupy._core.utilities import arrays_lists_equal, arrays_None_equal
 
 from .utilities import (
+    anisotropy_energies,
     blow_up_orbindx,
     calculate_anisotropy_tensor,
     fit_anisotropy_tensor,
-    interaction_energy,
     parse_magnetic_entity,
-    second_order_energy,
 )
 
 
@@ -164,6 +163,9 @@ class MagneticEntity:
         The magnetic anisotropy, by default None
     K_consistency : Union[None, float]
         Consistency check on the diagonal K elements, by default None
+    K_error_meV : Union[None, NDArray]
+        Statistical error of the anisotropy in meV from the quasi-Monte Carlo
+        sampling, by default None
     """
 
     number_of_entities: int = 0
@@ -230,6 +232,7 @@ class MagneticEntity:
         self.energies: Union[None, NDArray] = None
         self.K: Union[None, NDArray] = None
         self.K_consistency: Union[None, float] = None
+        self.K_error_meV: Union[None, NDArray] = None
 
         # pre calculate hidden unuseed properties
         # they are here so they are dumped to the self.__dict__ upon saving
@@ -299,6 +302,8 @@ class MagneticEntity:
         return self.__dict__.copy()
 
     def __setstate__(self, state):
+        # older versions did not have the quasi-Monte Carlo sampling
+        state.setdefault("K_error_meV", None)
         self.__dict__ = state
 
     def __add__(self, value):
@@ -650,6 +655,7 @@ class MagneticEntity:
         self.energies: Union[None, NDArray] = None
         self.K: Union[None, NDArray] = None
         self.K_consistency: Union[None, float] = None
+        self.K_error_meV: Union[None, NDArray] = None
 
     def calculate_energies(
         self, weights: NDArray, append: bool = False, third_direction: bool = False
@@ -672,40 +678,22 @@ class MagneticEntity:
         """
 
         if append:
-            storage: list[float] = []
-            Gii = self._Gii_tmp
-            # iterate over the first and second order local perturbations
-            V1 = self._Vu1_tmp
-            V2 = self._Vu2_tmp
-
-            # fill up the magnetic entities dictionary with the energies
-            storage.append(second_order_energy(V1[0], V2[0], Gii, weights))
-            storage.append(interaction_energy(V1[0], V1[1], Gii, Gii, weights))
-            storage.append(interaction_energy(V1[1], V1[0], Gii, Gii, weights))
-            storage.append(second_order_energy(V1[1], V2[1], Gii, weights))
-            if third_direction:
-                storage.append(second_order_energy(V1[2], V2[2], Gii, weights))
+            storage = anisotropy_energies(
+                self._Vu1_tmp, self._Vu2_tmp, self._Gii_tmp, weights, third_direction
+            )
             if self.energies is None:
-                self.energies = np.array(storage)
+                self.energies = storage
             else:
-                self.energies = np.vstack((self.energies, np.array(storage)))
+                self.energies = np.vstack((self.energies, storage))
         else:
-            energies: list[list[float]] = []
-            for i, Gii in enumerate(self._Gii):
-                storage: list[float] = []
-                # iterate over the first and second order local perturbations
-                V1 = self._Vu1[i]
-                V2 = self._Vu2[i]
-
-                # fill up the magnetic entities dictionary with the energies
-                storage.append(second_order_energy(V1[0], V2[0], Gii, weights))
-                storage.append(interaction_energy(V1[0], V1[1], Gii, Gii, weights))
-                storage.append(interaction_energy(V1[1], V1[0], Gii, Gii, weights))
-                storage.append(second_order_energy(V1[1], V2[1], Gii, weights))
-                if third_direction:
-                    storage.append(second_order_energy(V1[2], V2[2], Gii, weights))
-                energies.append(storage)
-            self.energies: Union[None, NDArray] = np.array(energies)
+            self.energies: Union[None, NDArray] = np.array(
+                [
+                    anisotropy_energies(
+                        self._Vu1[i], self._Vu2[i], Gii, weights, third_direction
+                    )
+                    for i, Gii in enumerate(self._Gii)
+                ]
+            )
 
         # call these so they are updated
         self.energies_meV
@@ -722,14 +710,7 @@ class MagneticEntity:
         if self.energies is None:
             raise Exception("Energies missing for anisotropy!")
 
-        K, K_consistency = calculate_anisotropy_tensor(self.energies)
-        self.K: Union[None, NDArray] = K
-        self.K_consistency: Union[None, float] = K_consistency
-        # call these so they are updated
-        self.K_meV
-        self.K_mRy
-        self.K_consistency_meV
-        self.K_consistency_mRy
+        self._dump_anisotropy_tensor(*calculate_anisotropy_tensor(self.energies))
 
     def fit_anisotropy_tensor(self, ref_xcf: list[dict]) -> None:
         """Fits the anisotropy tensor to the energies.
@@ -748,10 +729,22 @@ class MagneticEntity:
         if self.energies is None:
             raise Exception("Energies missing for anisotropy!")
 
-        K = fit_anisotropy_tensor(self.energies, ref_xcf)
+        # the consistency is not relevant with this method
+        self._dump_anisotropy_tensor(
+            fit_anisotropy_tensor(self.energies, ref_xcf), None
+        )
+
+    def _dump_anisotropy_tensor(
+        self, K: NDArray, K_consistency: Union[float, None]
+    ) -> None:
+        """Dumps the anisotropy tensor and the consistency to the instance.
+
+        It is used by the solvers, which calculate the anisotropy tensors of
+        all the magnetic entities at once.
+        """
+
         self.K: Union[None, NDArray] = K
-        # it is not relevant with this method
-        self.K_consistency: Union[float, None] = None
+        self.K_consistency: Union[None, float] = K_consistency
         # call these so they are updated
         self.K_meV
         self.K_mRy
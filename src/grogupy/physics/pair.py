@@ -35,7 +35,7 @@ from .utilities import (
     calculate_isotropic_biquadratic_only,
     calculate_isotropic_only,
     fit_exchange_tensor,
-    interaction_energy,
+    interaction_energies,
 )
 
 
@@ -122,6 +122,10 @@ class Pair:
         Symmetric exchange, by default None
     self.D: Union[NDArray, None]
         Dzyaloshinskii-Morilla vector, by default None
+    self.J_error_meV: Union[NDArray, float, None]
+        Statistical error of the exchange tensor, or the isotropic exchange
+        for the isotropic spin models, in meV from the quasi-Monte Carlo
+        sampling, by default None
 
     Raises
     ------
@@ -190,6 +194,7 @@ class Pair:
         self.J: Union[None, NDArray] = None
         self.J_S: Union[None, NDArray] = None
         self.D: Union[None, NDArray] = None
+        self.J_error_meV: Union[None, NDArray, float] = None
 
         # pre calculate hidden unuseed properties
         # they are here so they are dumped to the self.__dict__ upon saving
@@ -234,6 +239,8 @@ class Pair:
         M2 = object.__new__(MagneticEntity)
         M2.__setstate__(state["M2"])
         state["M2"] = M2
+        # older versions did not have the quasi-Monte Carlo sampling
+        state.setdefault("J_error_meV", None)
 
         self.__dict__ = state
 
@@ -468,6 +475,7 @@ class Pair:
         self.J: Union[None, NDArray] = None
         self.J_S: Union[None, NDArray] = None
         self.D: Union[None, NDArray] = None
+        self.J_error_meV: Union[None, NDArray, float] = None
 
     def calculate_energies(self, weights: NDArray, append: bool = False) -> None:
         """Calculates the energies of the infinitesimal rotations.
@@ -483,35 +491,29 @@ class Pair:
             If it is True, then the energy of a single rotation is appended
             to the energies from the temporary storages, by default False
         """
+        # all possible orientations without the orientation for the off-diagonal
+        # anisotropy, that is why we only take the first two of each Vu1
         if append:
-            storage: list[float] = []
-            # iterate over the first order local perturbations in all possible orientations for the two sites
-            # actually all possible orientations without the orientation for the off-diagonal anisotropy
-            # that is why we only take the first two of each Vu1
-            for Vui in self.M1._Vu1_tmp[:2]:
-                for Vuj in self.M2._Vu1_tmp[:2]:
-                    storage.append(
-                        interaction_energy(
-                            Vui, Vuj, self._Gij_tmp, self._Gji_tmp, weights
-                        )
-                    )
+            storage = interaction_energies(
+                self.M1._Vu1_tmp[:2],
+                self.M2._Vu1_tmp[:2],
+                self._Gij_tmp,
+                self._Gji_tmp,
+                weights,
+            ).ravel()
             if self.energies is None:
-                self.energies = np.array(storage)
+                self.energies = storage
             else:
-                self.energies = np.vstack((self.energies, np.array(storage)))
+                self.energies = np.vstack((self.energies, storage))
         else:
-            energies: list[list[float]] = []
-            for i, (Gij, Gji) in enumerate(zip(self._Gij, self._Gji)):
-                storage: list[float] = []
-                # iterate over the first order local perturbations in all possible orientations for the two sites
-                # actually all possible orientations without the orientation for the off-diagonal anisotropy
-                # that is why we only take the first two of each Vu1
-                for Vui in self.M1._Vu1[i][:2]:
-                    for Vuj in self.M2._Vu1[i][:2]:
-                        storage.append(interaction_energy(Vui, Vuj, Gij, Gji, weights))
-                # fill up the pairs dictionary with the energies
-                energies.append(storage)
-                self.energies: NDArray = np.array(energies)
+            self.energies: NDArray = np.array(
+                [
+                    interaction_energies(
+                        self.M1._Vu1[i][:2], self.M2._Vu1[i][:2], Gij, Gji, weights
+                    ).ravel()
+                    for i, (Gij, Gji) in enumerate(zip(self._Gij, self._Gji))
+                ]
+            )
 
         # call these so they are updated
         self.energies_meV
@@ -526,20 +528,7 @@ class Pair:
 
         """
 
-        J_iso, J_S, D, J = calculate_exchange_tensor(self.energies)
-        self.J: Union[None, NDArray] = J
-        self.J_S: Union[None, NDArray] = J_S
-        self.J_iso: Union[None, float] = J_iso
-        self.D: Union[None, NDArray] = D
-        # call these so they are updated
-        self.J_meV
-        self.J_mRy
-        self.J_S_meV
-        self.J_S_mRy
-        self.J_iso_meV
-        self.J_iso_mRy
-        self.D_meV
-        self.D_mRy
+        self._dump_exchange_tensor(*calculate_exchange_tensor(self.energies))
 
     def fit_exchange_tensor(self, ref_xcf: list[dict]) -> None:
         """Fits the exchange tensor to the energies.
@@ -554,7 +543,17 @@ class Pair:
             The reference directions containing the orientation and perpendicular directions
         """
 
-        J_iso, J_S, D, J = fit_exchange_tensor(self.energies, ref_xcf)
+        self._dump_exchange_tensor(*fit_exchange_tensor(self.energies, ref_xcf))
+
+    def _dump_exchange_tensor(
+        self, J_iso: float, J_S: NDArray, D: NDArray, J: NDArray
+    ) -> None:
+        """Dumps the exchange tensor and its representations to the instance.
+
+        It is used by the solvers, which calculate the exchange tensors of
+        all the pairs at once.
+        """
+
         self.J: Union[None, NDArray] = J
         self.J_S: Union[None, NDArray] = J_S
         self.J_iso: Union[None, float] = J_iso
@@ -712,6 +711,33 @@ class PairList:
         else:
             raise Exception("This class is reserved for Pair instances only!")
 
+    def reverse_partners(self) -> list[Union[int, None]]:
+        """Finds the earlier reverse pair of every pair.
+
+        The pair (j, i, -R) is the reverse of the pair (i, j, R), so its
+        Greens functions are the Greens functions of the earlier pair with
+        the roles of the magnetic entities swapped. The magnetic entities
+        are compared by their spin box indices.
+
+        Returns
+        -------
+        list[Union[int, None]]
+            The index of the earlier reverse pair or None for every pair
+        """
+
+        found: dict = {}
+        partners: list = []
+        for i, pair in enumerate(self.__pairs):
+            SBI1 = tuple(np.asarray(pair.SBI1).tolist())
+            SBI2 = tuple(np.asarray(pair.SBI2).tolist())
+            shift = tuple(np.asarray(pair.supercell_shift, dtype=int).tolist())
+            reverse = (SBI2, SBI1, tuple(-s for s in shift))
+            partners.append(found.get(reverse))
+            if partners[-1] is None:
+                found.setdefault((SBI1, SBI2, shift), i)
+
+        return partners
+
     def tolist(self) -> list[Pair]:
         """Returns a list from the underlying data.
 
@@ -18,18 +18,366 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import contextlib
+
+import numpy as np
 import pytest
+import sisl
+from numpy.testing import assert_allclose
 
-from grogupy.physics import Builder
+from grogupy._core import cpu_solvers
+from grogupy.physics import Builder, Contour, Hamiltonian, Kspace
 
 pytestmark = [pytest.mark.physics]
 
 
+def synthetic_builder(
+    pairs: list = [[0, 1, [0, 0, 0]], [0, 1, [1, 0, 0]], [0, 0, [0, 1, 0]]],
+    kspace: Kspace = None,
+    contour: Contour = None,
+    spin: str = "so",
+    sparse: bool = False,
+) -> Builder:
+    """Builder of a two atom Fe system with random hoppings.
+
+    The exchange field is along z and it is much larger than the hoppings,
+    so the system is magnetic. When the spin is non-colinear, then the
+    Hamiltonian is real in real space.
+    """
+
+    rng = np.random.default_rng(1)
+    atom = sisl.Atom(
+        26, orbitals=[sisl.AtomicOrbital("s", R=3), sisl.AtomicOrbital("pzZ1", R=3)]
+    )
+    lattice = sisl.Lattice([[2.5, 0, 0], [0.3, 2.7, 0], [0, 0, 20]], nsc=[3, 3, 1])
+    geometry = sisl.Geometry(
+        [[0, 0, 10], [1.3, 1.2, 10.4]], atoms=atom, lattice=lattice
+    )
+
+    dh = sisl.Hamiltonian(geometry, spin=sisl.Spin(spin), orthogonal=False)
+    dm = sisl.DensityMatrix(geometry, spin=sisl.Spin(spin), orthogonal=False)
+    size = dh.spin.size(np.float64)
+    for i in range(geometry.no):
+        for j in range(geometry.no_s):
+            if i == j or rng.random() < 0.5:
+                values = np.append(0.2 * rng.normal(size=size), 0.05 * rng.normal())
+                if spin == "nc":
+                    values[3] = 0
+                dh[i, j] = values
+    dh = (dh + dh.transpose(conjugate=True)) / 2
+    for i in range(geometry.no):
+        values = np.array([dh[i, i, s] for s in range(size + 1)])
+        values[0] -= 2
+        values[1] += 0.5
+        values[-1] = 1
+        dh[i, i] = values
+        density = np.zeros(size + 1)
+        density[[0, 1, -1]] = 0.9, 0.1, 1
+        dm[i, i] = density
+
+    builder = Builder([[1, 0, 0], [0, 1, 0], [0, 0, 1]])
+    builder.add_kspace(Kspace([3, 3, 1]) if kspace is None else kspace)
+    builder.add_contour(Contour(20, 1000, -10) if contour is None else contour)
+    builder.add_hamiltonian(Hamiltonian((dh, dm), [0, 0, 1], sparse=sparse))
+    builder.add_magnetic_entities([dict(atom=0), dict(atom=1)])
+    builder.add_pairs([dict(ai=ai, aj=aj, Ruc=Ruc) for ai, aj, Ruc in pairs])
+
+    return builder
+
+
+def square_builder(kspace: Kspace) -> Builder:
+    """Builder of a one atom Fe square lattice with complete orbital shells.
+
+    The nearest neighbour hoppings are the same for every orbital of the
+    shell and the p shell has an onsite spin-orbit coupling, so the system
+    keeps the symmetries of the square lattice.
+    """
+
+    orbitals = [sisl.AtomicOrbital(name, R=3) for name in ("s", "px", "py", "pz")]
+    lattice = sisl.Lattice([2.5, 2.5, 20], nsc=[3, 3, 1])
+    geometry = sisl.Geometry(
+        [[0, 0, 10]], atoms=sisl.Atom(26, orbitals=orbitals), lattice=lattice
+    )
+
+    dh = sisl.Hamiltonian(geometry, spin=sisl.Spin("so"), orthogonal=False)
+    dm = sisl.DensityMatrix(geometry, spin=sisl.Spin("so"), orthogonal=False)
+    # angular momentum of the p shell, <px|Lz|py> = -i and its cyclic pairs
+    L = np.zeros((3, 4, 4), dtype=complex)
+    for a, (i, j) in enumerate(((2, 3), (3, 1), (1, 2))):
+        L[a, i, j], L[a, j, i] = -1j, 1j
+    uu, dd = 0.1 * L[2], -0.1 * L[2]
+    ud, du = 0.1 * (L[0] - 1j * L[1]), 0.1 * (L[0] + 1j * L[1])
+
+    onsite, hopping = [-2, -1, -1, -0.5], [-0.3, 0.2, 0.2, 0.2]
+    neighbours = geometry.close(0, R=[0.1, 2.6])[1]
+    for i in range(geometry.no):
+        for j in range(geometry.no):
+            values = np.array(
+                [
+                    uu[i, j].real,
+                    dd[i, j].real,
+                    ud[i, j].real,
+                    ud[i, j].imag,
+                    uu[i, j].imag,
+                    dd[i, j].imag,
+                    du[i, j].real,
+                    du[i, j].imag,
+                    0,
+                ]
+            )
+            if i == j:
+                values[[0, 1, -1]] += onsite[i] - 0.5, onsite[i] + 0.5, 1
+            if values.any():
+                dh[i, j] = values
+        for n in neighbours:
+            dh[i, geometry.a2o(n) + i] = [hopping[i], hopping[i]] + [0] * 7
+        density = np.zeros(9)
+        density[[0, 1, -1]] = 0.9, 0.1, 1
+        dm[i, i] = density
+
+    builder = Builder([[1, 0, 0], [0, 1, 0], [0, 0, 1]])
+    builder.add_kspace(kspace)
+    builder.add_contour(Contour(20, 1000, -10))
+    builder.add_hamiltonian(Hamiltonian((dh, dm), [0, 0, 1]))
+    builder.add_magnetic_entities([dict(atom=0)])
+    builder.add_pairs(
+        [dict(ai=0, aj=0, Ruc=Ruc) for Ruc in ([1, 0, 0], [1, 1, 0], [0, 2, 0])]
+    )
+
+    return builder
+
+
+def assert_same_results(builder: Builder, reference: Builder, rtol: float = 1e-8):
+    """Compares the exchange and anisotropy tensors of two solutions."""
+
+    for attribute, objects in (
+        ("J", (builder.pairs, reference.pairs)),
+        ("K", (builder.magnetic_entities, reference.magnetic_entities)),
+    ):
+        actual, desired = [
+            np.array([getattr(o, attribute) for o in l]) for l in objects
+        ]
+        assert_allclose(actual, desired, rtol=0, atol=rtol * np.abs(desired).max())
+
+
 class TestBuilder:
     @pytest.mark.xfail(raises=NotImplementedError)
     def test_(self):
         raise NotImplementedError
 
+    def test_greens_function_solver(self):
+        builder = Builder()
+        builder.greens_function_solver = "sparse"
+        assert builder.greens_function_solver == "Sparse"
+        builder.greens_function_solver = "seq"
+        assert builder.greens_function_solver == "Sequential"
+
+        # the sparse solver is not silently replaced on the GPU
+        builder._Builder__architecture = "GPU"
+        with pytest.raises(Exception):
+            builder.greens_function_solver = "Sparse"
+        assert builder.greens_function_solver == "Sequential"
+
+    def test_pair_accumulation(self):
+        builder = Builder()
+        assert builder.pair_accumulation == "Direct"
+        builder.pair_accumulation = "fft"
+        assert builder.pair_accumulation == "FFT"
+
+        with pytest.raises(Exception):
+            builder.pair_accumulation = "Gauss"
+
+    def test_energy_chunk_size(self):
+        builder = Builder()
+        assert builder.energy_chunk_size is None
+        builder.energy_chunk_size = 50
+        assert builder.energy_chunk_size == 50
+        builder.energy_chunk_size = None
+        assert builder.energy_chunk_size is None
+
+        with pytest.raises(Exception):
+            builder.energy_chunk_size = 0
+
+    def test_eigen_cache(self, tmp_path):
+        builder = Builder()
+        assert builder.eigen_cache is None
+        builder.eigen_cache = tmp_path
+        assert builder.eigen_cache == str(tmp_path)
+        builder.eigen_cache = None
+        assert builder.eigen_cache is None
+
+    def test_sparse_hamiltonian(self):
+        reference = synthetic_builder()
+        reference.solve()
+
+        builder = synthetic_builder(sparse=True)
+        builder.solve()
+        assert_same_results(builder, reference)
+
+        # the compressed matrices are shared with the processes
+        builder = synthetic_builder(sparse=True)
+        builder.parallel_mode = "Processes"
+        builder.max_workers = 2
+        builder.solve()
+        assert_same_results(builder, reference)
+
+    def test_parallel_over_threads(self):
+        reference = synthetic_builder()
+        reference.solve()
+
+        builder = synthetic_builder()
+        builder.parallel_mode = "Threads"
+        builder.max_workers = 2
+        builder.solve()
+        assert_same_results(builder, reference)
+
+    def test_parallel_over_processes(self):
+        reference = synthetic_builder()
+        reference.solve()
+
+        builder = synthetic_builder()
+        builder.parallel_mode = "Processes"
+        builder.max_workers = 2
+        builder.solve()
+        assert_same_results(builder, reference)
+
+    def test_time_reversal_kspace(self):
+        # the k/-k reduction needs a real Hamiltonian in real space
+        reference = synthetic_builder(spin="nc")
+        reference.solve()
+
+        builder = synthetic_builder(spin="nc", kspace=Kspace([3, 3, 1], trs=True))
+        assert builder.kspace.NK < reference.kspace.NK
+        builder.solve()
+        assert_same_results(builder, reference)
+
+    def test_adaptive_contour(self):
+        reference = synthetic_builder(contour=Contour(300, 1000, -10))
+        reference.solve()
+
+        builder = synthetic_builder(contour=Contour(15, 1000, -10, tolerance=1e-6))
+        builder.solve()
+        # the contour of the builder is refined in place
+        assert 15 < builder.contour.eset < 300
+        assert builder.contour.eset == len(builder.contour.samples)
+        assert_same_results(builder, reference)
+
+    def test_kspace_refinement(self):
+        builder = synthetic_builder(kspace=Kspace([2, 2, 1], tolerance=1e-3))
+        builder.solve()
+        # the coarser grids are nested in the converged grid
+        assert (builder.kspace.kset > [2, 2, 1]).any()
+
+        reference = synthetic_builder(kspace=Kspace(builder.kspace.kset))
+        reference.solve()
+        assert_same_results(builder, reference)
+
+    def test_quasi_monte_carlo(self):
+        builder = synthetic_builder(
+            kspace=Kspace([4, 4, 1], sampling="sobol", replicas=2, seed=3)
+        )
+        builder.solve()
+
+        # the same k points on the default grid solver
+        kspace = Kspace([4, 4, 1])
+        kspace.kpoints = builder.kspace.kpoints.copy()
+        kspace.weights = builder.kspace.weights.copy()
+        reference = synthetic_builder(kspace=kspace)
+        reference.solve()
+        assert_same_results(builder, reference)
+
+    def test_fft_pair_accumulation(self):
+        reference = synthetic_builder()
+        reference.solve()
+
+        builder = synthetic_builder()
+        builder.pair_accumulation = "FFT"
+        builder.solve()
+        assert_same_results(builder, reference)
+
+    def test_energy_chunks(self):
+        reference = synthetic_builder()
+        reference.solve()
+
+        # the last chunk is smaller
+        builder = synthetic_builder()
+        builder.energy_chunk_size = 7
+        builder.solve()
+        assert_same_results(builder, reference)
+
+    def test_fused_orientations(self, monkeypatch):
+        builder = synthetic_builder()
+        assert cpu_solvers._fusable(builder)
+        builder.solve()
+
+        # every reference direction sampled in a separate pass
+        monkeypatch.setattr(cpu_solvers, "_fusable", lambda builder: False)
+        reference = synthetic_builder()
+        reference.solve()
+        assert_same_results(builder, reference)
+
+    def test_incremental_solution(self, tmp_path):
+        reference = synthetic_builder()
+        reference.solve()
+
+        pairs = [[0, 1, [0, 0, 0]], [0, 1, [1, 0, 0]], [0, 0, [0, 1, 0]]]
+        builder = synthetic_builder(pairs=pairs[:1])
+        builder.greens_function_solver = "Eigen"
+        builder.eigen_cache = tmp_path
+        builder.solve()
+        assert len(list(tmp_path.iterdir())) > 0
+
+        # only the new pairs are calculated from the cache
+        builder.add_pairs([dict(ai=ai, aj=aj, Ruc=Ruc) for ai, aj, Ruc in pairs[1:]])
+        builder.solve(incremental=True)
+        assert_same_results(builder, reference)
+
+    def test_reverse_pairs(self, monkeypatch):
+        pairs = [[0, 1, [0, 0, 0]], [0, 1, [1, 0, 0]], [0, 0, [0, 1, 0]]]
+        reverse = [[1, 0, [0, 0, 0]], [1, 0, [-1, 0, 0]], [0, 0, [0, -1, 0]]]
+        builder = synthetic_builder(pairs=pairs + reverse)
+        assert builder.pairs.reverse_partners() == [None] * 3 + [0, 1, 2]
+        builder.solve()
+        # the reverse pairs are transposed from their partners
+        for pair, partner in zip(builder.pairs[3:], builder.pairs[:3]):
+            assert_allclose(pair.J, partner.J.T, rtol=0, atol=0)
+
+        # every pair is projected from its own Greens functions
+        monkeypatch.setattr(
+            cpu_solvers, "_deduplicated", lambda builder: contextlib.nullcontext()
+        )
+        reference = synthetic_builder(pairs=pairs + reverse)
+        reference.solve()
+        assert_same_results(builder, reference)
+
+    def test_symmetrize_without_representation(self):
+        reference = synthetic_builder(kspace=Kspace([4, 4, 1]))
+        reference.solve()
+
+        # the incomplete p shell can not be rotated, so only the identity is used
+        builder = synthetic_builder(kspace=Kspace([4, 4, 1], symmetrize=True))
+        builder.solve()
+        assert_same_results(builder, reference)
+
+    def test_symmetrize(self, monkeypatch):
+        reference = square_builder(Kspace([6, 6, 1]))
+        reference.solve()
+
+        # the number of irreducible k points of every reference direction
+        symmetry = cpu_solvers._symmetry
+        NK = []
+
+        def irreducible(*args, **kwargs):
+            out = symmetry(*args, **kwargs)
+            NK.append(len(out["kpoints"]))
+            return out
+
+        monkeypatch.setattr(cpu_solvers, "_symmetry", irreducible)
+        builder = square_builder(Kspace([6, 6, 1], symmetrize=True))
+        builder.solve()
+        assert len(NK) == 3 and max(NK) < 36
+        assert_same_results(builder, reference)
+
 
 if __name__ == "__main__":
     pass
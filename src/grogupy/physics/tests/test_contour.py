@@ -18,6 +18,7 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import numpy as np
 import plotly.graph_objects as go
 import pytest
 
@@ -98,6 +99,31 @@ class TestContour:
         c2.weights = c.weights
         assert c == c2
 
+    def test_adaptive(self):
+        c = Contour(100, 1000, emin=-10, tolerance=0.01)
+        assert c.adaptive
+        assert c.eset == 105
+        assert len(c.segments) == 7
+        assert len(c.gauss_weights) == c.eset
+
+        samples = c.samples.copy()
+        refine = np.zeros(7, dtype=bool)
+        refine[[2, 6]] = True
+        new = c.refine(refine)
+        assert len(c.segments) == 9
+        assert c.eset == len(c.samples) == 135
+        assert new.sum() == 4
+        # the samples of the kept segments are unchanged
+        assert np.allclose(
+            c.samples[np.repeat(~new, 15)], samples[np.repeat(~refine, 15)]
+        )
+        assert np.isclose(c.weights.sum(), 15)
+
+        c2 = Contour(100, 1000, emin=-10)
+        assert not c2.adaptive
+        with pytest.raises(Exception):
+            c2.refine(np.ones(1, dtype=bool))
+
     def test_copy(self):
         c = Contour(100, 1000, emin=-10)
         c2 = c.copy()
@@ -59,6 +59,64 @@ class TestKspace:
         k.kset = [100, 100, 100]
         assert np.allclose(k.weights, 1 / np.prod([100, 100, 100]))
 
+    @pytest.mark.parametrize(
+        "kset", [[1, 1, 1], [10, 10, 10], [1, 10, 1], [3, 4, 5], [10, 1, 1]]
+    )
+    def test_trs(self, kset):
+        k = Kspace(kset, trs=True)
+        assert k.NK < np.prod(kset) or np.prod(kset) == 1
+        assert np.isclose(k.weights.sum(), 1)
+        assert len(k.full_kpoints) == np.prod(kset)
+        assert np.isclose(k.full_weights.sum(), 1)
+
+        # every k point of the full grid is either sampled or its -k partner is
+        grid = np.rint(k.full_kpoints * kset).astype(int) % kset
+        sampled = np.rint(k.kpoints * kset).astype(int) % kset
+        sampled = set(map(tuple, sampled))
+        for idx in grid:
+            assert tuple(idx) in sampled or tuple(-idx % kset) in sampled
+
+        k.trs = False
+        assert k == Kspace(kset)
+
+    def test_symmetrize(self):
+        k = Kspace([10, 10, 1], symmetrize=True)
+        # the irreducible k points are found by the solver
+        assert k.NK == 100
+        assert k != Kspace([10, 10, 1])
+        k.symmetrize = False
+        assert k == Kspace([10, 10, 1])
+
+    def test_refine(self):
+        k = Kspace([3, 4, 1], tolerance=0.01, factor=3)
+        assert k != Kspace([3, 4, 1])
+        k.refine()
+        assert np.array_equal(k.kset, [9, 12, 1])
+        assert k.NK == 108
+
+        with pytest.raises(Exception):
+            Kspace([1, 1, 1], tolerance=0.01).refine()
+
+    def test_sobol(self):
+        k = Kspace([10, 10, 1], sampling="sobol", replicas=4, seed=1)
+        assert k.NK == 128
+        assert np.isclose(k.weights.sum(), 1)
+        assert np.allclose(k.kpoints[:, 2], 0)
+        assert (np.abs(k.kpoints) <= 0.5).all()
+
+        # the old k points are kept when the samples are extended
+        kpoints = k.kpoints.reshape(4, -1, 3)
+        k.refine()
+        assert k.NK == 256
+        assert np.allclose(k.kpoints.reshape(4, -1, 3)[:, :32], kpoints)
+        direct = Kspace([16, 16, 1], sampling="sobol", replicas=4, seed=1)
+        assert np.allclose(k.kpoints, direct.kpoints)
+
+        with pytest.raises(Exception):
+            Kspace([10, 10, 1], sampling="random")
+        with pytest.raises(Exception):
+            Kspace([10, 10, 1], sampling="sobol", replicas=1)
+
     def test_equality(self):
         k = Kspace([10, 10, 10])
         k2 = k.copy()
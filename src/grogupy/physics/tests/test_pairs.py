@@ -286,6 +286,27 @@ class TestPairList:
         assert isinstance(plist, PairList)
         assert isinstance(plist.toarray(), np.ndarray)
 
+    def test_reverse_partners(self):
+        geometry = sisl.geom.graphene()
+        dh = sisl.Hamiltonian(geometry, spin=sisl.Spin("p"))
+        dm = sisl.DensityMatrix(geometry, spin=sisl.Spin("p"))
+        for i in range(geometry.no):
+            dh[i, i] = [1, -1]
+            dm[i, i] = [0.6, 0.4]
+        m1 = grogupy.MagneticEntity((dh, dm), 0)
+        m2 = grogupy.MagneticEntity((dh, dm), 1)
+
+        plist = PairList(
+            [
+                Pair(m1, m2, [1, 0, 0]),
+                Pair(m1, m1, [0, 1, 0]),
+                Pair(m2, m1, [-1, 0, 0]),
+                Pair(m2, m1, [1, 0, 0]),
+                Pair(m1, m1, [0, -1, 0]),
+            ]
+        )
+        assert plist.reverse_partners() == [None, None, 0, None, 1]
+
 
 if __name__ == "__main__":
     pass
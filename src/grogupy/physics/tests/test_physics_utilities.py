@@ -38,9 +38,20 @@ class TestUtilities:
     def test_blow_up_orbindx(self):
         raise NotImplementedError
 
-    @pytest.mark.xfail(raises=NotImplementedError)
     def test_spin_tracer(self):
-        raise NotImplementedError
+        from grogupy._core import TAU_X, TAU_Y, TAU_Z
+
+        pauli = np.random.random((4, 3, 5, 5)) + 1j * np.random.random((4, 3, 5, 5))
+        M = sum(
+            np.kron(pauli[i], tau)
+            for i, tau in enumerate([np.eye(2), TAU_X, TAU_Y, TAU_Z])
+        )
+
+        # the stacked matrices are traced at once
+        traced = spin_tracer(M)
+        for i, key in enumerate(["c", "x", "y", "z"]):
+            assert np.allclose(traced[key], 2 * pauli[i])
+            assert np.allclose(spin_tracer(M[1])[key], traced[key][1])
 
     @pytest.mark.xfail(raises=NotImplementedError)
     def test_parse_magnetic_entity(self):
@@ -50,25 +61,131 @@ class TestUtilities:
     def test_interaction_energy(self):
         raise NotImplementedError
 
+    def test_interaction_energies(self):
+        P, eset, n, m = 3, 5, 4, 6
+
+        def random(*shape):
+            return np.random.random(shape) + 1j * np.random.random(shape)
+
+        Vi, Vj = random(P, 2, n, n), random(P, 2, m, m)
+        Gij, Gji = random(P, eset, n, m), random(P, eset, m, n)
+        weights = random(eset)
+
+        energies = interaction_energies(Vi, Vj, Gij, Gji, weights)
+        assert energies.shape == (P, 2, 2)
+        for p in range(P):
+            for a in range(2):
+                for b in range(2):
+                    assert np.isclose(
+                        energies[p, a, b],
+                        interaction_energy(Vi[p, a], Vj[p, b], Gij[p], Gji[p], weights),
+                    )
+
+        # the sets of weights are integrated at once
+        weights = random(3, eset)
+        energies = interaction_energies(Vi, Vj, Gij, Gji, weights)
+        assert energies.shape == (P, 3, 2, 2)
+        for s in range(3):
+            assert np.allclose(
+                energies[:, s], interaction_energies(Vi, Vj, Gij, Gji, weights[s])
+            )
+
     @pytest.mark.xfail(raises=NotImplementedError)
     def test_second_order_energy(self):
         raise NotImplementedError
 
+    def test_onsite_energies(self):
+        N, eset, n = 3, 5, 4
+
+        def random(*shape):
+            return np.random.random(shape) + 1j * np.random.random(shape)
+
+        Vu1, Vu2 = random(N, 3, n, n), random(N, 3, n, n)
+        Gii = random(N, eset, n, n)
+        weights = random(eset)
+
+        second, mixed = onsite_energies(Vu1, Vu2, Gii, weights)
+        assert second.shape == (N, 3)
+        assert mixed.shape == (N, 3, 3)
+        for i in range(N):
+            for a in range(3):
+                assert np.isclose(
+                    second[i, a],
+                    second_order_energy(Vu1[i, a], Vu2[i, a], Gii[i], weights),
+                )
+                for b in range(3):
+                    assert np.isclose(
+                        mixed[i, a, b],
+                        interaction_energy(
+                            Vu1[i, a], Vu1[i, b], Gii[i], Gii[i], weights
+                        ),
+                    )
+
+        energies = anisotropy_energies(Vu1, Vu2, Gii, weights, third_direction=True)
+        assert energies.shape == (N, 5)
+        assert np.allclose(energies[:, 0], second[:, 0])
+        assert np.allclose(energies[:, 1], mixed[:, 0, 1])
+        assert np.allclose(energies[:, 2], mixed[:, 1, 0])
+        assert np.allclose(energies[:, 3], second[:, 1])
+        assert np.allclose(energies[:, 4], second[:, 2])
+        assert anisotropy_energies(Vu1, Vu2, Gii, weights).shape == (N, 4)
+
     @pytest.mark.xfail(raises=NotImplementedError)
     def test_calculate_anisotropy_tensor(self):
         raise NotImplementedError
 
-    @pytest.mark.xfail(raises=NotImplementedError)
     def test_fit_anisotropy_tensor(self):
-        raise NotImplementedError
+        ref_xcf = self.ref_xcf()
+        energies = np.random.random((4, 3, 5))
+
+        # the stacked energies are fitted at once
+        K = fit_anisotropy_tensor(energies, ref_xcf)
+        assert K.shape == (4, 3, 3)
+        for energy, K_i in zip(energies, K):
+            assert np.allclose(fit_anisotropy_tensor(energy, ref_xcf), K_i)
 
-    @pytest.mark.xfail(raises=NotImplementedError)
     def test_calculate_exchange_tensor(self):
-        raise NotImplementedError
+        J, energies = self.exchange_energies()
+
+        J_iso, J_S, D, J_calc = calculate_exchange_tensor(energies)
+        assert np.allclose(J_calc, J)
+        assert np.allclose(J_iso, np.trace(J, axis1=1, axis2=2) / 3)
+        for i, energy in enumerate(energies):
+            for stacked, single in zip(
+                (J_iso, J_S, D, J_calc), calculate_exchange_tensor(energy)
+            ):
+                assert np.allclose(stacked[i], single)
 
-    @pytest.mark.xfail(raises=NotImplementedError)
     def test_fit_exchange_tensor(self):
-        raise NotImplementedError
+        J, energies = self.exchange_energies()
+
+        J_iso, J_S, D, J_fit = fit_exchange_tensor(energies, self.ref_xcf())
+        assert np.allclose(J_fit, J)
+        for i, energy in enumerate(energies):
+            for stacked, single in zip(
+                (J_iso, J_S, D, J_fit), fit_exchange_tensor(energy, self.ref_xcf())
+            ):
+                assert np.allclose(stacked[i], single)
+
+    @staticmethod
+    def ref_xcf():
+        return [
+            dict(o=np.array([1, 0, 0]), vw=np.array([[0, 0, -1], [0, 1, 0]])),
+            dict(o=np.array([0, 1, 0]), vw=np.array([[1, 0, 0], [0, 0, -1]])),
+            dict(o=np.array([0, 0, 1]), vw=np.array([[1, 0, 0], [0, 1, 0]])),
+        ]
+
+    def exchange_energies(self):
+        # energies of random exchange tensors upon the rotations
+        J = np.random.random((4, 3, 3))
+        energies = np.zeros((4, 3, 4))
+        for i, ref in enumerate(self.ref_xcf()):
+            v, w = ref["vw"]
+            for j, (l, r) in enumerate([(v, v), (w, v), (v, w), (w, w)]):
+                energies[:, i, j] = np.einsum(
+                    "a,pab,b->p", np.cross(ref["o"], r), J, np.cross(ref["o"], l)
+                )
+        return J, energies
 
     @pytest.mark.xfail(raises=NotImplementedError)
     def test_calculate_isotropic_only(self):
@@ -144,7 +144,8 @@ def spin_tracer(M: NDArray) -> dict:
     Parameters
     ----------
         M: NDArray
-            Traceable matrix in SPIN BOX represenation
+            Traceable matrix in SPIN BOX represenation, it can be stacked
+            along the leading axes
 
     Returns
     -------
@@ -152,10 +153,10 @@ def spin_tracer(M: NDArray) -> dict:
             It contains the traced matrix with "x", "y", "z" and "c", where "c" is the constant part
     """
 
-    M11 = M[0::2, 0::2]
-    M12 = M[0::2, 1::2]
-    M21 = M[1::2, 0::2]
-    M22 = M[1::2, 1::2]
+    M11 = M[..., 0::2, 0::2]
+    M12 = M[..., 0::2, 1::2]
+    M21 = M[..., 1::2, 0::2]
+    M22 = M[..., 1::2, 1::2]
 
     M_o = dict()
     M_o["x"] = M12 + M21
@@ -410,6 +411,51 @@ def interaction_energy(
     return integral
 
 
+def interaction_energies(
+    Vi: NDArray, Vj: NDArray, Gij: NDArray, Gji: NDArray, weights: NDArray
+) -> NDArray:
+    """The interaction energy variations of all the combinations of rotations.
+
+    It is the batched version of ``interaction_energy``. The leading axes of
+    the arguments are broadcasted, so many pairs can be calculated at once.
+    The traces are calculated from the ``Gij @ Vj`` and ``Gji @ Vi``
+    products, so the full product of the four matrices is not formed.
+
+    Parameters
+    ----------
+    Vi : NDArray
+        First order perturbations on the first site with shape (..., a, n, n)
+    Vj : NDArray
+        First order perturbations on the second site with shape (..., b, m, m)
+    Gij : NDArray
+        First Green's function slice with shape (..., eset, n, m)
+    Gji : NDArray
+        Second Green's function slice with shape (..., eset, m, n)
+    weights : NDArray
+        The weights from the energy contour integral with shape (eset,) or
+        (s, eset) for s different sets of weights
+
+    Returns
+    -------
+    NDArray
+        The interaction energy variations with shape (..., a, b) or
+        (..., s, a, b)
+    """
+
+    Vi, Vj = np.asarray(Vi), np.asarray(Vj)
+    if Gij.shape[-3] == 1:
+        warnings.warn(
+            "Only one energy point is given for integration! Returning energy point instead!"
+        )
+
+    # Tr(Vi Gij Vj Gji) = sum_pq (Gij Vj)_pq (Gji Vi)_qp in every energy point
+    GV = Gij[..., None, :, :, :] @ Vj[..., :, None, :, :]
+    VG = Gji[..., None, :, :, :] @ Vi[..., :, None, :, :]
+    traced = np.einsum("...bepq,...aeqp->...abe", GV, VG)
+
+    return _contour_integral(traced, weights, 2)
+
+
 def second_order_energy(
     Vu1: NDArray, Vu2: NDArray, Gii: NDArray, weights: NDArray
 ) -> float:
@@ -447,32 +493,138 @@ def second_order_energy(
     return integral
 
 
+def onsite_energies(
+    Vu1: NDArray, Vu2: NDArray, Gii: NDArray, weights: NDArray
+) -> tuple[NDArray, NDArray]:
+    """The energy variations of all the rotations on a magnetic entity.
+
+    It is the batched version of ``second_order_energy`` and of
+    ``interaction_energy`` on a single site. The leading axes of the
+    arguments are broadcasted, so many magnetic entities can be calculated
+    at once. The ``Vu1 @ Gii`` products are shared between the terms.
+
+    Parameters
+    ----------
+    Vu1 : NDArray
+        First order perturbations of the rotations with shape (..., r, n, n)
+    Vu2 : NDArray
+        Second order perturbations of the rotations with shape (..., r, n, n)
+    Gii : NDArray
+        Green's function slice with shape (..., eset, n, n)
+    weights : NDArray
+        The weights from the energy contour integral with shape (eset,) or
+        (s, eset) for s different sets of weights
+
+    Returns
+    -------
+    second : NDArray
+        The second order energy variations with shape (..., r) or (..., s, r)
+    mixed : NDArray
+        The interaction energy variations of the pairs of rotations with
+        shape (..., r, r) or (..., s, r, r)
+    """
+
+    Vu1, Vu2 = np.asarray(Vu1), np.asarray(Vu2)
+    if Gii.shape[-3] == 1:
+        warnings.warn(
+            "Only one energy point is given for integration! Returning energy point instead!"
+        )
+
+    VG = Vu1[..., :, None, :, :] @ Gii[..., None, :, :, :]
+    mixed = np.einsum("...aepq,...beqp->...abe", VG, VG)
+    second = np.einsum("...apq,...eqp->...ae", Vu2, Gii)
+    second += 0.5 * np.diagonal(mixed, axis1=-3, axis2=-2).swapaxes(-1, -2)
+
+    return _contour_integral(second, weights, 1), _contour_integral(mixed, weights, 2)
+
+
+def anisotropy_energies(
+    Vu1: NDArray,
+    Vu2: NDArray,
+    Gii: NDArray,
+    weights: NDArray,
+    third_direction: bool = False,
+) -> NDArray:
+    """The energies of the rotations that are needed for the anisotropy tensor.
+
+    The leading axes of the arguments are broadcasted, so many magnetic
+    entities can be calculated at once by ``onsite_energies``.
+
+    Parameters
+    ----------
+    Vu1 : NDArray
+        First order perturbations of the rotations with shape (..., r, n, n)
+    Vu2 : NDArray
+        Second order perturbations of the rotations with shape (..., r, n, n)
+    Gii : NDArray
+        Green's function slice with shape (..., eset, n, n)
+    weights : NDArray
+        The weights from the energy contour integral with shape (eset,) or
+        (s, eset) for s different sets of weights
+    third_direction : bool, optional
+        Wether to add the second order energy of the third rotation, by
+        default False
+
+    Returns
+    -------
+    NDArray
+        The second order energy of the first rotation, the two interaction
+        energies of the first two rotations, the second order energy of the
+        second rotation and optionally of the third rotation along the last
+        axis
+    """
+
+    second, mixed = onsite_energies(Vu1, Vu2, Gii, weights)
+    energies = [second[..., 0], mixed[..., 0, 1], mixed[..., 1, 0], second[..., 1]]
+    if third_direction:
+        energies.append(second[..., 2])
+
+    return np.stack(energies, axis=-1)
+
+
+def _contour_integral(traced: NDArray, weights: NDArray, axes: int) -> NDArray:
+    """The contour integral of the traces along the last axis.
+
+    The axis of the different sets of weights is put before the last
+    ``axes`` axes of the integral.
+    """
+
+    integral = -1 / np.pi * np.imag(traced @ np.transpose(weights))
+    if np.ndim(weights) == 1:
+        return integral
+    return np.moveaxis(integral, -1, -1 - axes)
+
+
 def calculate_anisotropy_tensor(energies: NDArray) -> tuple[NDArray, float]:
     """Calculates the renormalized anisotropy tensor from the energies.
 
     The energies must be in the shape of a 3 by 3 matrix, where each row is
     an orientation and each column is a second order perpendicular rotation.
+    The energies of several magnetic entities can be stacked along the
+    leading axes, then the tensors are calculated at once.
 
     Parameters
     ----------
         energies : NDArray
-            The energies of the rotations
+            The energies of the rotations with shape (..., orientations, rotations)
 
     Returns
     -------
         K : NDArray
-            Elements of the anisotropy tensor
+            Elements of the anisotropy tensor with shape (..., 3, 3)
         consistency_check : float
             Absolute value of the difference from the consistency check
     """
 
+    energies = np.asarray(energies)
+
     # more directions are useless
-    if len(energies) > 3:
+    if energies.shape[-2] > 3:
         warnings.warn(
             "There are more exchange field reference directions given, than what is needed.\nOnly the first three is used!"
         )
 
-    K = np.zeros((3, 3))
+    K = np.zeros(energies.shape[:-2] + (3, 3))
 
     # WARNING this has been rewritten to work with the auto-generated directions, meaning
     # the orientations are:
@@ -488,23 +640,27 @@ def calculate_anisotropy_tensor(energies: NDArray) -> tuple[NDArray, float]:
 
     # calculate the diagonal tensor elements
     # Koo = E**2({v},w) - E**2({v},o)
-    K[0, 0] = energies[1, 3] - energies[1, 0]
+    K[..., 0, 0] = energies[..., 1, 3] - energies[..., 1, 0]
     # Kvv = E**2({o},w) - E**2({o},v)
-    K[1, 1] = energies[0, 0] - energies[0, 3]
-    K[2, 2] = 0
+    K[..., 1, 1] = energies[..., 0, 0] - energies[..., 0, 3]
+    K[..., 2, 2] = 0
 
     # calculate the off-diagonal tensor elements
     # Kvw = 1/2 * (E**2({o},v) + E**2({o},w)) - E**2({o},(v+w)/sqrt(2))
-    K[0, 1] = (energies[2, 0] + energies[2, 3]) / 2 - energies[2, 4]
-    K[1, 0] = K[0, 1]
-    K[0, 2] = -(energies[1, 0] + energies[1, 3]) / 2 + energies[1, 4]
-    K[2, 0] = K[0, 2]
-    K[1, 2] = -(energies[0, 0] + energies[0, 3]) / 2 + energies[0, 4]
-    K[2, 1] = K[1, 2]
+    K[..., 0, 1] = (energies[..., 2, 0] + energies[..., 2, 3]) / 2 - energies[..., 2, 4]
+    K[..., 1, 0] = K[..., 0, 1]
+    K[..., 0, 2] = (
+        -(energies[..., 1, 0] + energies[..., 1, 3]) / 2 + energies[..., 1, 4]
+    )
+    K[..., 2, 0] = K[..., 0, 2]
+    K[..., 1, 2] = (
+        -(energies[..., 0, 0] + energies[..., 0, 3]) / 2 + energies[..., 0, 4]
+    )
+    K[..., 2, 1] = K[..., 1, 2]
 
     # perform consistency check
-    calculated_diff = K[1, 1] - K[0, 0]
-    expected_diff = energies[2, 0] - energies[2, 3]
+    calculated_diff = K[..., 1, 1] - K[..., 0, 0]
+    expected_diff = energies[..., 2, 0] - energies[..., 2, 3]
     consistency_check = abs(calculated_diff - expected_diff)
 
     return K, consistency_check
@@ -514,28 +670,33 @@ def fit_anisotropy_tensor(energies: NDArray, ref_xcf: list[dict]) -> NDArray:
     """Fits the anisotropy tensor to the energies.
 
     It uses a fitting method to calculate the anisotropy tensor from the
-    reference directions and its different representations.
+    reference directions and its different representations. The normal
+    matrix only depends on the reference directions, so the energies of
+    several magnetic entities can be stacked along the leading axes and
+    fitted with a single solution.
 
     Parameters
     ----------
     energies : NDArray
-        Energies upon rotations
+        Energies upon rotations with shape (..., orientations, rotations)
     ref_xcf : list[dict]
         The reference directions containing the orientation and perpendicular directions
 
     Returns
     -------
         K : NDArray
-            Elements of the anisotropy tensor
+            Elements of the anisotropy tensor with shape (..., 3, 3)
     """
 
     warnings.warn("This is experimenal!")
 
-    A = np.zeros((5, 5))
-    cA = np.zeros(5)
+    energies = np.asarray(energies)
 
+    # rows of the design matrix and the corresponding energy differences
+    design = []
+    c = []
     for i in range(len(ref_xcf)):
-        E = energies[i, :4]
+        E = energies[..., i, :4]
         v = ref_xcf[i]["vw"][0]
         w = ref_xcf[i]["vw"][1]
 
@@ -547,10 +708,10 @@ def fit_anisotropy_tensor(energies: NDArray, ref_xcf: list[dict]) -> NDArray:
                 np.outer(v, v) - np.outer(w, w),
             ]
         )
-        c = np.array([E[0] - E[3], E[1], E[2], E[3] - E[0]])
+        c += [E[..., 0] - E[..., 3], E[..., 1], E[..., 2], E[..., 3] - E[..., 0]]
 
-        for ci, vwi in zip(c, vw):
-            a = np.array(
+        for vwi in vw:
+            design.append(
                 [
                     vwi[0, 0],
                     -2 * (vwi[0, 1] + vwi[1, 0]),  # HERE is the -2
@@ -559,18 +720,19 @@ def fit_anisotropy_tensor(energies: NDArray, ref_xcf: list[dict]) -> NDArray:
                     -2 * (vwi[1, 2] + vwi[2, 1]),  # HERE is the -2
                 ]
             )
+    design = np.array(design)
 
-            A += np.outer(a, a)
-            cA += ci * a
+    A = design.T @ design
+    cA = np.stack(c, axis=-1) @ design
 
-    K = np.linalg.inv(A) @ cA
-    out = np.array(
-        [
-            [K[0], K[1], K[2]],
-            [K[1], K[3], K[4]],
-            [K[2], K[4], 0],
-        ]
-    )
+    # one solution for the right hand sides of every magnetic entity
+    K = np.linalg.solve(A, cA.reshape(-1, 5).T).T.reshape(cA.shape)
+    out = np.zeros(K.shape[:-1] + (3, 3))
+    out[..., 0, 0] = K[..., 0]
+    out[..., 0, 1] = out[..., 1, 0] = K[..., 1]
+    out[..., 0, 2] = out[..., 2, 0] = K[..., 2]
+    out[..., 1, 1] = K[..., 3]
+    out[..., 1, 2] = out[..., 2, 1] = K[..., 4]
 
     return out
 
@@ -582,12 +744,14 @@ def calculate_exchange_tensor(
 
     It produces the isotropic exchange, the relevant elements
     from the Dzyaloshinskii-Morilla (Dm) tensor, the symmetric-anisotropy
-    and the complete exchange tensor.
+    and the complete exchange tensor. The energies of several pairs can be
+    stacked along the leading axes, then the tensors are calculated at once
+    and the outputs have the same leading axes.
 
     Parameters
     ----------
         energies: NDArray
-            Energies upon rotations
+            Energies upon rotations with shape (..., orientations, rotations)
 
     Returns
     -------
@@ -601,45 +765,52 @@ def calculate_exchange_tensor(
             Complete exchange tensor flattened (Jxx, Jxy, Jxz, Jyx, Jyy, Jyz, Jzx, Jzy, Jzz)
     """
 
+    energies = np.asarray(energies)
+
     # more directions are useless
-    if len(energies) > 3:
+    if energies.shape[-2] > 3:
         warnings.warn(
             "There are more exchange field reference directions given, than what is needed.\nOnly the first three is used!"
         )
 
-    # Initialize output arrays
-    J_diag = np.zeros(3)
-    J_S = np.zeros(3)
-    D = np.zeros(3)
-    J = np.zeros((3, 3))
-
     # first calculate the diagonal elements
-    J_diag[0] = energies[1, 3]
-    J_diag[1] = energies[2, 0]
-    J_diag[2] = energies[0, 3]
+    J_diag = np.stack(
+        [energies[..., 1, 3], energies[..., 2, 0], energies[..., 0, 3]], axis=-1
+    )
 
     # symmetric part
-    J_S[0] = 0.5 * (energies[0, 1] + energies[0, 2])
-    J_S[1] = 0.5 * (energies[1, 1] + energies[1, 2])
-    J_S[2] = -0.5 * (energies[2, 1] + energies[2, 2])
+    J_S = np.stack(
+        [
+            0.5 * (energies[..., 0, 1] + energies[..., 0, 2]),
+            0.5 * (energies[..., 1, 1] + energies[..., 1, 2]),
+            -0.5 * (energies[..., 2, 1] + energies[..., 2, 2]),
+        ],
+        axis=-1,
+    )
 
     # anti-symmetric part
-    D[0] = 0.5 * (energies[0, 1] - energies[0, 2])
-    D[1] = 0.5 * (energies[1, 1] - energies[1, 2])
-    D[2] = 0.5 * (energies[2, 1] - energies[2, 2])
+    D = np.stack(
+        [
+            0.5 * (energies[..., 0, 1] - energies[..., 0, 2]),
+            0.5 * (energies[..., 1, 1] - energies[..., 1, 2]),
+            0.5 * (energies[..., 2, 1] - energies[..., 2, 2]),
+        ],
+        axis=-1,
+    )
 
     # put together
-    J[0, 0] = J_diag[0]
-    J[1, 1] = J_diag[1]
-    J[2, 2] = J_diag[2]
-    J[0, 1] = J_S[2] + D[2]
-    J[0, 2] = J_S[1] - D[1]
-    J[1, 2] = J_S[0] + D[0]
-    J[1, 0] = J_S[2] - D[2]
-    J[2, 0] = J_S[1] + D[1]
-    J[2, 1] = J_S[0] - D[0]
-
-    J_iso = np.trace(J) / 3
+    J = np.zeros(energies.shape[:-2] + (3, 3))
+    J[..., 0, 0] = J_diag[..., 0]
+    J[..., 1, 1] = J_diag[..., 1]
+    J[..., 2, 2] = J_diag[..., 2]
+    J[..., 0, 1] = J_S[..., 2] + D[..., 2]
+    J[..., 0, 2] = J_S[..., 1] - D[..., 1]
+    J[..., 1, 2] = J_S[..., 0] + D[..., 0]
+    J[..., 1, 0] = J_S[..., 2] - D[..., 2]
+    J[..., 2, 0] = J_S[..., 1] + D[..., 1]
+    J[..., 2, 1] = J_S[..., 0] - D[..., 0]
+
+    J_iso = np.trace(J, axis1=-2, axis2=-1) / 3
 
     return J_iso, J_S, D, J
 
@@ -650,12 +821,15 @@ def fit_exchange_tensor(
     """Fits the exchange tensor to the energies.
 
     It uses a fitting method to calculate the exchange tensor from the
-    reference directions and its different representations.
+    reference directions and its different representations. The normal
+    matrix only depends on the reference directions, so the energies of
+    several pairs can be stacked along the leading axes and fitted with a
+    single solution.
 
     Parameters
     ----------
     energies : NDArray
-        Energies upon rotations
+        Energies upon rotations with shape (..., orientations, rotations)
     ref_xcf : list[dict]
         The reference directions containing the orientation and perpendicular directions
 
@@ -673,12 +847,13 @@ def fit_exchange_tensor(
 
     warnings.warn("This is experimenal!")
 
+    energies = np.asarray(energies)
+
     # Based on the BME consultation
     M = np.zeros((9, 9))
-    V = np.zeros(9)
+    epsilons = []
 
     for i in range(len(ref_xcf)):
-        E = energies[i, :4]
         e1 = ref_xcf[i]["vw"][0]
         e2 = ref_xcf[i]["vw"][1]
         e = ref_xcf[i]["o"]
@@ -691,19 +866,23 @@ def fit_exchange_tensor(
             epsilon1 = np.outer(epl, epr).flatten()
             epsilon2 = np.outer(epr, epl).flatten()
             M += np.outer(epsilon1, epsilon2)
-            V += E[j] * epsilon1
+            epsilons.append(epsilon1)
+
+    E = energies[..., : len(ref_xcf), :4]
+    V = E.reshape(E.shape[:-2] + (-1,)) @ np.array(epsilons)
 
-    J = np.linalg.solve(M, V)
+    # one solution for the right hand sides of every pair
+    J = np.linalg.solve(M, V.reshape(-1, 9).T).T.reshape(V.shape)
 
     # dump data to instance
-    J = J.reshape(3, 3)
-    J_S = 0.5 * (J + J.T)
-    D = 0.5 * (J - J.T)
+    J = J.reshape(J.shape[:-1] + (3, 3))
+    J_S = 0.5 * (J + np.swapaxes(J, -1, -2))
+    D = 0.5 * (J - np.swapaxes(J, -1, -2))
 
-    J_iso = np.trace(J) / 3
+    J_iso = np.trace(J, axis1=-2, axis2=-1) / 3
 
-    J_S = np.array([J_S[1, 2], J_S[0, 2], J_S[0, 1]])
-    D = np.array([D[1, 2], -D[0, 2], D[0, 1]])
+    J_S = np.stack([J_S[..., 1, 2], J_S[..., 0, 2], J_S[..., 0, 1]], axis=-1)
+    D = np.stack([D[..., 1, 2], -D[..., 0, 2], D[..., 0, 1]], axis=-1)
 
     return J_iso, J_S, D, J
 